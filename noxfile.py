@@ -59,3 +59,11 @@ def pytype(session: Session) -> None:
 def coverage(session: Session) -> None:
     """Upload coverage data."""
     session.run("coverage", "report", "--fail-under=0")
+
+
+@nox.session(python="3.7")
+def benchmarks(session: Session) -> None:
+    """Run the interactor benchmarks and compare them with the baseline."""
+    args = session.posargs or ["--compare"]
+    session.chdir(package)
+    session.run("python", "-m", "benchmarks.interactors", *args, external=True)
@@ -0,0 +1,14 @@
+"""Benchmarks of the exchanger app.
+
+Every module is runnable from the nucoro folder, for example:
+    python -m benchmarks.renderers
+"""
+import os
+
+import django  # type: ignore
+
+
+def setup_django() -> None:
+    """Configure Django so the benchmarks can import the exchanger app."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nucoro.settings')
+    django.setup()
@@ -0,0 +1,56 @@
+"""Seeded synthetic dataset of the benchmarks.
+
+The daily rates of the source currency (EUR) up to today, from the random walks of exchanger/synthetic.py,
+so the same seed always builds the same rates.
+"""
+from datetime import date, timedelta
+import io
+from typing import Optional
+
+SOURCE_CURRENCY = 'EUR'
+CODES = [
+    'EUR', 'USD', 'GBP', 'CHF', 'AUD', 'CAD', 'CNY', 'JPY', 'NZD', 'SEK', 'NOK', 'DKK', 'PLN', 'CZK', 'HUF', 'RON',
+    'BGN', 'HRK', 'ISK', 'TRY', 'RUB', 'INR', 'IDR', 'KRW', 'MYR', 'PHP', 'SGD', 'THB', 'HKD', 'ZAR', 'BRL', 'MXN',
+    'ARS', 'CLP', 'COP', 'PEN', 'ILS', 'AED', 'SAR', 'QAR', 'KWD', 'EGP', 'MAD', 'NGN', 'KES', 'PKR', 'BDT', 'VND',
+    'TWD', 'UAH',
+]
+
+
+def use_database(path: str) -> None:
+    """Point the default database to a new file and migrate it, with the Mock provider only.
+
+    Args:
+        path: path of the database file
+    """
+    from django.core.management import call_command  # type: ignore
+    from django.db import connections  # type: ignore
+
+    from exchanger.currencies import clear_registry
+    from exchanger.models import CurrencyProvider
+
+    connections.close_all()
+    connections['default'].settings_dict['NAME'] = path
+    del connections['default']
+    clear_registry()
+    call_command('migrate', verbosity=0)
+    CurrencyProvider.objects.exclude(provider_type=CurrencyProvider.MOCK).delete()
+
+
+def seed_rates(currencies: int, years: int, seed: int = 0, end: Optional[date] = None) -> int:
+    """Store the daily rates of the source currency to the first currencies of CODES.
+
+    Args:
+        currencies: number of currencies, the source one included
+        years: years of daily rates
+        seed: seed of the random walks
+        end: last date of the rates, today by default
+
+    Returns:
+        the number of rates stored
+    """
+    from django.core.management import call_command  # type: ignore
+
+    end = end or date.today()
+    call_command('seed_rates', str(end - timedelta(days=365 * years - 1)), str(end), sources=SOURCE_CURRENCY,
+                 currencies=','.join(CODES[:currencies]), seed=seed, stdout=io.StringIO())
+    return currencies * 365 * years
@@ -0,0 +1,93 @@
+"""Benchmark of the start up of the processes that use the exchanger app.
+
+Every scenario runs in fresh interpreters with python -X importtime, the way a management command or an
+RQ job process starts, and reports the median wall time, the time spent importing and the heaviest
+imports made directly by the scenario (with everything they import):
+    python -m benchmarks.imports
+    python -m benchmarks.imports --top 15 --repeat 9
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+SETUP = 'import os, django; os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nucoro.settings"); django.setup()'
+SCENARIOS = (
+    ('python', 'pass'),
+    ('django.setup', SETUP),
+    ('system checks', f'{SETUP}; from django.core.management import call_command; call_command("check")'),
+    # What a command runs before its handle method (see BaseCommand.execute).
+    ('batch command', f'{SETUP}; from django.core.management import load_command_class; '
+                      f'command = load_command_class("exchanger", "export_rates"); '
+                      f'command.requires_system_checks and command.check()'),
+)
+
+
+def parse_importtime(output: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """Parse the report of python -X importtime.
+
+    Args:
+        output: the standard error of the process
+
+    Returns:
+        the milliseconds spent importing, and the cumulative milliseconds of every top level import
+    """
+    total = 0.0
+    top_level = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        total += int(own) / 1000
+        if not name[1:].startswith(' '):
+            top_level.append((name.strip(), int(cumulative) / 1000))
+    return total, top_level
+
+
+def measure(code: str, repeat: int) -> Dict[str, object]:
+    """Start interpreters that run some code, timing them and their imports.
+
+    Args:
+        code: the code run by every interpreter
+        repeat: number of interpreters started, the median is kept
+
+    Returns:
+        the median wall and import milliseconds, and the top level imports of the median run
+    """
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                                 env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'})
+        wall = (time.perf_counter() - started) * 1000
+        if process.returncode:
+            sys.exit(process.stderr.splitlines()[-1])
+        runs.append((wall, *parse_importtime(process.stderr)))
+    wall, imports, top_level = sorted(runs, key=lambda run: run[0])[len(runs) // 2]
+    return {'wall ms': statistics.median(run[0] for run in runs), 'import ms': imports, 'top level': top_level}
+
+
+def main() -> None:
+    """Print the start up time of every scenario and its heaviest imports."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='interpreters started per scenario.')
+    parser.add_argument('--top', type=int, default=8, help='heaviest top level imports shown per scenario.')
+    args = parser.parse_args()
+
+    results = {name: measure(code, args.repeat) for name, code in SCENARIOS}
+    print(f'{"scenario":<24}{"wall ms":>10}{"import ms":>11}')
+    for name, result in results.items():
+        print(f'{name:<24}{result["wall ms"]:>10.1f}{result["import ms"]:>11.1f}')
+    for name, result in results.items():
+        heaviest = sorted(result['top level'], key=lambda item: item[1], reverse=True)[:args.top]  # type: ignore
+        if heaviest:
+            print(f'\n{name}')
+            for module, cumulative in heaviest:
+                print(f'    {module:<40}{cumulative:>8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
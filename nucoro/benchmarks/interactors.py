@@ -0,0 +1,184 @@
+"""Benchmark of the interactors on a synthetic dataset at production scale.
+
+For every currency count, a fresh database gets years of daily rates (see benchmarks/dataset.py) and
+every scenario is timed cold (first call on a new connection, with empty caches) and warm (best of the
+next calls), counting its SQL queries. The results can be saved as the baseline and compared with it:
+    python -m benchmarks.interactors --save-baseline
+    python -m benchmarks.interactors --compare
+"""
+import argparse
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+from decimal import Decimal
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks import setup_django
+from benchmarks.dataset import CODES, seed_rates, SOURCE_CURRENCY, use_database
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+RANGES = (30, 365, 3650)
+BATCH_ROWS = 1000
+MIN_SLOWDOWN_MS = 1.0
+
+
+def scenarios(currencies: int, years: int) -> List[Tuple[str, Callable[[], object]]]:
+    """Returns the timed calls for a dataset, reading ranges that are fully stored.
+
+    Args:
+        currencies: number of currencies of the dataset
+        years: years of daily rates of the dataset
+
+    Returns:
+        the name and the call of every scenario
+    """
+    from django.core.management import call_command  # type: ignore
+
+    from exchanger.analytics import get_rolling_stats
+    from exchanger.interactors import currency_converter, get_exchange_rates, time_weight_rate
+
+    today = date.today()
+    csv_file = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+    with csv_file:
+        for row in range(BATCH_ROWS):
+            exchanged = CODES[1 + row % (currencies - 1)]
+            csv_file.write(f'USD,{exchanged},{today - timedelta(days=row // (currencies - 1))},1.5\n')
+    calls: List[Tuple[str, Callable[[], object]]] = [
+        (f'get_exchange_rates {days}d', lambda days=days: get_exchange_rates(  # type: ignore
+            SOURCE_CURRENCY, today - timedelta(days=days - 1), today))
+        for days in RANGES if days <= 365 * years
+    ]
+    calls += [
+        ('currency_converter', lambda: currency_converter(SOURCE_CURRENCY, 'USD', Decimal('100'))),
+        ('time_weight_rate 180d', lambda: time_weight_rate(SOURCE_CURRENCY, 'USD', Decimal('100'),
+                                                           today - timedelta(days=180))),
+        ('get_rolling_stats 365d w30', lambda: get_rolling_stats(SOURCE_CURRENCY, None, today - timedelta(days=364),
+                                                                 today, 30)),
+        (f'batch_store_rates {BATCH_ROWS}', lambda: _quietly(call_command, 'batch_store_rates', csv_file.name)),
+    ]
+    return calls
+
+
+def _quietly(function: Callable, *args) -> object:
+    with redirect_stdout(io.StringIO()):
+        return function(*args)
+
+
+def measure(call: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Time a call cold (new connections, empty caches and currency registry) and warm and count its queries.
+
+    Args:
+        call: the timed call
+        repeat: number of warm calls, the best one is kept
+
+    Returns:
+        the cold and warm milliseconds and the queries of a warm call
+    """
+    from django.core.cache import cache  # type: ignore
+    from django.db import connection, connections  # type: ignore
+    from django.test.utils import CaptureQueriesContext  # type: ignore
+    from exchanger.currencies import clear_registry
+
+    connections.close_all()
+    cache.clear()
+    clear_registry()
+    started = time.perf_counter()
+    call()
+    cold = time.perf_counter() - started
+    warm = []
+    for _ in range(repeat):
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            call()
+            warm.append(time.perf_counter() - started)
+    return {'cold ms': cold * 1000, 'warm ms': min(warm) * 1000, 'queries': len(queries)}
+
+
+def run(currency_counts: List[int], years: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    """Run every scenario on a dataset of every currency count.
+
+    Args:
+        currency_counts: currencies of every dataset
+        years: years of daily rates of the datasets
+        repeat: number of warm calls of every scenario
+
+    Returns:
+        the results by scenario name
+    """
+    setup_django()
+    from django.conf import settings  # type: ignore
+
+    settings.RATES_PUSH_ENABLED = False
+    results = {}
+    for currencies in currency_counts:
+        with tempfile.TemporaryDirectory() as directory:
+            use_database(os.path.join(directory, 'benchmark.sqlite3'))
+            seed_rates(currencies, years)
+            for name, call in scenarios(currencies, years):
+                results[f'{name} x{currencies}'] = measure(call, repeat)
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Find the scenarios slower than the baseline or with more queries.
+
+    Args:
+        results: the current results
+        baseline: the baseline results
+        tolerance: allowed slowdown of the warm time, 0.5 is 50% slower (and at least MIN_SLOWDOWN_MS)
+
+    Returns:
+        a description of every regression
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        if result['queries'] > baseline[name]['queries']:
+            regressions.append(f'{name}: {result["queries"]} queries, baseline {baseline[name]["queries"]}')
+        allowed = max(baseline[name]['warm ms'] * tolerance, MIN_SLOWDOWN_MS)
+        if result['warm ms'] > baseline[name]['warm ms'] + allowed:
+            regressions.append(f'{name}: {result["warm ms"]:.1f} ms, baseline {baseline[name]["warm ms"]:.1f} ms')
+    return regressions
+
+
+def main() -> None:
+    """Print the benchmark results, and save or compare the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--currencies', type=str, default='5,50', help='currency counts (comma separated).')
+    parser.add_argument('--years', type=int, default=10, help='years of daily rates.')
+    parser.add_argument('--repeat', type=int, default=3, help='warm calls of every scenario.')
+    parser.add_argument('--save-baseline', action='store_true', help=f'save the results in {BASELINE_PATH}.')
+    parser.add_argument('--compare', action='store_true', help='fail on regressions against the baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed slowdown of the warm times.')
+    args = parser.parse_args()
+
+    results = run([int(count) for count in args.currencies.split(',')], args.years, args.repeat)
+    columns = ('cold ms', 'warm ms', 'queries')
+    print(f'{"scenario":<34}' + ''.join(f'{column:>10}' for column in columns))
+    for name, result in results.items():
+        print(f'{name:<34}' + ''.join(f'{result[column]:>10.1f}' for column in columns))
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as baseline_file:
+            json.dump({'years': args.years, 'results': results}, baseline_file, indent=2, sort_keys=True)
+    if args.compare:
+        with open(BASELINE_PATH) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline['years'] != args.years:
+            sys.exit(f'The baseline has {baseline["years"]} years of rates, run with --years={baseline["years"]}')
+        regressions = compare(results, baseline['results'], args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
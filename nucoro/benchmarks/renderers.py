@@ -0,0 +1,80 @@
+"""Benchmark of the renderers of the rate tables.
+
+Compares DRF's JSONRenderer with the ColumnarJSONRenderer on 1, 5 and 10 years of daily rates.
+"""
+import argparse
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import partial
+import random
+import timeit
+from typing import List
+
+from benchmarks import setup_django
+
+YEARS = (1, 5, 10)
+CODES = ['AUD', 'CAD', 'CHF', 'CNY', 'EUR', 'GBP', 'JPY', 'NZD', 'SEK', 'USD']
+
+
+def build_payload(years: int, currencies: int, seed: int = 0) -> dict:
+    """Build a date -> currency -> rate table like the one returned by get_exchange_rates.
+
+    Args:
+        years: number of years of daily rates
+        currencies: number of currencies per date
+        seed: seed of the random rates
+
+    Returns:
+        the rate table
+    """
+    generator = random.Random(seed)
+    codes = [CODES[index] if index < len(CODES) else f'X{index:02d}' for index in range(currencies)]
+    first_day = date(2011, 1, 1)
+    return {
+        str(first_day + timedelta(days=offset)): {
+            code: Decimal(f'{generator.uniform(0.5, 2):.6f}') for code in codes
+        }
+        for offset in range(365 * years)
+    }
+
+
+def run(currencies: int, repeat: int) -> List[dict]:
+    """Time both renderers for every payload size.
+
+    Args:
+        currencies: number of currencies per date
+        repeat: number of timed renders, the best one is kept
+
+    Returns:
+        one result per payload size and renderer
+    """
+    setup_django()
+    from rest_framework.renderers import JSONRenderer  # type: ignore
+
+    from exchanger.v1.renderers import ColumnarJSONRenderer
+
+    results = []
+    for years in YEARS:
+        payload = build_payload(years, currencies)
+        for renderer in (JSONRenderer(), ColumnarJSONRenderer()):
+            seconds = min(timeit.repeat(partial(renderer.render, payload), number=1, repeat=repeat))
+            results.append({
+                'years': years, 'renderer': type(renderer).__name__, 'ms': seconds * 1000,
+                'kb': len(renderer.render(payload)) / 1024,
+            })
+    return results
+
+
+def main() -> None:
+    """Print the benchmark results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--currencies', type=int, default=len(CODES), help='currencies per date.')
+    parser.add_argument('--repeat', type=int, default=5, help='timed renders per payload.')
+    args = parser.parse_args()
+    print(f'{"years":>5} {"renderer":<22} {"ms":>9} {"KB":>9}')
+    for result in run(args.currencies, args.repeat):
+        print(f'{result["years"]:>5} {result["renderer"]:<22} {result["ms"]:>9.1f} {result["kb"]:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
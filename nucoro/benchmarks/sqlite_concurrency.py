@@ -0,0 +1,140 @@
+"""Benchmark of concurrent readers and writers on SQLite.
+
+Runs reader threads (get_exchange_rates of a month) and writer threads (store_exchange_rate, with its
+aggregates and versions) against a fresh database file, with the stock Django SQLite profile and with
+the production one (immediate transactions, WAL, tuned pragmas and persistent connections). Every operation ends like a
+request does, closing the connection unless it is persistent.
+"""
+import argparse
+from datetime import date, timedelta
+from decimal import Decimal
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List
+
+from benchmarks import setup_django
+
+FIRST_DAY = date(2015, 1, 1)
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * percentile), len(values) - 1)] if values else 0.0
+
+
+def prepare_database(path: str, profile: dict, days: int) -> None:
+    """Point the default database to a new file, migrate it and store some years of rates.
+
+    Args:
+        path: path of the database file
+        profile: the ENGINE, OPTIONS and CONN_MAX_AGE of the database
+        days: days of rates stored for every currency
+    """
+    from django.core.management import call_command  # type: ignore
+    from django.db import connections  # type: ignore
+
+    from exchanger.models import Currency, CurrencyExchangeRate
+
+    connections.close_all()
+    connections['default'].settings_dict.update(profile, NAME=path)
+    del connections['default']
+    call_command('migrate', verbosity=0)
+    source = Currency.objects.get(code='EUR')
+    CurrencyExchangeRate.objects.bulk_create([
+        CurrencyExchangeRate(source_currency=source, exchanged_currency=currency,
+                             valuation_date=FIRST_DAY + timedelta(days=offset), rate_value=Decimal('1.1'))
+        for currency in Currency.objects.all() for offset in range(days)
+    ], batch_size=1000)
+    connections.close_all()
+
+
+def _worker(operation: Callable[[random.Random], None], deadline: float, seed: int, latencies: List[float],
+            errors: List[str]) -> None:
+    from django.db import close_old_connections, connection  # type: ignore
+
+    generator = random.Random(seed)
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            operation(generator)
+            latencies.append(time.monotonic() - started)
+        except Exception as e:
+            errors.append(str(e))
+        close_old_connections()
+    connection.close()
+
+
+def run_profile(profile: dict, readers: int, writers: int, seconds: float, days: int) -> Dict[str, float]:
+    """Run the readers and writers with a SQLite profile.
+
+    Args:
+        profile: the ENGINE, OPTIONS and CONN_MAX_AGE of the database
+        readers: number of reader threads
+        writers: number of writer threads
+        seconds: duration of the run
+        days: days of rates stored before the run
+
+    Returns:
+        the throughput and latencies of the reads and the writes, and the failed operations
+    """
+    from exchanger.interactors import FILL_FORWARD, get_exchange_rates, store_exchange_rate
+
+    def read(generator: random.Random) -> None:
+        date_from = FIRST_DAY + timedelta(days=generator.randrange(days - 30))
+        get_exchange_rates('EUR', date_from, date_from + timedelta(days=29), fill=FILL_FORWARD)
+
+    def write(generator: random.Random) -> None:
+        store_exchange_rate('EUR', generator.choice(['USD', 'GBP', 'CHF']),
+                            FIRST_DAY + timedelta(days=days + generator.randrange(3650)),
+                            Decimal(f'{generator.uniform(0.5, 2):.6f}'))
+
+    with tempfile.TemporaryDirectory() as directory:
+        prepare_database(os.path.join(directory, 'benchmark.sqlite3'), profile, days)
+        deadline = time.monotonic() + seconds
+        read_latencies: List[float] = []
+        write_latencies: List[float] = []
+        errors: List[str] = []
+        threads = [threading.Thread(target=_worker, args=(read, deadline, index, read_latencies, errors))
+                   for index in range(readers)]
+        threads += [threading.Thread(target=_worker, args=(write, deadline, readers + index, write_latencies, errors))
+                    for index in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return {
+        'reads/s': len(read_latencies) / seconds, 'read p95 ms': _percentile(read_latencies, 0.95) * 1000,
+        'writes/s': len(write_latencies) / seconds, 'write p95 ms': _percentile(write_latencies, 0.95) * 1000,
+        'errors': len(errors),
+    }
+
+
+def main() -> None:
+    """Print the benchmark results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--readers', type=int, default=4, help='reader threads.')
+    parser.add_argument('--writers', type=int, default=2, help='writer threads.')
+    parser.add_argument('--seconds', type=float, default=10, help='duration of each run.')
+    parser.add_argument('--days', type=int, default=365, help='days of rates stored before each run.')
+    args = parser.parse_args()
+    os.environ['SQLITE_PROFILE'] = 'production'
+    setup_django()
+    from django.conf import settings  # type: ignore
+
+    profiles = {
+        'default': {'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {}, 'CONN_MAX_AGE': 0},
+        'production': {key: settings.DATABASES['default'][key] for key in ('ENGINE', 'OPTIONS', 'CONN_MAX_AGE')},
+    }
+    settings.RATES_PUSH_ENABLED = False
+    columns = ('reads/s', 'read p95 ms', 'writes/s', 'write p95 ms', 'errors')
+    print(f'{"profile":<11}' + ''.join(f'{column:>14}' for column in columns))
+    for name, profile in profiles.items():
+        result = run_profile(profile, args.readers, args.writers, args.seconds, args.days)
+        print(f'{name:<11}' + ''.join(f'{result[column]:>14.1f}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
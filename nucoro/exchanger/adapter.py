@@ -1,12 +1,15 @@
 """Adapter module."""
 from datetime import date
 import decimal
+from typing import Dict, List
 
-import requests
+from django.conf import settings  # type: ignore
+from django.core.exceptions import ImproperlyConfigured  # type: ignore
 
+from exchanger.currencies import currency_id
 from exchanger.exceptions import ProviderUnavailable
 from exchanger.models import CurrencyExchangeRate, CurrencyProvider
-from nucoro.settings import FIXERIO_APIKEY, FIXERIO_URL
+from exchanger.quota import request_rates
 
 
 class Adaptee:
@@ -23,16 +26,29 @@ class MockAdaptee(Adaptee):
     """Adaptee for Mock Provider."""
 
     DEFAULT_EUR_BASE_RATES = {'USD': 1.15, 'GBP': 0.80, 'CHF': 1.10, 'EUR': 1}
+    MODE_LAST = 'last'
+    MODE_SYNTHETIC = 'synthetic'
 
     def get_mock_exchange_rate(self) -> float:
         """Function that returns a moched exchange rate.
 
+        With MOCK_PROVIDER_MODE 'synthetic' the rate comes from the random walks of exchanger/synthetic.py,
+        computed once per currency and without database queries (from their EPOCH on). Otherwise it is the
+        last stored rate of the pair plus 3%, or a default rate.
+
         Returns:
             a mocked exchange rate
         """
+        if settings.MOCK_PROVIDER_MODE == self.MODE_SYNTHETIC:
+            # Imported here so the processes that do not use synthetic rates do not import NumPy.
+            from exchanger.synthetic import EPOCH, synthetic_rate
+
+            if self.valuation_date >= EPOCH:
+                return synthetic_rate(self.source_currency, self.exchanged_currency, self.valuation_date,
+                                      settings.MOCK_PROVIDER_SEED)
         if self.source_currency != self.exchanged_currency:
-            last_exchange = CurrencyExchangeRate.objects.filter(source_currency__code=self.source_currency,
-                                                                exchanged_currency__code=self.exchanged_currency,
+            last_exchange = CurrencyExchangeRate.objects.filter(source_currency_id=currency_id(self.source_currency),
+                                                                exchanged_currency_id=currency_id(self.exchanged_currency),
                                                                 valuation_date__lte=self.valuation_date)
             last_exchange = last_exchange.order_by('-valuation_date').first()
 
@@ -43,33 +59,69 @@ class MockAdaptee(Adaptee):
         return 1.0
 
 
+def fixerio_apikey() -> str:
+    """Returns the FixerIo access key, from the FIXERIO_APIKEY environment variable.
+
+    Returns:
+        the access key
+
+    Raises:
+        ImproperlyConfigured: the variable is not set
+    """
+    if not settings.FIXERIO_APIKEY:
+        raise ImproperlyConfigured('Set the FIXERIO_APIKEY environment variable')
+    return settings.FIXERIO_APIKEY
+
+
+def fetch_fixerio_rates(valuation_date: date, symbols: List[str]) -> Dict[str, float]:
+    """Function that makes one call to fixer_io.
+
+    Args:
+        valuation_date: date of the rates
+        symbols: the currency codes requested
+
+    Returns:
+        the rates against the base currency of fixer_io, by currency code
+
+    Raises:
+        ProviderUnavailable: the provider has no data for that day
+    """
+    # Imported on the first call, most processes never call FixerIo.
+    import requests
+
+    url = f'{settings.FIXERIO_URL}/{valuation_date}?access_key={fixerio_apikey()}&symbols={",".join(symbols)}&format=1'
+    response = requests.get(url, timeout=settings.FIXERIO_TIMEOUT).json()
+    if not response['success']:
+        raise ProviderUnavailable('No data for that day.')
+    return response['rates']
+
+
 class FixerIoAdaptee(Adaptee):
     """Adaptee for FixerIo Provider."""
 
     def get_fixier_exchange_rate(self) -> float:
         """Function that returns an exchange rate from fixer_io.
 
+        The call goes through the scheduler of the provider (see exchanger/quota.py), so it may be
+        merged with other requests for the same date.
+
         Returns:
             a fixerio exchange rate
 
         Raises:
             ProviderUnavailable: the provider is unavailable
         """
-        try:
-            if self.source_currency != self.exchanged_currency:
-                str_date = str(self.valuation_date)
-                url = (
-                    f'{FIXERIO_URL}/{str_date}?access_key={FIXERIO_APIKEY}'
-                    f'&symbols={self.source_currency},{self.exchanged_currency}&format=1'
-                )
-                response = requests.get(url).json()
-                if response['success']:
-                    source_rate = response['rates'][self.source_currency]
-                    exchanged_rate = response['rates'][self.exchanged_currency]
-                    return exchanged_rate / source_rate
-                else:
-                    raise ProviderUnavailable('No data for that day.')
+        if self.source_currency == self.exchanged_currency:
             return 1.0
+        fixerio_apikey()
+        try:
+            rates = request_rates(self.currency_provider, self.valuation_date,
+                                  [self.source_currency, self.exchanged_currency], fetch_fixerio_rates)
+            source_rate = rates[self.source_currency]
+            exchanged_rate = rates[self.exchanged_currency]
+            return exchanged_rate / source_rate
+        except ProviderUnavailable:
+            raise
         except Exception:
             raise ProviderUnavailable()
 
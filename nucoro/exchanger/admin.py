@@ -1,16 +1,24 @@
 """Admin module."""
+from datetime import date, datetime, timedelta
 import decimal
-import json
 from typing import Any
 
 from django import forms  # type: ignore
 from django.contrib import admin  # type: ignore
+from django.contrib.admin.views.decorators import staff_member_required  # type: ignore
 from django.core.serializers.json import DjangoJSONEncoder  # type: ignore
-from django.http import HttpResponse  # type: ignore
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse  # type: ignore
 from django.template import loader  # type: ignore
+from django.urls import path  # type: ignore
 
+from exchanger.charts import get_chart_data
+from exchanger.currencies import currency_codes
 from exchanger.interactors import currency_converter
-from exchanger.models import Currency, CurrencyExchangeRate, CurrencyProvider
+from exchanger.models import Currency, CurrencyExchangeRate, CurrencyProvider, reserve_write_sequence
+from exchanger.profiling import list_profiles, profile_path, profile_stats, SORT_KEYS
+from exchanger.signals import rates_written
+
+CHART_DAYS = 365
 
 
 @admin.register(Currency)
@@ -25,7 +33,7 @@ class CurrencyAdmin(admin.ModelAdmin):
 class CurrencyProviderAdmin(admin.ModelAdmin):
     """Admin for CurrencyProvider."""
 
-    list_display = ("name", "provider_type", "priority")
+    list_display = ("name", "provider_type", "priority", "requests_per_second", "monthly_quota")
     ordering = ("priority",)
 
     def get_form(self, request: Any, obj: Any = None, **kwargs) -> forms.Form:
@@ -84,9 +92,73 @@ class CurrencyExchangeRateAdmin(admin.ModelAdmin):
     get_exchanged_currency.short_description = 'Exchange Currency'  # type: ignore
     get_exchanged_currency.admin_order_field = 'exchange_currency__code'  # type: ignore
 
+    def save_model(self, request: Any, obj: CurrencyExchangeRate, form: Any, change: bool) -> None:
+        """Save the rate and notify the rates_written receivers.
+
+        Args:
+            request: The request object
+            obj: The object
+            form: The admin form
+            change: whether the object is being changed or added
+        """
+        obj.write_sequence = reserve_write_sequence()
+        super().save_model(request, obj, form, change)
+        rates_written.send(sender=CurrencyExchangeRate, rates=[obj])
+
+    def delete_model(self, request: Any, obj: CurrencyExchangeRate) -> None:
+        """Delete the rate and notify the rates_written receivers.
+
+        Args:
+            request: The request object
+            obj: The object
+        """
+        super().delete_model(request, obj)
+        rates_written.send(sender=CurrencyExchangeRate, rates=[obj])
+
+    def delete_queryset(self, request: Any, queryset: Any) -> None:
+        """Delete the selected rates and notify the rates_written receivers.
+
+        Args:
+            request: The request object
+            queryset: The selected rates
+        """
+        rates = list(queryset)
+        super().delete_queryset(request, queryset)
+        rates_written.send(sender=CurrencyExchangeRate, rates=rates)
+
+    def get_urls(self) -> list:
+        """Add the chart data endpoint to the admin urls.
+
+        Returns:
+            the urls of the admin
+        """
+        chart_url = path('chart-data/', self.admin_site.admin_view(self.chart_data_view),
+                         name='exchanger_currencyexchangerate_chart_data')
+        return [chart_url] + super().get_urls()
+
+    def chart_data_view(self, request: Any) -> JsonResponse:
+        """Chart data of the rates of a source currency in a date range.
+
+        Args:
+            request: The request object
+
+        Returns:
+            a json response with the labels and datasets of the chart
+        """
+        today = date.today()
+        try:
+            date_from = datetime.strptime(request.GET['date_from'], '%Y-%m-%d').date()
+            date_to = datetime.strptime(request.GET['date_to'], '%Y-%m-%d').date()
+        except (KeyError, ValueError):
+            date_from, date_to = today - timedelta(days=CHART_DAYS), today
+        source_currency = request.GET.get('source_currency', 'EUR')
+        return JsonResponse(get_chart_data(source_currency, date_from, date_to), encoder=DjangoJSONEncoder)
+
     def changelist_view(self, request: Any, extra_context: Any = None) -> Any:
         """Change list view custom to contain the chart.
 
+        The chart data is fetched by the page from chart_data_view.
+
         Args:
             request: The request object
             extra_context: The extra context
@@ -94,27 +166,12 @@ class CurrencyExchangeRateAdmin(admin.ModelAdmin):
         Returns:
             render the proper view
         """
-        chart_query = CurrencyExchangeRate.objects.filter(
-            source_currency__code='EUR').order_by(
-                'valuation_date', 'exchanged_currency__code').select_related('exchanged_currency')
-        chart_data = None
-        data = {}
-        codes = [curr.code for curr in Currency.objects.all()]
-        for elem in chart_query:
-            if str(elem.valuation_date) not in data:
-                data[str(elem.valuation_date)] = {code: None for code in codes}
-            data[str(elem.valuation_date)][elem.exchanged_currency.code] = elem.rate_value
-        datasets = {code: [] for code in codes}  # type: ignore
-        labels = []
-        for d in data:
-            for code in codes:
-                datasets[code].append(data[d][code])
-            labels.append(d)
-        chart_data = {'labels': labels, 'datasets': datasets}
-
-        # Serialize and attach the chart data to the template context
-        as_json = json.dumps(chart_data, cls=DjangoJSONEncoder)
-        extra_context = extra_context or {"chart_data": as_json}
+        today = date.today()
+        extra_context = extra_context or {
+            'chart_currencies': currency_codes(),
+            'chart_date_from': today - timedelta(days=CHART_DAYS),
+            'chart_date_to': today,
+        }
 
         # Call the superclass changelist_view to render the page
         return super().changelist_view(request, extra_context=extra_context)
@@ -170,3 +227,43 @@ def currency_converter_admin(request: Any) -> HttpResponse:
 
     template = loader.get_template('admin/currencyconverter.html')
     return HttpResponse(template.render(context, request))
+
+
+@staff_member_required
+def profiles_admin(request: Any) -> HttpResponse:
+    """List of the stored request profiles.
+
+    Args:
+        request: The request object
+
+    Returns:
+        the profiles view
+    """
+    context = {'title': 'Request profiles', 'profiles': list_profiles()}
+    template = loader.get_template('admin/profiles.html')
+    return HttpResponse(template.render(context, request))
+
+
+@staff_member_required
+def profile_admin(request: Any, name: str) -> HttpResponse:
+    """Report of a stored request profile, or its .prof file with ?download=1.
+
+    Args:
+        request: The request object
+        name: The name of the profile
+
+    Returns:
+        the profile view
+
+    Raises:
+        Http404: there is no such profile
+    """
+    try:
+        if request.GET.get('download') == '1':
+            return FileResponse(open(profile_path(name), 'rb'), as_attachment=True, filename=f'{name}.prof')
+        report = profile_stats(name, request.GET.get('sort', SORT_KEYS[0]))
+    except FileNotFoundError:
+        raise Http404('Profile not found')
+    context = {'title': f'Request profile {name}', 'name': name, 'report': report, 'sort_keys': SORT_KEYS}
+    template = loader.get_template('admin/profile.html')
+    return HttpResponse(template.render(context, request))
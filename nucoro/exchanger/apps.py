@@ -5,3 +5,7 @@ from django.apps import AppConfig  # type: ignore
 class ExchangerConfig(AppConfig):
     """App config of the Exchanger."""
     name = 'exchanger'
+
+    def ready(self) -> None:
+        """Connect the signal receivers."""
+        from exchanger import currencies, push, rollups, versions  # noqa: F401
@@ -0,0 +1,4 @@
+"""SQLite backend for concurrent readers and writers.
+
+Backport of the transaction_mode and init_command OPTIONS of the SQLite backend of Django 5.1.
+"""
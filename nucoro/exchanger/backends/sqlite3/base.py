@@ -0,0 +1,48 @@
+"""SQLite database wrapper module."""
+from typing import Any, Optional
+
+from django.db.backends.sqlite3 import base  # type: ignore
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite database wrapper with the transaction_mode and init_command options.
+
+    With transaction_mode IMMEDIATE, transactions take the write lock when they begin, waiting for it up
+    to the timeout option. With the default (deferred) mode, a transaction that reads and then writes, like
+    update_or_create, fails with "database is locked" right away when another connection is writing.
+    init_command holds the statements (";" separated) run on every new connection, like PRAGMAs.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.transaction_mode: Optional[str] = None
+        self.init_command: Optional[str] = None
+
+    def get_connection_params(self) -> dict:
+        """Returns the arguments of sqlite3.connect, without the options of this wrapper.
+
+        Returns:
+            the connection arguments
+        """
+        kwargs = super().get_connection_params()
+        self.transaction_mode = kwargs.pop('transaction_mode', None)
+        self.init_command = kwargs.pop('init_command', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params: dict) -> Any:
+        """Open a connection and run the init command on it.
+
+        Args:
+            conn_params: the arguments of sqlite3.connect
+
+        Returns:
+            the connection
+        """
+        conn = super().get_new_connection(conn_params)
+        for statement in (self.init_command or '').split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self) -> None:
+        self.cursor().execute(f'BEGIN {self.transaction_mode}' if self.transaction_mode else 'BEGIN')
@@ -0,0 +1,80 @@
+"""Charts module.
+
+Builds the data of the rates chart of the admin, downsampled to a bounded number of points and cached
+until rates of the source currency are written again.
+"""
+from datetime import date
+from math import ceil
+from typing import Dict, List, Optional
+
+from django.conf import settings  # type: ignore
+from django.core.cache import cache  # type: ignore
+
+from exchanger.currencies import currency_code, currency_codes, currency_id
+from exchanger.models import CurrencyExchangeRate, CurrencyExchangeRateAggregate
+from exchanger.versions import get_version
+
+CHART_POINTS = 200
+
+
+def _chart_rows(source_currency: str, date_from: date, date_to: date, points: int) -> List[tuple]:
+    days = (date_to - date_from).days + 1
+    if days <= points:
+        return list(CurrencyExchangeRate.objects.filter(
+            source_currency_id=currency_id(source_currency), valuation_date__gte=date_from, valuation_date__lte=date_to
+        ).order_by('valuation_date').values_list('valuation_date', 'exchanged_currency_id', 'rate_value'))
+    interval = CurrencyExchangeRateAggregate.WEEK if ceil(days / 7) <= points else CurrencyExchangeRateAggregate.MONTH
+    return list(CurrencyExchangeRateAggregate.objects.filter(
+        source_currency_id=currency_id(source_currency), interval=interval, period_start__gte=date_from,
+        period_start__lte=date_to
+    ).order_by('period_start').values_list('period_start', 'exchanged_currency_id', 'close_value'))
+
+
+def build_chart_data(source_currency: str, date_from: date, date_to: date, points: int = CHART_POINTS) -> dict:
+    """Build the labels and the dataset of each currency of the rates chart.
+
+    Ranges longer than points days are read from the weekly or monthly aggregates (closing rate of
+    each period) and thinned out if they still have too many periods.
+
+    Args:
+        source_currency: code of the source currency
+        date_from: first date of the chart
+        date_to: last date of the chart
+        points: maximum number of points per dataset
+
+    Returns:
+        a dict with the labels and the datasets of the chart
+    """
+    codes = currency_codes()
+    data: Dict[str, Dict[str, Optional[float]]] = {}
+    for label, pk, rate_value in _chart_rows(source_currency, date_from, date_to, points):
+        data.setdefault(str(label), dict.fromkeys(codes))[currency_code(pk)] = rate_value
+    labels = list(data)
+    if len(labels) > points:
+        step = ceil(len(labels) / points)
+        labels = labels[::step]
+    return {'labels': labels, 'datasets': {code: [data[label][code] for label in labels] for code in codes}}
+
+
+def get_chart_data(source_currency: str, date_from: date, date_to: date, points: int = CHART_POINTS) -> dict:
+    """Cached version of build_chart_data.
+
+    The cache key contains the write version of the source currency pairs, so the cached data
+    is dropped as soon as one of its rates is written.
+
+    Args:
+        source_currency: code of the source currency
+        date_from: first date of the chart
+        date_to: last date of the chart
+        points: maximum number of points per dataset
+
+    Returns:
+        a dict with the labels and the datasets of the chart
+    """
+    version, updated_at = get_version(source_currency)
+    key = f'exchanger:chart:{source_currency}:{date_from}:{date_to}:{points}:{version}:{updated_at}'.replace(' ', '_')
+    chart_data = cache.get(key)
+    if chart_data is None:
+        chart_data = build_chart_data(source_currency, date_from, date_to, points)
+        cache.set(key, chart_data, settings.CHART_CACHE_TIMEOUT)
+    return chart_data
@@ -0,0 +1,167 @@
+"""Currencies module.
+
+A registry of the currencies kept in the memory of the process, so codes are resolved to ids (and back)
+without queries and the rates are filtered on their integer foreign keys. It is loaded on first use,
+dropped by the Currency save and delete signals of this process and loaded again after
+CURRENCY_REGISTRY_TIMEOUT seconds (for the changes made by other processes) or when an unknown code is
+looked up (for the currencies created by other processes). A currency saved in a transaction that is
+rolled back stays in it until it is loaded again.
+"""
+import threading
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from django.conf import settings  # type: ignore
+from django.db import transaction  # type: ignore
+from django.db.models.signals import post_delete, post_save  # type: ignore
+from django.dispatch import receiver  # type: ignore
+
+from exchanger.models import Currency
+from exchanger.routers import PRIMARY, use_primary
+
+FIELDS = ('id', 'code', 'name', 'symbol')
+
+
+class CurrencyInfo(NamedTuple):
+    """Fields of a currency."""
+    id: int
+    code: str
+    name: str
+    symbol: str
+
+
+class Registry(NamedTuple):
+    """Currencies loaded at a point in time, by code and by id."""
+    by_code: Dict[str, CurrencyInfo]
+    by_id: Dict[int, CurrencyInfo]
+    codes: List[str]
+    expires: float
+
+
+_registry: Optional[Registry] = None
+_lock = threading.Lock()
+
+
+def _load() -> Registry:
+    global _registry
+    with _lock:
+        with use_primary():
+            currencies = [CurrencyInfo(*row) for row in Currency.objects.order_by('code').values_list(*FIELDS)]
+        _registry = Registry({currency.code: currency for currency in currencies},
+                             {currency.id: currency for currency in currencies},
+                             [currency.code for currency in currencies],
+                             time.monotonic() + settings.CURRENCY_REGISTRY_TIMEOUT)
+        return _registry
+
+
+def get_registry() -> Registry:
+    """Returns the currencies of the registry, loading them when needed.
+
+    Returns:
+        the registry
+    """
+    registry = _registry
+    if registry is None or registry.expires < time.monotonic():
+        registry = _load()
+    return registry
+
+
+def clear_registry() -> None:
+    """Drop the registry, so it is loaded again on next use."""
+    global _registry
+    _registry = None
+
+
+def currency_codes() -> List[str]:
+    """Returns the codes of every currency.
+
+    Returns:
+        the codes in alphabetical order
+    """
+    return get_registry().codes
+
+
+def get_currency_info(code: str) -> Optional[CurrencyInfo]:
+    """Returns the fields of a currency, loading the registry again if the code is unknown.
+
+    Args:
+        code: the currency code
+
+    Returns:
+        the fields of the currency, None if it does not exist
+    """
+    currency = get_registry().by_code.get(code)
+    if currency is None:
+        currency = _load().by_code.get(code)
+    return currency
+
+
+def currency_id(code: str) -> Optional[int]:
+    """Returns the id of a currency, to filter on the foreign keys of the rates.
+
+    Args:
+        code: the currency code
+
+    Returns:
+        the id, None if the currency does not exist (so the filters match nothing)
+    """
+    currency = get_currency_info(code)
+    return currency.id if currency else None
+
+
+def currency_ids(codes: Iterable[str]) -> Dict[str, int]:
+    """Returns the ids of some currencies.
+
+    Args:
+        codes: the currency codes
+
+    Returns:
+        the ids by code, without the currencies that do not exist
+    """
+    return {code: currency.id for code, currency in ((code, get_currency_info(code)) for code in codes) if currency}
+
+
+def currency_code(pk: int) -> Optional[str]:
+    """Returns the code of a currency.
+
+    Args:
+        pk: the currency id
+
+    Returns:
+        the code, None if the currency does not exist
+    """
+    currency = get_registry().by_id.get(pk)
+    if currency is None:
+        currency = _load().by_id.get(pk)
+    return currency.code if currency else None
+
+
+def get_currency(code: str) -> Currency:
+    """Returns a Currency instance built from the registry, like Currency.objects.get(code=code) without the query.
+
+    Args:
+        code: the currency code
+
+    Returns:
+        the currency
+
+    Raises:
+        DoesNotExist: the currency does not exist (Currency.DoesNotExist)
+    """
+    currency = get_currency_info(code)
+    if currency is None:
+        raise Currency.DoesNotExist(f'Currency {code} does not exist')
+    return Currency.from_db(PRIMARY, FIELDS, currency)
+
+
+@receiver(post_save, sender=Currency)
+@receiver(post_delete, sender=Currency)
+def currency_changed(sender: Any, **kwargs) -> None:
+    """Drop the registry when a currency is saved or deleted, and again on commit in case another thread loaded it before.
+
+    Args:
+        sender: the sender of the signal
+        kwargs: extra signal arguments
+    """
+    clear_registry()
+    transaction.on_commit(clear_registry)
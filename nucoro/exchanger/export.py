@@ -0,0 +1,182 @@
+"""Export module.
+
+Bulk export of the stored rates for warehouses, as gzip compressed CSV or as Parquet (with pyarrow). The
+rates are read with a chunked cursor in table order and written chunk by chunk, so the memory used does
+not depend on the number of exported rates.
+
+Incremental exports use the write sequence as a last-modified watermark: an export only contains the
+rates written up to the watermark taken when it starts, and the next one asks for the rates written
+after it (see the changes feed, which numbers the writes the same way).
+"""
+from datetime import date
+from importlib.util import find_spec
+from typing import Iterator, List, NamedTuple, Optional
+import zlib
+
+from django.db.models import Max  # type: ignore
+
+from exchanger.currencies import currency_code, currency_ids
+from exchanger.models import CurrencyExchangeRate
+
+EXPORT_CSV = 'csv'
+EXPORT_PARQUET = 'parquet'
+EXPORT_FORMATS = (EXPORT_CSV, EXPORT_PARQUET)
+EXPORT_CONTENT_TYPES = {EXPORT_CSV: 'application/gzip', EXPORT_PARQUET: 'application/vnd.apache.parquet'}
+EXPORT_EXTENSIONS = {EXPORT_CSV: 'csv.gz', EXPORT_PARQUET: 'parquet'}
+EXPORT_COLUMNS = ['source_currency', 'exchanged_currency', 'valuation_date', 'rate_value', 'write_sequence']
+EXPORT_CHUNK_SIZE = 10000
+# pyarrow is optional and only imported by the Parquet exports
+PARQUET_AVAILABLE = find_spec('pyarrow') is not None
+
+
+class ExportFilter(NamedTuple):
+    """Rates of an export: currency codes (None for all), valuation dates and write sequences (both included)."""
+    sources: Optional[List[str]] = None
+    currencies: Optional[List[str]] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    since: int = 0
+    until: Optional[int] = None
+
+
+def export_watermark() -> int:
+    """Returns the write sequence of the last written rate, the watermark of an export starting now.
+
+    Returns:
+        the last write sequence, 0 if no rate was written
+    """
+    return CurrencyExchangeRate.objects.aggregate(watermark=Max('write_sequence'))['watermark'] or 0
+
+
+def iter_export_rows(export_filter: ExportFilter, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[List[tuple]]:
+    """Yield the filtered rates in chunks, read through a chunked cursor in table order.
+
+    Args:
+        export_filter: the rates to export
+        chunk_size: rates per chunk
+
+    Yields:
+        lists of rates, as tuples with the values of EXPORT_COLUMNS
+    """
+    rates = CurrencyExchangeRate.objects.filter(write_sequence__gt=export_filter.since)
+    if export_filter.until is not None:
+        rates = rates.filter(write_sequence__lte=export_filter.until)
+    if export_filter.sources is not None:
+        rates = rates.filter(source_currency_id__in=currency_ids(export_filter.sources).values())
+    if export_filter.currencies is not None:
+        rates = rates.filter(exchanged_currency_id__in=currency_ids(export_filter.currencies).values())
+    if export_filter.date_from:
+        rates = rates.filter(valuation_date__gte=export_filter.date_from)
+    if export_filter.date_to:
+        rates = rates.filter(valuation_date__lte=export_filter.date_to)
+    rows = rates.order_by('pk').values_list(
+        'source_currency_id', 'exchanged_currency_id', 'valuation_date', 'rate_value', 'write_sequence'
+    ).iterator(chunk_size=chunk_size)
+    chunk = []
+    for source_id, exchanged_id, valuation_date, rate_value, write_sequence in rows:
+        chunk.append((currency_code(source_id), currency_code(exchanged_id), valuation_date, rate_value, write_sequence))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _csv_gzip(chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    yield compressor.compress((','.join(EXPORT_COLUMNS) + '\n').encode())
+    for chunk in chunks:
+        lines = ''.join(f'{source},{exchanged},{valuation_date},{rate_value},{write_sequence}\n'
+                        for source, exchanged, valuation_date, rate_value, write_sequence in chunk)
+        compressed = compressor.compress(lines.encode())
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class _ParquetSink:
+    """Write-only file that keeps what is written until it is taken, to stream a Parquet file."""
+
+    closed = False
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.position = 0
+
+    def write(self, data: bytes) -> int:
+        """Keep written data.
+
+        Args:
+            data: the written data
+
+        Returns:
+            the number of bytes written
+        """
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        """Returns the position in the file.
+
+        Returns:
+            the number of bytes written so far
+        """
+        return self.position
+
+    def flush(self) -> None:
+        """Nothing to flush, the data is kept until taken."""
+
+    def close(self) -> None:
+        """Mark the file as closed."""
+        self.closed = True
+
+    def take(self) -> bytes:
+        """Returns the data written since the last call.
+
+        Returns:
+            the data
+        """
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def _parquet(chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    import pyarrow  # type: ignore
+    import pyarrow.parquet  # type: ignore
+
+    schema = pyarrow.schema([
+        ('source_currency', pyarrow.string()), ('exchanged_currency', pyarrow.string()),
+        ('valuation_date', pyarrow.date32()), ('rate_value', pyarrow.decimal128(18, 6)),
+        ('write_sequence', pyarrow.int64()),
+    ])
+    sink = _ParquetSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression='snappy')
+    for chunk in chunks:
+        writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(zip(*chunk), schema)], schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def export_rates(export_format: str, chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    """Yield the content of an export file, as gzip compressed CSV or as Parquet (one row group per chunk).
+
+    The format is checked right away, before anything is read.
+
+    Args:
+        export_format: EXPORT_CSV or EXPORT_PARQUET
+        chunks: the rates, from iter_export_rows
+
+    Returns:
+        the parts of the file
+
+    Raises:
+        ValueError: the format is not supported, or is Parquet and pyarrow is not installed
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format: {export_format}')
+    if export_format == EXPORT_PARQUET and not PARQUET_AVAILABLE:
+        raise ValueError('Parquet exports need pyarrow')
+    return _csv_gzip(chunks) if export_format == EXPORT_CSV else _parquet(chunks)
@@ -1,47 +1,295 @@
 """Interactors module."""
 from collections import defaultdict
-from datetime import date, timedelta
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import Optional
+from functools import partial
+from itertools import groupby
+import logging
+from operator import itemgetter
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
+from django.conf import settings  # type: ignore
+from django.core.exceptions import ImproperlyConfigured  # type: ignore
+from django.db import connection, transaction  # type: ignore
+from django.utils import timezone  # type: ignore
 import django_rq  # type: ignore
 
+from exchanger import writebehind
 from exchanger.adapter import Adapter
+from exchanger.currencies import currency_code, currency_codes, currency_id, currency_ids, get_currency
 from exchanger.exceptions import ProviderUnavailable
-from exchanger.models import Currency, CurrencyExchangeRate, CurrencyProvider
+from exchanger.metrics import PROVIDER_DURATION
+from exchanger.models import CurrencyExchangeRate, CurrencyExchangeRateAggregate, CurrencyProvider, reserve_write_sequence
+from exchanger.quota import PRIORITY_BACKGROUND, QuotaExceeded, request_priority
+from exchanger.rollups import period_start, RATE_QUANTUM
+from exchanger.signals import rates_written
 
+logger = logging.getLogger(__name__)
 
-def get_exchange_rates(source_currency: str, date_from: date, date_to: date) -> dict:
+FILL_PROVIDER = 'provider'
+FILL_FORWARD = 'forward'
+FILL_INTERPOLATE = 'interpolate'
+FILL_POLICIES = (FILL_PROVIDER, FILL_FORWARD, FILL_INTERPOLATE)
+
+ALL_CURRENCIES = 'all'
+
+INTERVAL_DAY = 'day'
+INTERVALS = (INTERVAL_DAY, CurrencyExchangeRateAggregate.WEEK, CurrencyExchangeRateAggregate.MONTH)
+
+STREAM_CHUNK_SIZE = 2000
+
+CHANGES_LIMIT = 1000
+
+HEDGE_WORKERS = 8
+
+OUTCOME_OK = 'ok'
+OUTCOME_UNAVAILABLE = 'unavailable'
+OUTCOME_QUOTA_EXCEEDED = 'quota_exceeded'
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+_hedge_pool_lock = threading.Lock()
+
+
+def split_currencies(currencies: str) -> Optional[List[str]]:
+    """Split a comma separated list of currency codes.
+
+    Args:
+        currencies: the codes separated by commas, or ALL_CURRENCIES
+
+    Returns:
+        the codes, None for ALL_CURRENCIES
+    """
+    return None if currencies == ALL_CURRENCIES else currencies.split(',')
+
+
+def get_exchange_rates(source_currency: str, date_from: date, date_to: date, fill: str = FILL_PROVIDER,
+                       interval: str = INTERVAL_DAY) -> dict:
     """Retrieve the exchange rates in all accepted currencies.
 
     Args:
         source_currency: The source currency to get rates
         date_from: from which date retrieve the rates
         date_to: until which date retrieve the dates
+        fill: how missing rates are filled. FILL_PROVIDER asks the providers (and stores the result),
+            FILL_FORWARD repeats the last known rate and FILL_INTERPOLATE interpolates linearly between
+            the known rates. The last two are computed in memory and never call a provider.
+        interval: INTERVAL_DAY for daily rates, or week/month to read the stored aggregates instead
 
     Returns:
         A dict that contains for each date the rate of each currency
     """
-    currencies = Currency.objects.all().values_list('code', flat=True)
-    exchanges = CurrencyExchangeRate.objects.filter(
-        source_currency__code=source_currency, valuation_date__gte=date_from,
-        valuation_date__lte=date_to).select_related('exchanged_currency')
-    dict_of_exchanges = defaultdict(dict)  # type: ignore
+    return get_exchange_rates_by_source([source_currency], date_from, date_to, fill, interval)[source_currency]
+
+
+def get_exchange_rates_by_source(source_currencies: Optional[List[str]], date_from: date, date_to: date,
+                                 fill: str = FILL_PROVIDER, interval: str = INTERVAL_DAY) -> Dict[str, dict]:
+    """Retrieve the exchange rates of several source currencies in all accepted currencies, with one range query.
+
+    A rate fetched from the providers to fill a gap is stored with its reverse, so it also fills the
+    reverse gap when the other currency is one of the sources.
+
+    Args:
+        source_currencies: The source currencies to get rates, None for all of them
+        date_from: from which date retrieve the rates
+        date_to: until which date retrieve the dates
+        fill: how missing rates are filled, see get_exchange_rates
+        interval: INTERVAL_DAY for daily rates, or week/month to read the stored aggregates instead
+
+    Returns:
+        A dict that contains for each source currency the rates of each date and currency
+
+    Raises:
+        ValueError: the fill policy or the interval is not supported
+    """
+    if fill not in FILL_POLICIES:
+        raise ValueError(f'Unknown fill policy: {fill}')
+    if interval not in INTERVALS:
+        raise ValueError(f'Unknown interval: {interval}')
+    if interval != INTERVAL_DAY:
+        return get_exchange_rate_aggregates_by_source(source_currencies, date_from, date_to, interval)
+    currencies = currency_codes()
+    sources = currencies if source_currencies is None else source_currencies
+    exchanges = CurrencyExchangeRate.objects.filter(valuation_date__gte=date_from, valuation_date__lte=date_to)
+    if source_currencies is not None:
+        exchanges = exchanges.filter(source_currency_id__in=currency_ids(sources).values())
+    tables: Dict[str, dict] = {source: defaultdict(dict) for source in sources}
+
+    for source_currency_id, valuation_date, exchanged_currency_id, rate_value in exchanges.values_list(
+            'source_currency_id', 'valuation_date', 'exchanged_currency_id', 'rate_value'):
+        tables[currency_code(source_currency_id)][str(valuation_date)][currency_code(exchanged_currency_id)] = rate_value
+
+    if fill != FILL_PROVIDER:
+        for source_currency, dict_of_exchanges in tables.items():
+            _fill_gaps(dict_of_exchanges, source_currency, currencies, date_from, date_to, fill)
+        return tables
 
-    for exchange in exchanges:
-        dict_of_exchanges[str(exchange.valuation_date)][exchange.exchanged_currency.code] = exchange.rate_value
+    _fill_from_providers(tables, currencies, date_from, date_to)
+    return tables
 
+
+def _fill_from_providers(tables: Dict[str, dict], currencies: List[str], date_from: date, date_to: date) -> None:
     delta = timedelta(days=1)
     while date_from <= date_to:
-        if str(date_from) not in dict_of_exchanges:
-            dict_of_exchanges[str(date_from)] = {}
-        for currency in currencies:
-            if currency not in dict_of_exchanges[str(date_from)]:
-                exchange = _get_exchange_rate(source_currency, currency, date_from)
-                dict_of_exchanges[str(date_from)][currency] = exchange.rate_value
+        day = str(date_from)
+        for source_currency, dict_of_exchanges in tables.items():
+            for currency in currencies:
+                if currency not in dict_of_exchanges[day]:
+                    exchange = _get_exchange_rate(source_currency, currency, date_from, deferred=True)
+                    dict_of_exchanges[day][currency] = exchange.rate_value
+                    if currency in tables and source_currency not in tables[currency][day]:
+                        tables[currency][day][source_currency] = (1 / Decimal(exchange.rate_value)).quantize(RATE_QUANTUM)
         date_from += delta
 
-    return dict_of_exchanges
+
+def iter_exchange_rates(source_currency: str, date_from: date, date_to: date,
+                        fill: Optional[str] = None) -> Iterator[Tuple[str, dict]]:
+    """Yield the stored exchange rates date by date, reading them through a server-side cursor.
+
+    Unlike get_exchange_rates nothing is kept in memory besides the current date, so the
+    memory used does not depend on the length of the range.
+
+    Args:
+        source_currency: The source currency to get rates
+        date_from: from which date retrieve the rates
+        date_to: until which date retrieve the dates
+        fill: None to yield only the stored rates, or FILL_FORWARD to yield every date
+            repeating the last known rate of each currency
+
+    Yields:
+        A tuple with the date and a dict with the rate of each currency
+
+    Raises:
+        ValueError: the fill policy is not supported while streaming
+    """
+    if fill not in (None, FILL_FORWARD):
+        raise ValueError(f'Fill policy not supported while streaming: {fill}')
+    rows = CurrencyExchangeRate.objects.filter(
+        source_currency_id=currency_id(source_currency), valuation_date__gte=date_from, valuation_date__lte=date_to
+    ).order_by('valuation_date').values_list(
+        'valuation_date', 'exchanged_currency_id', 'rate_value').iterator(chunk_size=STREAM_CHUNK_SIZE)
+    days = groupby(rows, key=itemgetter(0))
+
+    if fill is None:
+        for valuation_date, day_rows in days:
+            yield str(valuation_date), {currency_code(pk): rate_value for _, pk, rate_value in day_rows}
+        return
+
+    known: dict = {}
+    for currency in currency_codes():
+        if currency == source_currency:
+            known[currency] = Decimal(1)
+        else:
+            previous = _previous_rate(source_currency, currency, date_from)
+            known[currency] = previous[1] if previous else None
+    pending = next(days, None)
+    delta = timedelta(days=1)
+    while date_from <= date_to:
+        if pending and pending[0] == date_from:
+            known.update({currency_code(pk): rate_value for _, pk, rate_value in pending[1]})
+            pending = next(days, None)
+        yield str(date_from), dict(known)
+        date_from += delta
+
+
+def get_exchange_rate_aggregates(source_currency: str, date_from: date, date_to: date, interval: str) -> dict:
+    """Retrieve the weekly or monthly aggregates of the rates in all accepted currencies.
+
+    Args:
+        source_currency: The source currency to get rates
+        date_from: from which date retrieve the aggregates (its period is included)
+        date_to: until which date retrieve the aggregates
+        interval: CurrencyExchangeRateAggregate.WEEK or CurrencyExchangeRateAggregate.MONTH
+
+    Returns:
+        A dict that contains for each period start the open, high, low, close and mean rate of each currency
+    """
+    return get_exchange_rate_aggregates_by_source([source_currency], date_from, date_to, interval)[source_currency]
+
+
+def get_exchange_rate_aggregates_by_source(source_currencies: Optional[List[str]], date_from: date, date_to: date,
+                                           interval: str) -> Dict[str, dict]:
+    """Retrieve the weekly or monthly aggregates of several source currencies, with one range query.
+
+    Args:
+        source_currencies: The source currencies to get rates, None for all of them
+        date_from: from which date retrieve the aggregates (its period is included)
+        date_to: until which date retrieve the aggregates
+        interval: CurrencyExchangeRateAggregate.WEEK or CurrencyExchangeRateAggregate.MONTH
+
+    Returns:
+        A dict that contains for each source currency the aggregates of each period start and currency
+    """
+    aggregates = CurrencyExchangeRateAggregate.objects.filter(
+        interval=interval, period_start__gte=period_start(interval, date_from), period_start__lte=date_to)
+    if source_currencies is not None:
+        aggregates = aggregates.filter(source_currency_id__in=currency_ids(source_currencies).values())
+    sources = currency_codes() if source_currencies is None else source_currencies
+    tables: Dict[str, dict] = {source: defaultdict(dict) for source in sources}
+
+    for aggregate in aggregates.order_by('period_start'):
+        tables[currency_code(aggregate.source_currency_id)][str(aggregate.period_start)][
+            currency_code(aggregate.exchanged_currency_id)] = {
+            'open': aggregate.open_value,
+            'high': aggregate.high_value,
+            'low': aggregate.low_value,
+            'close': aggregate.close_value,
+            'mean': aggregate.mean_value,
+        }
+    return tables
+
+
+def _fill_gaps(dict_of_exchanges: dict, source_currency: str, currencies: List[str], date_from: date, date_to: date,
+               fill: str) -> None:
+    days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+    for day in days:
+        dict_of_exchanges.setdefault(str(day), {})
+    for currency in currencies:
+        series = [dict_of_exchanges[str(day)].get(currency) for day in days]
+        if currency == source_currency:
+            series = [Decimal(1) if value is None else value for value in series]
+        elif None in series:
+            series = _fill_series(source_currency, currency, days, series, fill)
+        for day, value in zip(days, series):
+            dict_of_exchanges[str(day)][currency] = value
+
+
+def _fill_series(source_currency: str, exchanged_currency: str, days: List[date], series: List[Optional[Decimal]],
+                 fill: str) -> List[Optional[Decimal]]:
+    previous: Optional[Tuple[date, Decimal]] = None
+    if series[0] is None:
+        previous = _previous_rate(source_currency, exchanged_currency, days[0])
+    following: Optional[Tuple[date, Decimal]] = None
+    if fill == FILL_INTERPOLATE and series[-1] is None:
+        following = CurrencyExchangeRate.objects.filter(
+            source_currency_id=currency_id(source_currency), exchanged_currency_id=currency_id(exchanged_currency),
+            valuation_date__gt=days[-1]).order_by('valuation_date').values_list('valuation_date', 'rate_value').first()
+
+    upcoming: List[Optional[Tuple[date, Decimal]]] = [following] * len(days)
+    for index in range(len(days) - 2, -1, -1):
+        following_value = series[index + 1]
+        upcoming[index] = (days[index + 1], following_value) if following_value is not None else upcoming[index + 1]
+
+    filled: List[Optional[Decimal]] = []
+    for index, (day, value) in enumerate(zip(days, series)):
+        if value is not None:
+            previous = (day, value)
+        elif previous is not None:
+            value = previous[1]
+            nearest = upcoming[index]
+            if fill == FILL_INTERPOLATE and nearest is not None:
+                step = Decimal((day - previous[0]).days) / Decimal((nearest[0] - previous[0]).days)
+                value = (previous[1] + (nearest[1] - previous[1]) * step).quantize(RATE_QUANTUM)
+        filled.append(value)
+    return filled
+
+
+def _previous_rate(source_currency: str, exchanged_currency: str, day: date) -> Optional[Tuple[date, Decimal]]:
+    return CurrencyExchangeRate.objects.filter(
+        source_currency_id=currency_id(source_currency), exchanged_currency_id=currency_id(exchanged_currency),
+        valuation_date__lt=day).order_by('-valuation_date').values_list('valuation_date', 'rate_value').first()
 
 
 def currency_converter(source_currency: str, exchanged_currency: str, amount: Decimal) -> dict:
@@ -56,7 +304,7 @@ def currency_converter(source_currency: str, exchanged_currency: str, amount: De
         A dict with the amount after exchange plus other useful info
     """
     exchanges = CurrencyExchangeRate.objects.filter(
-        source_currency__code=source_currency, exchanged_currency__code=exchanged_currency)
+        source_currency_id=currency_id(source_currency), exchanged_currency_id=currency_id(exchanged_currency))
     exchange = exchanges.order_by('-valuation_date').first()
     last_date = date.today()
     delta = timedelta(days=1)
@@ -76,7 +324,7 @@ def currency_converter(source_currency: str, exchanged_currency: str, amount: De
     else:
         start_date = last_date - timedelta(days=30)
     while last_date > start_date:
-        last_exchange = _get_exchange_rate(source_currency, exchanged_currency, last_date)
+        last_exchange = _get_exchange_rate(source_currency, exchanged_currency, last_date, deferred=True)
         if last_exchange:
             response.update({
                             'rate_value': last_exchange.rate_value,
@@ -99,18 +347,15 @@ def time_weight_rate(source_currency: str, exchanged_currency: str, amount: Deci
     Returns:
         A dict with the twr and other useful information
     """
+    pair = {'source_currency_id': currency_id(source_currency), 'exchanged_currency_id': currency_id(exchanged_currency)}
     try:
-        start_date_exchange_rate = CurrencyExchangeRate.objects.get(source_currency__code=source_currency,
-                                                                    exchanged_currency__code=exchanged_currency,
-                                                                    valuation_date=start_date)
+        start_date_exchange_rate = CurrencyExchangeRate.objects.get(valuation_date=start_date, **pair)
     except CurrencyExchangeRate.DoesNotExist:
-        start_date_exchange_rate = _get_exchange_rate(source_currency, exchanged_currency, start_date)
+        start_date_exchange_rate = _get_exchange_rate(source_currency, exchanged_currency, start_date, deferred=True)
     try:
-        today_exchange_rate = CurrencyExchangeRate.objects.get(source_currency__code=source_currency,
-                                                               exchanged_currency__code=exchanged_currency,
-                                                               valuation_date=date.today())
+        today_exchange_rate = CurrencyExchangeRate.objects.get(valuation_date=date.today(), **pair)
     except CurrencyExchangeRate.DoesNotExist:
-        today_exchange_rate = _get_exchange_rate(source_currency, exchanged_currency, date.today())
+        today_exchange_rate = _get_exchange_rate(source_currency, exchanged_currency, date.today(), deferred=True)
     initial_amount_exchanged = amount * start_date_exchange_rate.rate_value
     final_amount_source = initial_amount_exchanged / today_exchange_rate.rate_value
     twr = (final_amount_source - amount) / amount
@@ -125,18 +370,121 @@ def time_weight_rate(source_currency: str, exchanged_currency: str, amount: Deci
     return response
 
 
-def _get_exchange_rate(source_currency: str, exchanged_currency: str, valuation_date: date) -> Optional[CurrencyExchangeRate]:
-    for provider in CurrencyProvider.objects.order_by('priority'):
+def _get_exchange_rate(source_currency: str, exchanged_currency: str, valuation_date: date,
+                       deferred: bool = False) -> Optional[CurrencyExchangeRate]:
+    deferred = deferred and settings.RATES_WRITE_BEHIND
+    if deferred:
+        pending = writebehind.pending_rate(source_currency, exchanged_currency, valuation_date)
+        if pending:
+            return pending
+    providers = list(CurrencyProvider.objects.order_by('priority'))
+    if settings.RATES_HEDGE_AFTER is not None:
+        return _get_hedged_exchange_rate(source_currency, exchanged_currency, valuation_date, providers, deferred)
+    for provider in providers:
         try:
-            return get_exchange_rate_data(source_currency, exchanged_currency, valuation_date, provider)
+            rate_value = fetch_exchange_rate(source_currency, exchanged_currency, valuation_date, provider)
         except ProviderUnavailable:
-            pass
+            continue
+        return store_exchange_rate(source_currency, exchanged_currency, valuation_date, rate_value, deferred)
     return None
 
 
-def get_exchange_rate_data(source_currency: str, exchanged_currency: str, valuation_date: date,
-                           provider: CurrencyProvider) -> CurrencyExchangeRate:
-    """Returns a CurrencyExchangeRate generated with data from the given provider.
+def _get_hedge_pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(HEDGE_WORKERS, thread_name_prefix='rates-hedge')
+        return _hedge_pool
+
+
+def _in_hedge_thread(function: Callable, *args) -> Any:
+    try:
+        return function(*args)
+    finally:
+        connection.close()
+
+
+class _HedgeOutcome:
+    """Priority of the provider whose value is stored, so late answers only overwrite lower priorities."""
+
+    def __init__(self, index: int, deferred: bool):
+        self.index = index
+        self.deferred = deferred
+        self.lock = threading.Lock()
+
+    def store_late(self, source_currency: str, exchanged_currency: str, valuation_date: date, index: int,
+                   deadline: float, future: Future) -> None:
+        """Store the value of a higher priority provider that answered after the stored one.
+
+        Args:
+            source_currency: The source currency of the rate
+            exchanged_currency: The currency of the rate
+            valuation_date: The date of the rate
+            index: position of the provider in the priority order
+            deadline: monotonic time after which the answer is discarded
+            future: the finished request to the provider
+        """
+        if future.exception() is not None or time.monotonic() > deadline:
+            return
+        with self.lock:
+            if index >= self.index:
+                return
+            self.index = index
+            _in_hedge_thread(store_exchange_rate, source_currency, exchanged_currency, valuation_date, future.result(),
+                             self.deferred)
+
+
+def _get_hedged_exchange_rate(source_currency: str, exchanged_currency: str, valuation_date: date,
+                              providers: List[CurrencyProvider], deferred: bool = False) -> Optional[CurrencyExchangeRate]:
+    """Returns a rate requesting the providers in priority order, without waiting for slow ones.
+
+    The next provider is also requested whenever an answer takes longer than RATES_HEDGE_AFTER seconds.
+    The first valid answer is stored and returned; the answers of higher priority providers arriving
+    within RATES_HEDGE_GRACE seconds after it overwrite it.
+
+    Args:
+        source_currency: The source currency of the rate
+        exchanged_currency: The currency of the rate
+        valuation_date: The date of the rate
+        providers: the providers in priority order
+        deferred: whether the rate is queued for the write behind instead of stored right away
+
+    Returns:
+        the stored rate, None when every provider failed
+    """
+    pool = _get_hedge_pool()
+    running: Dict[Future, int] = {}
+    launched = 0
+    timed_out = True
+    while True:
+        if launched < len(providers) and (timed_out or not running):
+            running[pool.submit(copy_context().run, _in_hedge_thread, fetch_exchange_rate, source_currency,
+                                exchanged_currency, valuation_date, providers[launched])] = launched
+            launched += 1
+        if not running:
+            return None
+        done, _ = wait(running, timeout=settings.RATES_HEDGE_AFTER, return_when=FIRST_COMPLETED)
+        timed_out = not done
+        for future in done:
+            if isinstance(future.exception(), ImproperlyConfigured):
+                future.result()  # a configuration error is raised instead of falling back to the next provider
+        answered = sorted(((running.pop(future), future) for future in done), key=itemgetter(0))
+        answered = [(index, future) for index, future in answered if future.exception() is None]
+        if answered:
+            index, future = answered[0]
+            outcome = _HedgeOutcome(index, deferred)
+            deadline = time.monotonic() + settings.RATES_HEDGE_GRACE
+            for pending, pending_index in running.items():
+                if pending_index < index:
+                    pending.add_done_callback(partial(pool.submit, outcome.store_late, source_currency,
+                                                      exchanged_currency, valuation_date, pending_index, deadline))
+            with outcome.lock:
+                return store_exchange_rate(source_currency, exchanged_currency, valuation_date, future.result(), deferred)
+
+
+def fetch_exchange_rate(source_currency: str, exchanged_currency: str, valuation_date: date,
+                        provider: CurrencyProvider) -> Decimal:
+    """Returns a rate value from the given provider, without storing it.
 
     Args:
         source_currency: The source currency to calculate rate
@@ -145,30 +493,104 @@ def get_exchange_rate_data(source_currency: str, exchanged_currency: str, valuat
         provider: The provider to get the rate from
 
     Returns:
-        CurrencyExchangeRate generated with data from the given provider
+        the rate value
 
     Raises:
         ProviderUnavailable: provider is not able to respond.
+        ImproperlyConfigured: provider is not configured, the next providers are not requested
     """
     adapter = Adapter(provider, source_currency, exchanged_currency, valuation_date)
+    outcome = OUTCOME_OK
+    started = time.perf_counter()
     try:
-        rate_value = adapter.get_exchange_rate(source_currency, exchanged_currency, valuation_date)
+        return adapter.get_exchange_rate(source_currency, exchanged_currency, valuation_date)
+    except ImproperlyConfigured:
+        outcome = OUTCOME_UNAVAILABLE
+        raise
     except Exception as e:
+        outcome = OUTCOME_QUOTA_EXCEEDED if isinstance(e, QuotaExceeded) else OUTCOME_UNAVAILABLE
         raise ProviderUnavailable(str(e))
-    source_currency_obj = Currency.objects.get(code=source_currency)
-    exchanged_currency_obj = Currency.objects.get(code=exchanged_currency)
-    currency_exchange, _ = CurrencyExchangeRate.objects.update_or_create(
-        source_currency=source_currency_obj, exchanged_currency=exchanged_currency_obj, valuation_date=valuation_date,
-        defaults={'rate_value': rate_value}
-    )
-
-    revert_currency_exchange, _ = CurrencyExchangeRate.objects.update_or_create(
-        source_currency=exchanged_currency_obj, exchanged_currency=source_currency_obj, valuation_date=valuation_date,
-        defaults={'rate_value': 1 / rate_value}
-    )
+    finally:
+        PROVIDER_DURATION.observe((provider.provider_type, outcome), time.perf_counter() - started)
+
+
+def store_exchange_rate(source_currency: str, exchanged_currency: str, valuation_date: date,
+                        rate_value: Decimal, deferred: bool = False) -> CurrencyExchangeRate:
+    """Stores a rate value and its reverse.
+
+    Args:
+        source_currency: The source currency of the rate
+        exchanged_currency: The currency of the rate
+        valuation_date: The date of the rate
+        rate_value: The value of the rate
+        deferred: whether the rate is queued for the write behind (see exchanger/writebehind.py) and
+            returned unsaved instead of stored right away
+
+    Returns:
+        the stored CurrencyExchangeRate
+    """
+    if deferred:
+        return writebehind.queue_rate(source_currency, exchanged_currency, valuation_date, rate_value)
+    source_currency_obj = get_currency(source_currency)
+    exchanged_currency_obj = get_currency(exchanged_currency)
+    with transaction.atomic():
+        write_sequence = reserve_write_sequence(2)
+        currency_exchange, _ = CurrencyExchangeRate.objects.update_or_create(
+            source_currency=source_currency_obj, exchanged_currency=exchanged_currency_obj, valuation_date=valuation_date,
+            defaults={'rate_value': rate_value, 'write_sequence': write_sequence}
+        )
+
+        revert_currency_exchange, _ = CurrencyExchangeRate.objects.update_or_create(
+            source_currency=exchanged_currency_obj, exchanged_currency=source_currency_obj, valuation_date=valuation_date,
+            defaults={'rate_value': 1 / rate_value, 'write_sequence': write_sequence + 1}
+        )
+    rates_written.send(sender=CurrencyExchangeRate, rates=[currency_exchange, revert_currency_exchange])
     return currency_exchange
 
 
+def get_exchange_rate_data(source_currency: str, exchanged_currency: str, valuation_date: date,
+                           provider: CurrencyProvider) -> CurrencyExchangeRate:
+    """Returns a CurrencyExchangeRate generated with data from the given provider.
+
+    Args:
+        source_currency: The source currency to calculate rate
+        exchanged_currency: The currency of which we want the rate
+        valuation_date: The date of the rate requested
+        provider: The provider to get the rate from
+
+    Returns:
+        CurrencyExchangeRate generated with data from the given provider
+    """
+    rate_value = fetch_exchange_rate(source_currency, exchanged_currency, valuation_date, provider)
+    return store_exchange_rate(source_currency, exchanged_currency, valuation_date, rate_value)
+
+
+def get_rate_changes(since: int, limit: int = CHANGES_LIMIT) -> dict:
+    """Returns the rates inserted or updated after a write sequence cursor.
+
+    Args:
+        since: the cursor, the write sequence of the last change already seen (0 for everything)
+        limit: maximum number of changes returned
+
+    Returns:
+        A dict with the changes in write order, the cursor to use next and whether there are more changes
+    """
+    changes = list(CurrencyExchangeRate.objects.filter(write_sequence__gt=since).order_by('write_sequence').values_list(
+        'write_sequence', 'source_currency_id', 'exchanged_currency_id', 'valuation_date', 'rate_value'
+    )[:limit + 1])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    return {
+        'next': changes[-1][0] if changes else since,
+        'has_more': has_more,
+        'results': [
+            {'sequence': sequence, 'source_currency': currency_code(source), 'exchanged_currency': currency_code(exchanged),
+             'valuation_date': str(valuation_date), 'rate_value': rate_value}
+            for sequence, source, exchanged, valuation_date, rate_value in changes
+        ],
+    }
+
+
 def get_async_data(source_currency: str, exchanged_currencies: str, date_from: date, date_to: date) -> None:
     """Generate the requested data in a async way using the mock provider.
 
@@ -188,3 +610,117 @@ def get_async_data(source_currency: str, exchanged_currencies: str, date_from: d
                 valuation_date=date_from, provider=provider
             )
             date_from += delta
+
+
+def _stored_pairs(valuation_date: date) -> Set[Tuple[int, int]]:
+    # Currency ids of the rates stored for a date
+    return set(CurrencyExchangeRate.objects.filter(valuation_date=valuation_date).values_list(
+        'source_currency_id', 'exchanged_currency_id'))
+
+
+def _is_stored(stored: Set[Tuple[int, int]], source_id: int, exchanged_id: int) -> bool:
+    return (source_id, exchanged_id) in stored and (exchanged_id, source_id) in stored
+
+
+def warm_todays_rates(refresh: bool = False, valuation_date: Optional[date] = None) -> dict:
+    """Store the rates of every currency pair for a date, so requests find them in the database.
+
+    Each stored rate also stores its reverse, so only one direction of every pair is requested (a currency
+    against itself included), and those are the pairs reported. The providers are used in the usual priority order.
+
+    Args:
+        refresh: whether the rates already stored are requested again
+        valuation_date: date of the rates, today by default
+
+    Returns:
+        A dict with the pairs, the coverage reached (pairs stored in both directions) and the duration of the warm up
+    """
+    started = time.monotonic()
+    valuation_date = valuation_date or date.today()
+    codes = currency_codes()
+    ids = currency_ids(codes)
+    pairs = [(source, exchanged) for index, source in enumerate(codes) for exchanged in codes[index:]]
+    stored = set() if refresh else _stored_pairs(valuation_date)
+    warmed = failed = 0
+    with request_priority(PRIORITY_BACKGROUND):
+        for source, exchanged in pairs:
+            if _is_stored(stored, ids[source], ids[exchanged]):
+                continue
+            if _get_exchange_rate(source, exchanged, valuation_date):
+                warmed += 1
+            else:
+                failed += 1
+    stored = _stored_pairs(valuation_date)
+    covered = sum(1 for source, exchanged in pairs if _is_stored(stored, ids[source], ids[exchanged]))
+    report = {
+        'valuation_date': str(valuation_date),
+        'pairs': len(pairs),
+        'warmed': warmed,
+        'failed': failed,
+        'coverage': covered / len(pairs) if pairs else 1.0,
+        'duration': time.monotonic() - started,
+    }
+    logger.info('Rates warm up: %s', report)
+    return report
+
+
+def _next_warmup(now: datetime) -> datetime:
+    runs = []
+    for slot in settings.RATES_WARMUP_SCHEDULE:
+        hour, minute = (int(part) for part in slot.split(':'))
+        run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        runs.append(run_at if run_at > now else run_at + timedelta(days=1))
+    return min(runs)
+
+
+def _enqueue_once(queue: Any, job_id: str, seconds: int, enqueue: Callable, *args, **kwargs) -> None:
+    # SET NX lets the first process that schedules a run enqueue it, the job id alone does not prevent duplicates
+    key = f'exchanger:warmup:{job_id}'
+    if not queue.connection.set(key, 1, nx=True, ex=seconds):
+        return
+    try:
+        enqueue(*args, job_id=job_id, **kwargs)
+    except Exception:
+        queue.connection.delete(key)
+        raise
+
+
+def schedule_rates_warmup(run_now: bool = False) -> None:
+    """Schedule the next warm up of today's rates on RQ (the worker needs the --with-scheduler option).
+
+    Job ids are derived from the run time and every run is claimed in Redis before it is enqueued, so
+    several processes scheduling the same run do not duplicate it.
+
+    Args:
+        run_now: whether a warm up of the missing rates is also enqueued right away, once a day
+    """
+    try:
+        queue = django_rq.get_queue('default', autocommit=True, is_async=True, default_timeout=360)
+        if run_now:
+            _enqueue_once(queue, f'exchanger-rates-warmup-{date.today()}-startup', 24 * 60 * 60, queue.enqueue,
+                          run_rates_warmup, refresh=False, schedule=False)
+        if settings.RATES_WARMUP_SCHEDULE:
+            now = timezone.now()
+            run_at = _next_warmup(now)
+            _enqueue_once(queue, f'exchanger-rates-warmup-{run_at:%Y%m%d%H%M}',
+                          int((run_at - now).total_seconds()) + 60 * 60, queue.enqueue_at,
+                          run_at, run_rates_warmup, refresh=True, schedule=True)
+    except Exception:
+        logger.warning('Rates warm up could not be scheduled', exc_info=True)
+
+
+def run_rates_warmup(refresh: bool = True, schedule: bool = True) -> dict:
+    """RQ job that warms today's rates and schedules the next run.
+
+    Args:
+        refresh: whether the rates already stored are requested again
+        schedule: whether the next run is scheduled
+
+    Returns:
+        the report of warm_todays_rates
+    """
+    try:
+        return warm_todays_rates(refresh)
+    finally:
+        if schedule:
+            schedule_rates_warmup()
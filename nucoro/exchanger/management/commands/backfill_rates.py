@@ -0,0 +1,199 @@
+"""Command to backfill the history of rates."""
+from concurrent.futures import as_completed, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+import os
+import time
+from typing import List, NamedTuple, Optional, Set
+
+import django  # type: ignore
+from django.core.management.base import ArgumentParser, BaseCommand, CommandError
+from django.db import connection, connections
+
+from exchanger.currencies import currency_codes, currency_id
+from exchanger.interactors import _get_exchange_rate, get_exchange_rate_data
+from exchanger.models import CurrencyExchangeRate, CurrencyProvider
+from exchanger.quota import PRIORITY_BACKGROUND, request_priority
+from exchanger.throttling import TokenBucket
+
+
+class WorkUnit(NamedTuple):
+    """Rates of a pair for a range of dates."""
+    source_currency: str
+    exchanged_currency: str
+    date_from: date
+    date_to: date
+
+    @property
+    def key(self) -> str:
+        """Key of the unit in the checkpoint file.
+
+        Returns:
+            the key
+        """
+        return f'{self.source_currency}-{self.exchanged_currency}-{self.date_from}-{self.date_to}'
+
+
+_bucket: Optional[TokenBucket] = None
+_provider: Optional[CurrencyProvider] = None
+
+
+def _init_process(rate_limit: float, provider_name: Optional[str]) -> None:
+    global _bucket, _provider
+    django.setup()
+    _bucket = TokenBucket(rate_limit) if rate_limit else None
+    _provider = CurrencyProvider.objects.get(name=provider_name) if provider_name else None
+
+
+def run_unit(unit: WorkUnit) -> int:
+    """Store the missing rates of a work unit.
+
+    Args:
+        unit: the work unit
+
+    Returns:
+        the number of rates stored
+    """
+    try:
+        stored = set(CurrencyExchangeRate.objects.filter(
+            source_currency_id=currency_id(unit.source_currency), exchanged_currency_id=currency_id(unit.exchanged_currency),
+            valuation_date__gte=unit.date_from, valuation_date__lte=unit.date_to
+        ).values_list('valuation_date', flat=True))
+        count = 0
+        day = unit.date_from
+        with request_priority(PRIORITY_BACKGROUND):
+            while day <= unit.date_to:
+                if day not in stored:
+                    if _bucket:
+                        _bucket.acquire()
+                    if _provider:
+                        get_exchange_rate_data(unit.source_currency, unit.exchanged_currency, day, _provider)
+                        count += 1
+                    elif _get_exchange_rate(unit.source_currency, unit.exchanged_currency, day):
+                        count += 1
+                day += timedelta(days=1)
+        return count
+    finally:
+        connection.close()
+
+
+def split_units(codes: List[str], sources: List[str], date_from: date, date_to: date, unit_days: int) -> List[WorkUnit]:
+    """Split the pairs and dates matrix into work units.
+
+    Every stored rate also stores its reverse, so each pair appears in a single direction.
+
+    Args:
+        codes: the exchanged currencies
+        sources: the source currencies
+        date_from: first date of the backfill
+        date_to: last date of the backfill
+        unit_days: days per work unit
+
+    Returns:
+        the work units
+    """
+    pairs: Set[tuple] = set()
+    for source in sources:
+        for exchanged in codes:
+            if source != exchanged and (exchanged, source) not in pairs:
+                pairs.add((source, exchanged))
+    units = []
+    for source, exchanged in sorted(pairs):
+        start = date_from
+        while start <= date_to:
+            end = min(start + timedelta(days=unit_days - 1), date_to)
+            units.append(WorkUnit(source, exchanged, start, end))
+            start = end + timedelta(days=1)
+    return units
+
+
+class Command(BaseCommand):
+    """Command to backfill rates in parallel, resuming where a previous run stopped."""
+    help = 'Backfill the rates of a range of dates in parallel, resuming where a previous run stopped.'
+    requires_system_checks: list = []
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Function to parse the arguments.
+
+        Args:
+            parser: the argument parser
+        """
+        parser.add_argument('date_from', type=str, help='first date with the format Y-m-d.')
+        parser.add_argument('date_to', type=str, help='last date with the format Y-m-d.')
+        parser.add_argument('--sources', type=str, help='source currencies (comma separated), all by default.')
+        parser.add_argument('--currencies', type=str, help='exchanged currencies (comma separated), all by default.')
+        parser.add_argument('--provider', type=str, help='name of the provider to use, by priority by default.')
+        parser.add_argument('--unit-days', type=int, default=30, help='days per work unit.')
+        parser.add_argument('--workers', type=int, default=4, help='number of workers.')
+        parser.add_argument('--processes', action='store_true', help='use a process pool instead of threads.')
+        parser.add_argument('--rate-limit', type=float, default=5.0,
+                            help='maximum provider requests per second (all workers together), 0 for no limit.')
+        parser.add_argument('--checkpoint', type=str, default='backfill_rates.checkpoint',
+                            help='file where the completed work units are recorded.')
+
+    def handle(self, *args, **kwargs) -> None:
+        """Function that handles the command.
+
+        Args:
+            args: Unused
+            kwargs: The extra data to add to the execution entity
+
+        Raises:
+            CommandError: the arguments are not valid
+        """
+        try:
+            date_from = datetime.strptime(kwargs['date_from'], '%Y-%m-%d').date()
+            date_to = datetime.strptime(kwargs['date_to'], '%Y-%m-%d').date()
+        except ValueError as e:
+            raise CommandError(str(e))
+        codes = currency_codes()
+        sources = kwargs['sources'].split(',') if kwargs['sources'] else codes
+        currencies = kwargs['currencies'].split(',') if kwargs['currencies'] else codes
+        units = split_units(currencies, sources, date_from, date_to, kwargs['unit_days'])
+
+        checkpoint = kwargs['checkpoint']
+        completed = set()
+        if os.path.exists(checkpoint):
+            with open(checkpoint) as checkpoint_file:
+                completed = {line.strip() for line in checkpoint_file}
+        pending = [unit for unit in units if unit.key not in completed]
+        print(f'{len(units)} work units, {len(units) - len(pending)} already completed')
+
+        workers = kwargs['workers']
+        rate_limit = kwargs['rate_limit']
+        if kwargs['processes']:
+            connections.close_all()
+            executor: Executor = ProcessPoolExecutor(
+                workers, initializer=_init_process, initargs=(rate_limit / workers, kwargs['provider']))
+        else:
+            _init_process(rate_limit, kwargs['provider'])
+            executor = ThreadPoolExecutor(workers)
+        self.run(executor, pending, checkpoint)
+
+    def run(self, executor: Executor, units: List[WorkUnit], checkpoint: str) -> None:
+        """Run the work units, recording each completed one in the checkpoint file.
+
+        Args:
+            executor: the pool that runs the units
+            units: the pending work units
+            checkpoint: path of the checkpoint file
+        """
+        started = time.monotonic()
+        done = stored = failed = 0
+        with executor, open(checkpoint, 'a') as checkpoint_file:
+            futures = {executor.submit(run_unit, unit): unit for unit in units}
+            for future in as_completed(futures):
+                unit = futures[future]
+                try:
+                    stored += future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f'{unit.key} failed: {e}')
+                    continue
+                checkpoint_file.write(f'{unit.key}\n')
+                checkpoint_file.flush()
+                os.fsync(checkpoint_file.fileno())
+                done += 1
+                elapsed = time.monotonic() - started
+                eta = elapsed / (done + failed) * (len(units) - done - failed)
+                print(f'{done}/{len(units)} units, {stored} rates, {stored / elapsed:.1f} rates/s, ETA {eta:.0f}s')
+        print(f'{done} work units completed and {failed} failed in {time.monotonic() - started:.1f}s')
@@ -6,12 +6,17 @@ import decimal
 from django.core.management.base import ArgumentParser, BaseCommand
 from django.db import transaction
 
-from exchanger.models import Currency, CurrencyExchangeRate
+from exchanger.currencies import get_currency
+from exchanger.models import CurrencyExchangeRate, reserve_write_sequence
+from exchanger.signals import rates_written
+
+SEQUENCE_BLOCK = 1000
 
 
 class Command(BaseCommand):
     """Command to add a list of currency exchanges from a CSV."""
     help = 'Add a list of currency exchanges from a CSV.'
+    requires_system_checks: list = []
 
     def add_arguments(self, parser: ArgumentParser) -> None:
         """Function to parse csv_path argument.
@@ -29,23 +34,28 @@ class Command(BaseCommand):
             kwargs: The extra data to add to the execution entity
         """
         csv_path = kwargs['csv_path']
-        added_or_updated_rates = 0
+        added_or_updated_rates = []
         try:
             with transaction.atomic():
-                currencies = {curr.code: curr for curr in Currency.objects.all()}
+                write_sequence = last_sequence = 0
                 with open(csv_path) as csv_file:
                     csv_reader = csv.reader(csv_file, delimiter=',')
                     for row in csv_reader:
-                        source_curr = currencies[row[0]]
-                        exchange_curr = currencies[row[1]]
+                        if write_sequence == last_sequence:
+                            write_sequence = reserve_write_sequence(SEQUENCE_BLOCK)
+                            last_sequence = write_sequence + SEQUENCE_BLOCK
+                        source_curr = get_currency(row[0])
+                        exchange_curr = get_currency(row[1])
                         valuation_date = datetime.strptime(row[2], '%Y-%m-%d').date()
                         rate_value = decimal.Decimal(row[3])
                         currency_exchange, _ = CurrencyExchangeRate.objects.update_or_create(
                             source_currency=source_curr, exchanged_currency=exchange_curr, valuation_date=valuation_date,
-                            defaults={'rate_value': rate_value}
+                            defaults={'rate_value': rate_value, 'write_sequence': write_sequence}
                         )
-                        added_or_updated_rates += 1
-            print(f'{added_or_updated_rates} where added or updated')
+                        write_sequence += 1
+                        added_or_updated_rates.append(currency_exchange)
+                rates_written.send(sender=CurrencyExchangeRate, rates=added_or_updated_rates)
+            print(f'{len(added_or_updated_rates)} where added or updated')
         except Exception as e:
             print('Something went wrong')
             print(str(e))
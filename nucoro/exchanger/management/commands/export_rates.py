@@ -0,0 +1,92 @@
+"""Command to export the stored rates in bulk."""
+from datetime import datetime
+import os
+import time
+from typing import Iterator, List
+
+from django.core.management.base import ArgumentParser, BaseCommand, CommandError
+
+from exchanger.export import EXPORT_CSV, EXPORT_FORMATS, export_rates, export_watermark, ExportFilter, iter_export_rows
+from exchanger.routers import use_primary
+
+
+class Command(BaseCommand):
+    """Command to export the stored rates, or the ones written since the last export, to a file."""
+    help = 'Export the stored rates as gzip compressed CSV or Parquet.'
+    requires_system_checks: list = []
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Function to parse the arguments.
+
+        Args:
+            parser: the argument parser
+        """
+        parser.add_argument('path', type=str, help='path of the exported file.')
+        parser.add_argument('--format', type=str, choices=EXPORT_FORMATS, default=EXPORT_CSV,
+                            help='csv (gzip compressed, default) or parquet (needs pyarrow).')
+        parser.add_argument('--sources', type=str, help='source currencies (comma separated), all by default.')
+        parser.add_argument('--currencies', type=str, help='exchanged currencies (comma separated), all by default.')
+        parser.add_argument('--date-from', type=str, help='first valuation date with the format Y-m-d.')
+        parser.add_argument('--date-to', type=str, help='last valuation date with the format Y-m-d.')
+        parser.add_argument('--since', type=int, default=0,
+                            help='export the rates written after this watermark (write sequence), 0 by default.')
+        parser.add_argument('--watermark-file', type=str,
+                            help='file with the watermark of the previous export, used as --since and updated '
+                                 'after a successful export.')
+
+    def handle(self, *args, **kwargs) -> None:
+        """Function that handles the command.
+
+        Args:
+            args: Unused
+            kwargs: The extra data to add to the execution entity
+
+        Raises:
+            CommandError: the arguments are not valid
+        """
+        try:
+            date_from = datetime.strptime(kwargs['date_from'], '%Y-%m-%d').date() if kwargs['date_from'] else None
+            date_to = datetime.strptime(kwargs['date_to'], '%Y-%m-%d').date() if kwargs['date_to'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+        since = kwargs['since']
+        watermark_file = kwargs['watermark_file']
+        if watermark_file and os.path.exists(watermark_file):
+            with open(watermark_file) as watermark_input:
+                since = int(watermark_input.read().strip() or 0)
+        started = time.monotonic()
+        with use_primary():
+            watermark = export_watermark()
+            export_filter = ExportFilter(
+                sources=kwargs['sources'].split(',') if kwargs['sources'] else None,
+                currencies=kwargs['currencies'].split(',') if kwargs['currencies'] else None,
+                date_from=date_from, date_to=date_to, since=since, until=watermark)
+            counted = [0]
+            try:
+                parts = export_rates(kwargs['format'], self.count_rows(iter_export_rows(export_filter), counted))
+            except ValueError as e:
+                raise CommandError(str(e))
+            partial_path = f'{kwargs["path"]}.partial'
+            with open(partial_path, 'wb') as output:
+                for part in parts:
+                    output.write(part)
+        os.replace(partial_path, kwargs['path'])
+        if watermark_file:
+            with open(watermark_file, 'w') as watermark_output:
+                watermark_output.write(f'{watermark}\n')
+        self.stdout.write(f'{counted[0]} rates exported to {kwargs["path"]} in {time.monotonic() - started:.1f}s, '
+                          f'watermark {watermark}')
+
+    def count_rows(self, chunks: Iterator[List[tuple]], counted: List[int]) -> Iterator[List[tuple]]:
+        """Count the exported rates while they are read.
+
+        Args:
+            chunks: the chunks of rates
+            counted: a list whose first item is increased by the rates of every chunk
+
+        Yields:
+            the same chunks
+        """
+        for chunk in chunks:
+            counted[0] += len(chunk)
+            yield chunk
@@ -0,0 +1,324 @@
+"""Command to load test the API against a local stub of FixerIo."""
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import ArgumentParser, BaseCommand, CommandError
+import requests
+
+CURRENCIES = ('EUR', 'USD', 'GBP', 'CHF')
+ENDPOINTS = ('exchange_rates', 'currency_converter', 'time-weightedror')
+DEFAULT_MIX = 'exchange_rates=6,currency_converter=3,time-weightedror=1'
+PROVIDER_METRIC = re.compile(
+    r'^exchanger_provider_request_duration_seconds_count\{provider_type="([^"]*)",outcome="([^"]*)"\} (\S+)$', re.M)
+
+
+class StubFixerIo(ThreadingHTTPServer):
+    """Local HTTP server that answers like the historical endpoint of FixerIo.
+
+    Every call waits latency seconds (plus up to jitter), fails with a 500 with a probability of
+    error_rate and answers success false for the no data days. Rates are deterministic per date.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 no_data_days: Optional[Set[date]] = None, no_data_rate: float = 0.0):
+        super().__init__(('127.0.0.1', port), _StubFixerIoHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.no_data_days = no_data_days or set()
+        self.no_data_rate = no_data_rate
+        self.calls: Counter = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """Returns the value of FIXERIO_URL that points to the stub.
+
+        Returns:
+            the url
+        """
+        return f'http://127.0.0.1:{self.server_address[1]}/api'
+
+    def has_data(self, valuation_date: date) -> bool:
+        """Whether there are rates for a date.
+
+        Args:
+            valuation_date: the date
+
+        Returns:
+            False for the no data days
+        """
+        return (valuation_date not in self.no_data_days
+                and random.Random(str(valuation_date)).random() >= self.no_data_rate)  # nosec
+
+    def count(self, outcome: str) -> None:
+        """Count an answered call.
+
+        Args:
+            outcome: ok, error or no_data
+        """
+        with self.lock:
+            self.calls[outcome] += 1
+
+    def start(self) -> None:
+        """Serve in a daemon thread."""
+        threading.Thread(target=self.serve_forever, name='stub-fixerio', daemon=True).start()
+
+
+class _StubFixerIoHandler(BaseHTTPRequestHandler):
+    server: StubFixerIo
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Answer a historical rates call."""
+        stub = self.server
+        time.sleep(stub.latency + random.uniform(0, stub.jitter))  # nosec
+        url = urlparse(self.path)
+        try:
+            valuation_date = date.fromisoformat(url.path.rstrip('/').rsplit('/', 1)[-1])
+        except ValueError:
+            self._answer(404, {'success': False, 'error': {'code': 404, 'type': 'invalid_date'}}, 'error')
+            return
+        if random.random() < stub.error_rate:  # nosec
+            self._answer(500, None, 'error')
+            return
+        if not stub.has_data(valuation_date):
+            self._answer(200, {'success': False, 'error': {'code': 106, 'type': 'no_rates_available'}}, 'no_data')
+            return
+        symbols = parse_qs(url.query).get('symbols', [','.join(CURRENCIES)])[0].split(',')
+        generator = random.Random(str(valuation_date))  # nosec
+        rates = {symbol: 1.0 if symbol == 'EUR' else round(generator.uniform(0.5, 2.0), 6) for symbol in symbols}
+        self._answer(200, {'success': True, 'historical': True, 'base': 'EUR', 'date': str(valuation_date),
+                           'rates': rates}, 'ok')
+
+    def _answer(self, status: int, body: Optional[dict], outcome: str) -> None:
+        self.server.count(outcome)
+        content = json.dumps(body).encode() if body is not None else b'Internal Server Error'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json' if body is not None else 'text/plain')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args) -> None:
+        """Keep the output of the command for the report.
+
+        Args:
+            format: the message format
+            args: the message arguments
+        """
+
+
+def parse_mix(mix: str) -> List[Tuple[str, float]]:
+    """Parse the weights of the endpoints, ex: exchange_rates=6,currency_converter=3.
+
+    Args:
+        mix: the weights
+
+    Returns:
+        the endpoints and their weights
+
+    Raises:
+        CommandError: an endpoint or a weight is not valid
+    """
+    weights = []
+    for item in mix.split(','):
+        endpoint, _, weight = item.partition('=')
+        if endpoint not in ENDPOINTS:
+            raise CommandError(f'Unknown endpoint {endpoint}, use one of {", ".join(ENDPOINTS)}')
+        try:
+            weights.append((endpoint, float(weight or 1)))
+        except ValueError:
+            raise CommandError(f'Invalid weight for {endpoint}: {weight}')
+    return weights
+
+
+def request_params(endpoint: str, generator: random.Random, history_days: int, range_days: int) -> dict:
+    """Random query parameters of a call.
+
+    Args:
+        endpoint: the v1 endpoint
+        generator: the random generator of the client
+        history_days: how far in the past the dates are picked
+        range_days: days of the exchange_rates ranges
+
+    Returns:
+        the query parameters
+    """
+    today = date.today()
+    source, exchanged = generator.sample(CURRENCIES, 2)
+    if endpoint == 'exchange_rates':
+        date_from = today - timedelta(days=generator.randrange(range_days - 1, history_days))
+        return {'source_currency': source, 'date_from': str(date_from),
+                'date_to': str(date_from + timedelta(days=range_days - 1))}
+    if endpoint == 'currency_converter':
+        return {'source_currency': source, 'exchanged_currency': exchanged, 'amount': '100'}
+    return {'source_currency': source, 'exchanged_currency': exchanged, 'amount': '100',
+            'start_date': str(today - timedelta(days=generator.randrange(1, history_days)))}
+
+
+def provider_calls(url: str) -> Optional[Dict[Tuple[str, str], float]]:
+    """Read the provider call counts of the app from its /metrics.
+
+    Args:
+        url: the base url of the app
+
+    Returns:
+        the calls by provider type and outcome, or None if the metrics are not available
+    """
+    try:
+        response = requests.get(f'{url}/metrics', timeout=5)
+    except requests.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    return {(type_, outcome): float(count) for type_, outcome, count in PROVIDER_METRIC.findall(response.text)}
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * percentile), len(values) - 1)] if values else 0.0
+
+
+class Command(BaseCommand):
+    """Command to load test the API against a local stub of FixerIo.
+
+    Start the app with FIXERIO_URL pointing to the stub (http://127.0.0.1:{stub port}/api), then run
+    this command: it starts the stub, drives a mix of concurrent v1 calls and reports the
+    throughput, the latency percentiles and the provider calls.
+    """
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Function to parse the arguments.
+
+        Args:
+            parser: the argument parser
+        """
+        parser.add_argument('--url', type=str, default='http://127.0.0.1:8000', help='base url of the app.')
+        parser.add_argument('--stub-port', type=int, default=8765, help='port of the stub FixerIo server.')
+        parser.add_argument('--stub-only', action='store_true', help='only run the stub, until interrupted.')
+        parser.add_argument('--latency', type=float, default=0.05, help='seconds the stub waits before answering.')
+        parser.add_argument('--jitter', type=float, default=0.0, help='extra random seconds of latency, up to.')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of stub calls failing with a 500.')
+        parser.add_argument('--no-data-days', type=str, default='',
+                            help='dates without rates on the stub (comma separated, Y-m-d).')
+        parser.add_argument('--no-data-rate', type=float, default=0.0, help='fraction of the days without rates.')
+        parser.add_argument('--mix', type=str, default=DEFAULT_MIX, help='weights of the v1 endpoints called.')
+        parser.add_argument('--concurrency', type=int, default=8, help='number of concurrent clients.')
+        parser.add_argument('--seconds', type=float, default=30, help='duration of the load.')
+        parser.add_argument('--history-days', type=int, default=365, help='how far in the past dates are picked.')
+        parser.add_argument('--range-days', type=int, default=7, help='days of the exchange_rates ranges.')
+        parser.add_argument('--seed', type=int, default=0, help='seed of the generated calls.')
+
+    def handle(self, *args, **kwargs) -> None:
+        """Function that handles the command.
+
+        Args:
+            args: Unused
+            kwargs: The extra data to add to the execution entity
+
+        Raises:
+            CommandError: the arguments are not valid
+        """
+        mix = parse_mix(kwargs['mix'])
+        try:
+            no_data_days = {date.fromisoformat(day) for day in kwargs['no_data_days'].split(',') if day}
+        except ValueError as e:
+            raise CommandError(str(e))
+        if kwargs['range_days'] >= kwargs['history_days']:
+            raise CommandError('--range-days must be smaller than --history-days')
+        stub = StubFixerIo(kwargs['stub_port'], kwargs['latency'], kwargs['jitter'], kwargs['error_rate'],
+                           no_data_days, kwargs['no_data_rate'])
+        stub.start()
+        self.stdout.write(f'Stub FixerIo listening, start the app with FIXERIO_URL={stub.url}')
+        try:
+            if kwargs['stub_only']:
+                while True:
+                    time.sleep(3600)
+            self.run_load(stub, mix, kwargs)
+        finally:
+            stub.shutdown()
+            stub.server_close()
+
+    def run_load(self, stub: StubFixerIo, mix: List[Tuple[str, float]], options: dict) -> None:
+        """Drive the calls and print the report.
+
+        Args:
+            stub: the running stub
+            mix: the endpoints and their weights
+            options: the options of the command
+        """
+        url = options['url'].rstrip('/')
+        calls_before = provider_calls(url)
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        statuses: Dict[str, Counter] = defaultdict(Counter)
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+
+        def client(seed: int) -> None:
+            generator = random.Random(seed)  # nosec
+            session = requests.Session()
+            endpoints, weights = zip(*mix)
+            while time.monotonic() < deadline:
+                endpoint = generator.choices(endpoints, weights)[0]
+                params = request_params(endpoint, generator, options['history_days'], options['range_days'])
+                started = time.perf_counter()
+                try:
+                    status = str(session.get(f'{url}/v1/{endpoint}/', params=params, timeout=60).status_code)
+                except requests.RequestException as e:
+                    status = type(e).__name__
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies[endpoint].append(elapsed)
+                    statuses[endpoint][status] += 1
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=client, args=(options['seed'] + index,))
+                   for index in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.report(latencies, statuses, time.monotonic() - started, stub, calls_before, provider_calls(url))
+
+    def report(self, latencies: Dict[str, List[float]], statuses: Dict[str, Counter], elapsed: float,
+               stub: StubFixerIo, calls_before: Optional[dict], calls_after: Optional[dict]) -> None:
+        """Print the throughput, latencies and provider calls.
+
+        Args:
+            latencies: the latencies of the calls by endpoint
+            statuses: the status codes (or errors) of the calls by endpoint
+            elapsed: seconds of load
+            stub: the stub, with its call counts
+            calls_before: the provider calls of the app before the load, if available
+            calls_after: the provider calls of the app after the load, if available
+        """
+        write: Callable[[str], None] = self.stdout.write
+        columns = ('calls', 'calls/s', 'p50 ms', 'p95 ms', 'p99 ms')
+        write(f'{"endpoint":<20}' + ''.join(f'{column:>10}' for column in columns) + '  statuses')
+        every_latency = []
+        for endpoint, values in sorted(latencies.items()):
+            every_latency += values
+            row = (len(values), len(values) / elapsed, _percentile(values, 0.5) * 1000,
+                   _percentile(values, 0.95) * 1000, _percentile(values, 0.99) * 1000)
+            codes = ' '.join(f'{code}:{count}' for code, count in sorted(statuses[endpoint].items()))
+            write(f'{endpoint:<20}' + ''.join(f'{value:>10.1f}' for value in row) + f'  {codes}')
+        total = (len(every_latency), len(every_latency) / elapsed, _percentile(every_latency, 0.5) * 1000,
+                 _percentile(every_latency, 0.95) * 1000, _percentile(every_latency, 0.99) * 1000)
+        write(f'{"total":<20}' + ''.join(f'{value:>10.1f}' for value in total))
+        write('Stub FixerIo calls: ' + ', '.join(f'{outcome} {count}' for outcome, count in sorted(stub.calls.items())))
+        if calls_before is None or calls_after is None:
+            write('Provider calls of the app: /metrics not available')
+            return
+        for (type_, outcome), count in sorted(calls_after.items()):
+            if count - calls_before.get((type_, outcome), 0):
+                write(f'Provider calls of the app: {type_} {outcome} {count - calls_before.get((type_, outcome), 0):g}')
@@ -0,0 +1,197 @@
+"""Command to seed synthetic rates in bulk."""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import time
+from typing import Dict, Iterator, List, Tuple
+
+from django.core.management.base import ArgumentParser, BaseCommand, CommandError
+from django.db import connection, transaction
+import numpy as np  # type: ignore
+
+from exchanger.currencies import currency_codes, currency_id, currency_ids
+from exchanger.models import Currency, CurrencyExchangeRate, CurrencyExchangeRateAggregate, reserve_write_sequence
+from exchanger.rollups import period_end, period_start, RATE_QUANTUM, refresh_aggregates
+from exchanger.routers import use_primary
+from exchanger.signals import rates_written
+from exchanger.synthetic import pair_rates
+
+INSERT_FIELDS = ('source_currency', 'exchanged_currency', 'valuation_date', 'rate_value', 'write_sequence')
+
+
+def summarize_periods(interval: str, days: List[date], values: np.ndarray) -> Iterator[Tuple[date, np.ndarray, dict]]:
+    """Summarize the daily rates of the periods fully inside the days, like rollups.summarize.
+
+    Args:
+        interval: CurrencyExchangeRateAggregate.WEEK or CurrencyExchangeRateAggregate.MONTH
+        days: the consecutive days of the rates
+        values: the rates rounded to 6 decimals, one row per day and one column per pair
+
+    Yields:
+        the start of every period, and its fields as arrays with one value per pair
+    """
+    starts = [period_start(interval, day) for day in days]
+    first_rows = [row for row, start in enumerate(starts) if row == 0 or start != starts[row - 1]]
+    bounds = first_rows + [len(days)]
+    micros = np.rint(values * 1_000_000).astype(np.int64)
+    sums = np.add.reduceat(micros, first_rows, axis=0)
+    highs = np.maximum.reduceat(values, first_rows, axis=0)
+    lows = np.minimum.reduceat(values, first_rows, axis=0)
+    for index, (first, end) in enumerate(zip(bounds, bounds[1:])):
+        start = starts[first]
+        if start < days[0] or period_end(interval, start) > days[-1]:
+            continue
+        count = end - first
+        yield start, values[first], {
+            'high_value': highs[index], 'low_value': lows[index], 'close_value': values[end - 1],
+            'mean_value': [(Decimal(int(total)) / count / 1_000_000).quantize(RATE_QUANTUM) for total in sums[index]],
+            'rate_count': count,
+        }
+
+
+class Command(BaseCommand):
+    """Command to seed deterministic synthetic rates (see exchanger/synthetic.py) for every pair of some currencies.
+
+    rates_written is sent once with bulk=True, so the version of every pair is bumped once while the aggregates are
+    stored by the command itself and the seeded rates are not pushed one by one.
+    """
+    requires_system_checks: list = []
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Function to parse the arguments.
+
+        Args:
+            parser: the argument parser
+        """
+        parser.add_argument('date_from', type=str, help='first date with the format Y-m-d.')
+        parser.add_argument('date_to', type=str, help='last date with the format Y-m-d.')
+        parser.add_argument('--sources', type=str, help='source currencies (comma separated), all by default.')
+        parser.add_argument('--currencies', type=str,
+                            help='exchanged currencies (comma separated, created if missing), all by default.')
+        parser.add_argument('--seed', type=int, default=0, help='seed of the random walks.')
+        parser.add_argument('--replace', action='store_true', help='delete the rates already stored in the range.')
+        parser.add_argument('--aggregates', action='store_true',
+                            help='also store the weekly and monthly aggregates inside the range (the ones of its edges are '
+                                 'always refreshed).')
+        parser.add_argument('--batch-size', type=int, default=50000, help='rows per insert.')
+
+    def handle(self, *args, **kwargs) -> None:
+        """Function that handles the command.
+
+        Args:
+            args: Unused
+            kwargs: The extra data to add to the execution entity
+
+        Raises:
+            CommandError: the arguments are not valid or rates are already stored
+        """
+        try:
+            date_from = datetime.strptime(kwargs['date_from'], '%Y-%m-%d').date()
+            date_to = datetime.strptime(kwargs['date_to'], '%Y-%m-%d').date()
+        except ValueError as e:
+            raise CommandError(str(e))
+        started = time.monotonic()
+        with use_primary():
+            codes = kwargs['currencies'].split(',') if kwargs['currencies'] else currency_codes()
+            self.create_currencies(codes)
+            sources = kwargs['sources'].split(',') if kwargs['sources'] else codes
+            ids = currency_ids({*codes, *sources})
+            if len(ids) != len({*codes, *sources}):
+                raise CommandError(f'Unknown source currency in {", ".join(sources)}')
+            days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+            try:
+                values = {source: pair_rates(source, codes, date_from, date_to, kwargs['seed']) for source in sources}
+            except ValueError as e:
+                raise CommandError(str(e))
+            with transaction.atomic():
+                stored = CurrencyExchangeRate.objects.filter(
+                    source_currency_id__in=[ids[source] for source in sources],
+                    exchanged_currency_id__in=[ids[code] for code in codes],
+                    valuation_date__gte=date_from, valuation_date__lte=date_to)
+                if kwargs['replace']:
+                    stored.delete()
+                elif stored.exists():
+                    raise CommandError('Rates are already stored in that range, use --replace to overwrite them')
+                count = self.insert_rates(ids, codes, days, values, kwargs['batch_size'])
+                pairs = [CurrencyExchangeRate(source_currency_id=ids[source], exchanged_currency_id=ids[code],
+                                              valuation_date=day)
+                         for source in sources for code in codes for day in (date_from, date_to)]
+                CurrencyExchangeRateAggregate.objects.filter(
+                    source_currency_id__in=[ids[source] for source in sources],
+                    exchanged_currency_id__in=[ids[code] for code in codes],
+                    period_start__gte=date_from, period_start__lte=date_to).delete()
+                if kwargs['aggregates']:
+                    self.store_aggregates(ids, codes, days, values)
+                refresh_aggregates(pairs)
+                rates_written.send(sender=CurrencyExchangeRate, rates=pairs, bulk=True)
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'{count} rates seeded in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} rates/s)')
+
+    def create_currencies(self, codes: List[str]) -> None:
+        """Create the currencies that do not exist, with their code as name and symbol.
+
+        Args:
+            codes: the currency codes
+        """
+        for code in codes:
+            if currency_id(code) is None:
+                Currency.objects.create(code=code, name=code, symbol=code)
+
+    def insert_rates(self, ids: Dict[str, int], codes: List[str], days: List[date], values: Dict[str, np.ndarray],
+                     batch_size: int) -> int:
+        """Insert the rates with raw bulk inserts, with a block of write sequence numbers.
+
+        Args:
+            ids: the currency ids by code
+            codes: the exchanged currencies
+            days: the days of the rates
+            values: the rates of every source currency, one row per day and one column per exchanged currency
+            batch_size: rows per insert
+
+        Returns:
+            the number of rates inserted
+        """
+        meta = CurrencyExchangeRate._meta
+        columns = ', '.join(connection.ops.quote_name(meta.get_field(field).column) for field in INSERT_FIELDS)
+        sql = (f'INSERT INTO {connection.ops.quote_name(meta.db_table)} ({columns}) '
+               f'VALUES ({", ".join(["%s"] * len(INSERT_FIELDS))})')
+        day_params = [connection.ops.adapt_datefield_value(day) for day in days]
+        total = len(values) * len(codes) * len(days)
+        sequence = reserve_write_sequence(total) if total else 0
+        exchanged_ids = [ids[code] for code in codes]
+        rows: List[tuple] = []
+        with connection.cursor() as cursor:
+            for source, matrix in values.items():
+                for day, day_values in zip(day_params, matrix.tolist()):
+                    rows += zip([ids[source]] * len(codes), exchanged_ids, [day] * len(codes), day_values,
+                                range(sequence, sequence + len(codes)))
+                    sequence += len(codes)
+                    if len(rows) >= batch_size:
+                        cursor.executemany(sql, rows)
+                        rows = []
+            if rows:
+                cursor.executemany(sql, rows)
+        return total
+
+    def store_aggregates(self, ids: Dict[str, int], codes: List[str], days: List[date],
+                         values: Dict[str, np.ndarray]) -> None:
+        """Store the aggregates of the periods fully inside the range, computed from the generated rates.
+
+        Args:
+            ids: the currency ids by code
+            codes: the exchanged currencies
+            days: the days of the rates
+            values: the rates of every source currency, one row per day and one column per exchanged currency
+        """
+        aggregates = []
+        for interval in (CurrencyExchangeRateAggregate.WEEK, CurrencyExchangeRateAggregate.MONTH):
+            for source, matrix in values.items():
+                for start, opens, fields in summarize_periods(interval, days, matrix):
+                    for column, code in enumerate(codes):
+                        aggregates.append(CurrencyExchangeRateAggregate(
+                            source_currency_id=ids[source], exchanged_currency_id=ids[code], interval=interval,
+                            period_start=start, open_value=Decimal(f'{opens[column]:.6f}'),
+                            high_value=Decimal(f'{fields["high_value"][column]:.6f}'),
+                            low_value=Decimal(f'{fields["low_value"][column]:.6f}'),
+                            close_value=Decimal(f'{fields["close_value"][column]:.6f}'),
+                            mean_value=fields['mean_value'][column], rate_count=fields['rate_count']))
+        CurrencyExchangeRateAggregate.objects.bulk_create(aggregates, batch_size=5000)
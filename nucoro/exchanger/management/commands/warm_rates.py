@@ -0,0 +1,39 @@
+"""Command to warm up the rates of every currency pair."""
+from datetime import datetime
+
+from django.core.management.base import ArgumentParser, BaseCommand
+
+from exchanger.interactors import schedule_rates_warmup, warm_todays_rates
+
+
+class Command(BaseCommand):
+    """Command to store the rates of every currency pair for today, or to schedule it on RQ."""
+    help = 'Store the rates of every currency pair for today, or schedule it on RQ.'
+    requires_system_checks: list = []
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Function to parse the arguments.
+
+        Args:
+            parser: the argument parser
+        """
+        parser.add_argument('--refresh', action='store_true', help='request again the rates already stored.')
+        parser.add_argument('--date', type=str, help='date of the rates with the format Y-m-d, today by default.')
+        parser.add_argument('--schedule', action='store_true',
+                            help='enqueue a warm up now and schedule the next ones on RQ instead of running it.')
+
+    def handle(self, *args, **kwargs) -> None:
+        """Function that handles the command.
+
+        Args:
+            args: Unused
+            kwargs: The extra data to add to the execution entity
+        """
+        if kwargs['schedule']:
+            schedule_rates_warmup(run_now=True)
+            print('Rates warm up scheduled')
+            return
+        valuation_date = datetime.strptime(kwargs['date'], '%Y-%m-%d').date() if kwargs['date'] else None
+        report = warm_todays_rates(kwargs['refresh'], valuation_date)
+        print(f"Warmed {report['warmed']} of {report['pairs']} pairs for {report['valuation_date']} "
+              f"in {report['duration']:.2f}s, {report['failed']} failed, coverage {report['coverage']:.0%}")
@@ -0,0 +1,233 @@
+"""Metrics module.
+
+Histograms of the request latencies, their SQL queries and the provider calls, exposed on /metrics in
+the Prometheus text format. Every label set gets one preallocated row of counters the first time it
+is seen, so an observation is a bisect and a few increments under a lock.
+
+The metrics of the web process are kept in memory (one series per process). The RQ jobs run in the
+worker processes, so their durations are kept in a Redis hash (see exchanger.workers.MetricsWorker)
+and read back when the metrics are rendered.
+"""
+from bisect import bisect_left
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from django.db import connections  # type: ignore
+from django.http import HttpResponse  # type: ignore
+import django_rq  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+JOBS_REDIS_KEY = 'exchanger:metrics:rq_jobs'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+
+class Histogram:
+    """Prometheus histogram with fixed buckets.
+
+    Each row holds the count of every bucket (plus +Inf), the sum and the count of the observations.
+    """
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.rows: Dict[Tuple[str, ...], List[float]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        """Record an observation.
+
+        Args:
+            labels: the label values, in the order of the label names
+            value: the observed value
+        """
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            row = self.rows.get(labels)
+            if row is None:
+                row = self.rows[labels] = [0] * (len(self.buckets) + 3)
+            row[index] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], List[float]]:
+        """Returns a copy of the rows.
+
+        Returns:
+            the counters by label values
+        """
+        with self.lock:
+            return {labels: list(row) for labels, row in self.rows.items()}
+
+    def render(self, rows: Dict[Tuple[str, ...], List[float]]) -> List[str]:
+        """Build the lines of the histogram in the Prometheus text format.
+
+        Args:
+            rows: the counters by label values
+
+        Returns:
+            the lines
+        """
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, row in sorted(rows.items()):
+            label_text = ','.join(f'{name}={_quote(value)}' for name, value in zip(self.labels, labels))
+            separator = ',' if label_text else ''
+            cumulative = 0.0
+            for bound, count in zip([*map(str, self.buckets), '+Inf'], row):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text}{separator}le={_quote(bound)}}} {cumulative:g}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {row[-2]:g}')
+            lines.append(f'{self.name}_count{{{label_text}}} {row[-1]:g}')
+        return lines
+
+
+REQUEST_DURATION = Histogram('exchanger_request_duration_seconds', 'Latency of the requests.',
+                             ('endpoint', 'method', 'status'), LATENCY_BUCKETS)
+REQUEST_QUERIES = Histogram('exchanger_request_sql_queries', 'SQL queries run by a request.',
+                            ('endpoint',), QUERY_BUCKETS)
+REQUEST_SQL_DURATION = Histogram('exchanger_request_sql_duration_seconds', 'Time spent in SQL queries by a request.',
+                                 ('endpoint',), LATENCY_BUCKETS)
+PROVIDER_DURATION = Histogram('exchanger_provider_request_duration_seconds', 'Latency of the provider calls.',
+                              ('provider_type', 'outcome'), LATENCY_BUCKETS)
+JOB_DURATION = Histogram('exchanger_rq_job_duration_seconds', 'Duration of the RQ jobs.',
+                         ('queue', 'function', 'outcome'), JOB_BUCKETS)
+REGISTRY = (REQUEST_DURATION, REQUEST_QUERIES, REQUEST_SQL_DURATION, PROVIDER_DURATION)
+
+
+class QueryTimer:
+    """Database execute wrapper that counts the queries and their time."""
+
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute: Callable, sql: str, params: Any, many: bool, context: dict) -> Any:
+        """Run a query, counting it and its time.
+
+        Args:
+            execute: the next execute wrapper
+            sql: the query
+            params: the parameters of the query
+            many: whether it is an executemany
+            context: the context of the query
+
+        Returns:
+            the result of the query
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def metrics_middleware(get_response: Callable) -> Callable:
+    """Record the latency, SQL queries and SQL time of every request, by endpoint.
+
+    Args:
+        get_response: the next middleware
+
+    Returns:
+        the middleware
+    """
+    def middleware(request: Any) -> Any:
+        timer = QueryTimer()
+        wrapped = connections.all()
+        for connection in wrapped:
+            connection.execute_wrappers.append(timer)
+        started = time.perf_counter()
+        try:
+            response = get_response(request)
+        finally:
+            for connection in wrapped:
+                connection.execute_wrappers.remove(timer)
+        elapsed = time.perf_counter() - started
+        endpoint = request.resolver_match.view_name if request.resolver_match else 'unmatched'
+        REQUEST_DURATION.observe((endpoint, request.method, str(response.status_code)), elapsed)
+        REQUEST_QUERIES.observe((endpoint,), timer.count)
+        REQUEST_SQL_DURATION.observe((endpoint,), timer.seconds)
+        return response
+    return middleware
+
+
+def record_job(connection: Any, queue: str, function: str, outcome: str, seconds: float) -> None:
+    """Add a job duration to the shared histogram in Redis.
+
+    Args:
+        connection: the Redis connection
+        queue: the queue of the job
+        function: the function of the job
+        outcome: finished or failed
+        seconds: the duration of the job
+    """
+    prefix = '\x1f'.join((queue, function, outcome))
+    index = bisect_left(JOB_DURATION.buckets, seconds)
+    pipeline = connection.pipeline(transaction=False)
+    pipeline.hincrby(JOBS_REDIS_KEY, f'{prefix}\x1e{index}', 1)
+    pipeline.hincrbyfloat(JOBS_REDIS_KEY, f'{prefix}\x1esum', seconds)
+    pipeline.hincrby(JOBS_REDIS_KEY, f'{prefix}\x1ecount', 1)
+    pipeline.execute()
+
+
+def job_rows(fields: Dict[bytes, bytes]) -> Dict[Tuple[str, ...], List[float]]:
+    """Rebuild the rows of the job histogram from the Redis hash.
+
+    Args:
+        fields: the fields of the hash
+
+    Returns:
+        the counters by label values
+    """
+    rows: Dict[Tuple[str, ...], List[float]] = {}
+    for field, value in fields.items():
+        prefix, slot = field.decode().split('\x1e')
+        row = rows.setdefault(tuple(prefix.split('\x1f')), [0] * (len(JOB_DURATION.buckets) + 3))
+        row[-2 if slot == 'sum' else -1 if slot == 'count' else int(slot)] = float(value)
+    return rows
+
+
+def render_metrics(histograms: Iterable[Histogram] = REGISTRY) -> str:
+    """Render the metrics of the process and the RQ jobs in the Prometheus text format.
+
+    Args:
+        histograms: the in-process histograms
+
+    Returns:
+        the metrics
+    """
+    lines = []
+    for histogram in histograms:
+        lines += histogram.render(histogram.snapshot())
+    try:
+        fields = django_rq.get_connection('default').hgetall(JOBS_REDIS_KEY)
+    except Exception:
+        logger.warning('RQ job metrics could not be read', exc_info=True)
+    else:
+        lines += JOB_DURATION.render(job_rows(fields))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request: Any) -> HttpResponse:
+    """Expose the metrics to Prometheus.
+
+    Args:
+        request: the request
+
+    Returns:
+        the metrics in the Prometheus text format
+    """
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
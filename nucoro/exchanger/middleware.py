@@ -0,0 +1,27 @@
+"""Middleware module."""
+from typing import Any, Callable
+
+from django.conf import settings  # type: ignore
+
+from exchanger.routers import routing_scope
+
+STICKY_PRIMARY_COOKIE = 'nucoro_primary'
+
+
+def sticky_primary_middleware(get_response: Callable) -> Callable:
+    """Read from the primary database for DATABASE_STICKY_SECONDS after the caller wrote.
+
+    Args:
+        get_response: the next middleware
+
+    Returns:
+        the middleware
+    """
+    def middleware(request: Any) -> Any:
+        with routing_scope(pinned=STICKY_PRIMARY_COOKIE in request.COOKIES) as routing:
+            response = get_response(request)
+        if routing.written:
+            response.set_cookie(STICKY_PRIMARY_COOKIE, '1', max_age=settings.DATABASE_STICKY_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
+    return middleware
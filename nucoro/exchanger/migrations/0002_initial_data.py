@@ -9,7 +9,7 @@ def fill_currencies(apps, schema_editor):
     Currency = apps.get_model('exchanger', 'Currency')
     for currency in supported_currencies:
         currency_obj = Currency(code=currency[0], name=currency[1], symbol=currency[2])
-        currency_obj.save()
+        currency_obj.save(using=schema_editor.connection.alias)
 
 
 class Migration(migrations.Migration):
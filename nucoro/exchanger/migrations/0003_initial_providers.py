@@ -6,9 +6,9 @@ from django.db import migrations
 def create_initial_providers(apps, schema_editor):
     CurrencyProvider = apps.get_model('exchanger', 'CurrencyProvider')
     fixerio_provider = CurrencyProvider(name='FixerIo', priority=0, provider_type= 'fixerio')
-    fixerio_provider.save()
+    fixerio_provider.save(using=schema_editor.connection.alias)
     mock_provider = CurrencyProvider(name='Mock', priority=1, provider_type= 'mock')
-    mock_provider.save()
+    mock_provider.save(using=schema_editor.connection.alias)
 
 
 class Migration(migrations.Migration):
@@ -0,0 +1,73 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:15
+
+from datetime import timedelta
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copies of exchanger.rollups.period_start and summarize as they were when this migration was written,
+# so later changes to the app code do not change what the migration does.
+def period_start(interval, day):
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def summarize(values):
+    return {
+        'open_value': values[0],
+        'high_value': max(values),
+        'low_value': min(values),
+        'close_value': values[-1],
+        'mean_value': (sum(values) / len(values)).quantize(Decimal('0.000001')),
+        'rate_count': len(values),
+    }
+
+
+def fill_aggregates(apps, schema_editor):
+    CurrencyExchangeRate = apps.get_model('exchanger', 'CurrencyExchangeRate')
+    CurrencyExchangeRateAggregate = apps.get_model('exchanger', 'CurrencyExchangeRateAggregate')
+    db_alias = schema_editor.connection.alias
+    rates = CurrencyExchangeRate.objects.using(db_alias).order_by('source_currency', 'exchanged_currency', 'valuation_date').values_list(
+        'source_currency_id', 'exchanged_currency_id', 'valuation_date', 'rate_value')
+    for interval in ('week', 'month'):
+        periods = groupby(rates.iterator(), key=lambda row: (row[0], row[1], period_start(interval, row[2])))
+        CurrencyExchangeRateAggregate.objects.using(db_alias).bulk_create((
+            CurrencyExchangeRateAggregate(source_currency_id=key[0], exchanged_currency_id=key[1], interval=interval,
+                                          period_start=key[2], **summarize([row[3] for row in rows]))
+            for key, rows in periods
+        ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exchanger', '0003_initial_providers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrencyExchangeRateAggregate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interval', models.CharField(choices=[('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField(db_index=True)),
+                ('open_value', models.DecimalField(decimal_places=6, max_digits=18)),
+                ('high_value', models.DecimalField(decimal_places=6, max_digits=18)),
+                ('low_value', models.DecimalField(decimal_places=6, max_digits=18)),
+                ('close_value', models.DecimalField(decimal_places=6, max_digits=18)),
+                ('mean_value', models.DecimalField(decimal_places=6, max_digits=18)),
+                ('rate_count', models.IntegerField()),
+                ('exchanged_currency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='exchanger.currency')),
+                ('source_currency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aggregates', to='exchanger.currency')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='currencyexchangerateaggregate',
+            constraint=models.UniqueConstraint(fields=('source_currency', 'exchanged_currency', 'interval', 'period_start'), name='unique aggregate'),
+        ),
+        migrations.RunPython(fill_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def fill_versions(apps, schema_editor):
+    CurrencyExchangeRate = apps.get_model('exchanger', 'CurrencyExchangeRate')
+    CurrencyPairVersion = apps.get_model('exchanger', 'CurrencyPairVersion')
+    db_alias = schema_editor.connection.alias
+    pairs = CurrencyExchangeRate.objects.using(db_alias).values_list('source_currency_id', 'exchanged_currency_id').distinct()
+    now = timezone.now()
+    CurrencyPairVersion.objects.using(db_alias).bulk_create([
+        CurrencyPairVersion(source_currency_id=source_currency_id, exchanged_currency_id=exchanged_currency_id,
+                            version=1, updated_at=now)
+        for source_currency_id, exchanged_currency_id in pairs
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exchanger', '0004_currencyexchangerateaggregate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrencyPairVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+                ('exchanged_currency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='exchanger.currency')),
+                ('source_currency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='exchanger.currency')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='currencypairversion',
+            constraint=models.UniqueConstraint(fields=('source_currency', 'exchanged_currency'), name='unique pair version'),
+        ),
+        migrations.RunPython(fill_versions, migrations.RunPython.noop),
+    ]
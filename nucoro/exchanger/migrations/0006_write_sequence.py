@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:21
+
+from django.db import migrations, models
+
+
+def fill_write_sequence(apps, schema_editor):
+    CurrencyExchangeRate = apps.get_model('exchanger', 'CurrencyExchangeRate')
+    RateWriteSequence = apps.get_model('exchanger', 'RateWriteSequence')
+    db_alias = schema_editor.connection.alias
+    CurrencyExchangeRate.objects.using(db_alias).update(write_sequence=models.F('id'))
+    last_id = CurrencyExchangeRate.objects.using(db_alias).aggregate(last_id=models.Max('id'))['last_id']
+    RateWriteSequence.objects.using(db_alias).create(pk=1, value=last_id or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exchanger', '0005_currencypairversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateWriteSequence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='currencyexchangerate',
+            name='write_sequence',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(fill_write_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def limit_fixerio(apps, schema_editor):
+    CurrencyProvider = apps.get_model('exchanger', 'CurrencyProvider')
+    CurrencyProvider.objects.using(schema_editor.connection.alias).filter(provider_type='fixerio').update(requests_per_second=5)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exchanger', '0006_write_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='currencyprovider',
+            name='monthly_quota',
+            field=models.PositiveIntegerField(blank=True, help_text='Empty for no quota (FixerIo only).', null=True),
+        ),
+        migrations.AddField(
+            model_name='currencyprovider',
+            name='requests_per_second',
+            field=models.FloatField(blank=True, help_text='Empty for no limit (FixerIo only).', null=True),
+        ),
+        migrations.CreateModel(
+            name='ProviderQuotaUsage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quota_usages', to='exchanger.currencyprovider')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='providerquotausage',
+            constraint=models.UniqueConstraint(fields=('provider', 'month'), name='unique quota usage'),
+        ),
+        migrations.RunPython(limit_fixerio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exchanger', '0007_provider_quota'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='currencyprovider',
+            name='exchange_rate_code',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,5 @@
 """Models module."""
-from django.db import models  # type: ignore
+from django.db import models, transaction  # type: ignore
 
 
 class Currency(models.Model):
@@ -18,6 +18,7 @@ class CurrencyExchangeRate(models.Model):
     exchanged_currency = models.ForeignKey(Currency, on_delete=models.CASCADE)
     valuation_date = models.DateField(db_index=True)
     rate_value = models.DecimalField(db_index=True, decimal_places=6, max_digits=18)
+    write_sequence = models.BigIntegerField(db_index=True, default=0)
 
     class Meta:
         """Meta class."""
@@ -26,6 +27,30 @@ class CurrencyExchangeRate(models.Model):
         ]
 
 
+class RateWriteSequence(models.Model):
+    """RateWriteSequence model, a single row counter that numbers every rate write."""
+    value = models.BigIntegerField(default=0)
+
+
+def reserve_write_sequence(count: int = 1) -> int:
+    """Reserve a block of write sequence numbers.
+
+    Must be called inside the transaction that writes the rates: the counter row stays locked
+    until that transaction commits, so sequence numbers become visible in increasing order.
+
+    Args:
+        count: how many numbers to reserve
+
+    Returns:
+        the first number of the block
+    """
+    with transaction.atomic():
+        if not RateWriteSequence.objects.filter(pk=1).update(value=models.F('value') + count):
+            RateWriteSequence.objects.get_or_create(pk=1)
+            RateWriteSequence.objects.filter(pk=1).update(value=models.F('value') + count)
+        return RateWriteSequence.objects.get(pk=1).value - count + 1
+
+
 class CurrencyProvider(models.Model):
     """CurrencyProvider model."""
     FIXERIO = 'fixerio'
@@ -44,3 +69,60 @@ class CurrencyProvider(models.Model):
         choices=PROVIDER_CHOICES,
         default=FIXERIO)
     exchange_rate_code = models.TextField(blank=True, null=True)
+    requests_per_second = models.FloatField(blank=True, null=True, help_text='Empty for no limit (FixerIo only).')
+    monthly_quota = models.PositiveIntegerField(blank=True, null=True, help_text='Empty for no quota (FixerIo only).')
+
+
+class ProviderQuotaUsage(models.Model):
+    """ProviderQuotaUsage model, the calls made to a provider in a month."""
+    provider = models.ForeignKey(CurrencyProvider, related_name='quota_usages', on_delete=models.CASCADE)
+    month = models.DateField()
+    calls = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        """Meta class."""
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'month'], name='unique quota usage')
+        ]
+
+
+class CurrencyExchangeRateAggregate(models.Model):
+    """CurrencyExchangeRateAggregate model, a weekly or monthly rollup of a currency pair."""
+    WEEK = 'week'
+    MONTH = 'month'
+    INTERVAL_CHOICES = [
+        (WEEK, 'Week'),
+        (MONTH, 'Month')
+    ]
+
+    source_currency = models.ForeignKey(Currency, related_name='aggregates', on_delete=models.CASCADE)
+    exchanged_currency = models.ForeignKey(Currency, related_name='+', on_delete=models.CASCADE)
+    interval = models.CharField(max_length=5, choices=INTERVAL_CHOICES)
+    period_start = models.DateField(db_index=True)
+    open_value = models.DecimalField(decimal_places=6, max_digits=18)
+    high_value = models.DecimalField(decimal_places=6, max_digits=18)
+    low_value = models.DecimalField(decimal_places=6, max_digits=18)
+    close_value = models.DecimalField(decimal_places=6, max_digits=18)
+    mean_value = models.DecimalField(decimal_places=6, max_digits=18)
+    rate_count = models.IntegerField()
+
+    class Meta:
+        """Meta class."""
+        constraints = [
+            models.UniqueConstraint(fields=['source_currency', 'exchanged_currency', 'interval', 'period_start'],
+                                    name='unique aggregate')
+        ]
+
+
+class CurrencyPairVersion(models.Model):
+    """CurrencyPairVersion model, bumped every time rates of the pair are written."""
+    source_currency = models.ForeignKey(Currency, related_name='+', on_delete=models.CASCADE)
+    exchanged_currency = models.ForeignKey(Currency, related_name='+', on_delete=models.CASCADE)
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        """Meta class."""
+        constraints = [
+            models.UniqueConstraint(fields=['source_currency', 'exchanged_currency'], name='unique pair version')
+        ]
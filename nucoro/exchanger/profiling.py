@@ -0,0 +1,177 @@
+"""Profiling module.
+
+Opt-in cProfile of single production requests. A request is profiled when it carries a valid signed
+X-Nucoro-Profile header (see profile_token), when a staff user adds ?profile=1, or when it is picked
+by PROFILING_SAMPLE_RATE. The profile covers everything run by the thread of the request, the
+adapters, the waits for the providers and the ORM included.
+
+Profiles are stored in PROFILING_DIR as a ring buffer of the last PROFILING_MAX_PROFILES requests,
+one .prof file (pstats format) plus a .json file with the request, and browsed from the admin.
+"""
+import cProfile
+from datetime import datetime
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+import uuid
+
+from django.conf import settings  # type: ignore
+from django.core import signing  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_NUCORO_PROFILE'
+PROFILE_QUERY_FLAG = 'profile'
+PROFILE_SALT = 'exchanger.profiling'
+PROFILE_NAME = re.compile(r'^\d{20}-[0-9a-f]{8}$')
+TRIGGER_HEADER = 'header'
+TRIGGER_STAFF = 'staff'
+TRIGGER_SAMPLE = 'sample'
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+STATS_LIMIT = 60
+
+
+def profile_token() -> str:
+    """Returns a signed token for the X-Nucoro-Profile header, valid for PROFILING_TOKEN_MAX_AGE seconds.
+
+    Returns:
+        the token
+    """
+    return signing.dumps('profile', salt=PROFILE_SALT)
+
+
+def _trigger(request: Any) -> Optional[str]:
+    token = request.META.get(PROFILE_HEADER)
+    if token:
+        try:
+            signing.loads(token, salt=PROFILE_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+            return TRIGGER_HEADER
+        except signing.BadSignature:
+            logger.warning('Invalid profiling token on %s', request.path)
+    if request.GET.get(PROFILE_QUERY_FLAG) == '1' and getattr(request, 'user', None) and request.user.is_staff:
+        return TRIGGER_STAFF
+    if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:  # nosec
+        return TRIGGER_SAMPLE
+    return None
+
+
+def profiling_middleware(get_response: Callable) -> Callable:
+    """Profile the requests that ask for it and store their profiles.
+
+    Args:
+        get_response: the next middleware
+
+    Returns:
+        the middleware
+    """
+    def middleware(request: Any) -> Any:
+        trigger = _trigger(request)
+        if trigger is None:
+            return get_response(request)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+        try:
+            store_profile(profiler, {
+                'path': request.get_full_path(), 'method': request.method, 'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 1), 'trigger': trigger,
+                'user': getattr(getattr(request, 'user', None), 'username', ''),
+            })
+        except OSError:
+            logger.warning('The profile of %s could not be stored', request.path, exc_info=True)
+        return response
+    return middleware
+
+
+def store_profile(profiler: cProfile.Profile, meta: dict) -> str:
+    """Store a profile and drop the oldest ones beyond PROFILING_MAX_PROFILES.
+
+    Args:
+        profiler: the finished profiler
+        meta: the description of the profiled request
+
+    Returns:
+        the name of the profile
+    """
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    name = f'{time.time_ns():020d}-{uuid.uuid4().hex[:8]}'
+    path = os.path.join(settings.PROFILING_DIR, name)
+    profiler.dump_stats(f'{path}.prof')
+    with open(f'{path}.json', 'w') as meta_file:
+        json.dump(dict(meta, name=name, created=datetime.now().isoformat(timespec='seconds')), meta_file)
+    for old_name in _profile_names()[settings.PROFILING_MAX_PROFILES:]:
+        for suffix in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(settings.PROFILING_DIR, old_name + suffix))
+            except FileNotFoundError:
+                pass
+    return name
+
+
+def _profile_names() -> List[str]:
+    try:
+        files = os.listdir(settings.PROFILING_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted((file[:-5] for file in files if file.endswith('.json') and PROFILE_NAME.match(file[:-5])),
+                  reverse=True)
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Returns the stored profiles, newest first.
+
+    Returns:
+        the description of every profiled request
+    """
+    profiles = []
+    for name in _profile_names():
+        try:
+            with open(os.path.join(settings.PROFILING_DIR, f'{name}.json')) as meta_file:
+                profiles.append(json.load(meta_file))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def profile_path(name: str) -> str:
+    """Returns the path of the .prof file of a profile.
+
+    Args:
+        name: the name of the profile
+
+    Returns:
+        the path
+
+    Raises:
+        FileNotFoundError: there is no such profile
+    """
+    path = os.path.join(settings.PROFILING_DIR, f'{name}.prof')
+    if not PROFILE_NAME.match(name) or not os.path.exists(path):
+        raise FileNotFoundError(name)
+    return path
+
+
+def profile_stats(name: str, sort: str = 'cumulative') -> str:
+    """Returns the most expensive functions of a profile as text.
+
+    Args:
+        name: the name of the profile
+        sort: one of SORT_KEYS
+
+    Returns:
+        the pstats report
+    """
+    stream = io.StringIO()
+    stats = pstats.Stats(profile_path(name), stream=stream)
+    stats.sort_stats(sort if sort in SORT_KEYS else SORT_KEYS[0]).print_stats(STATS_LIMIT)
+    return stream.getvalue()
@@ -0,0 +1,212 @@
+"""Push module.
+
+Streams the written rates to clients over Server-Sent Events or WebSocket on the ASGI entry point.
+
+Every process that writes rates (web, RQ workers, commands) publishes them to a Redis channel. Each
+ASGI process keeps a single subscription to that channel and fans the messages out in memory to its
+connections, so an idle connection only costs a queue and a suspended coroutine.
+"""
+import asyncio
+from collections import defaultdict
+import json
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+from urllib.parse import parse_qs
+
+from django.conf import settings  # type: ignore
+from django.db import transaction  # type: ignore
+from django.dispatch import receiver  # type: ignore
+import django_rq  # type: ignore
+
+from exchanger.currencies import currency_code
+from exchanger.models import CurrencyExchangeRate
+from exchanger.signals import rates_written
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100
+ALL_PAIRS = '*'
+
+
+def rate_messages(rates: Iterable[CurrencyExchangeRate]) -> List[dict]:
+    """Build the pushed messages of some written rates.
+
+    Args:
+        rates: the written rates
+
+    Returns:
+        one message per rate
+    """
+    return [
+        {'source_currency': currency_code(rate.source_currency_id),
+         'exchanged_currency': currency_code(rate.exchanged_currency_id),
+         'valuation_date': str(rate.valuation_date), 'rate_value': str(rate.rate_value),
+         'sequence': rate.write_sequence}
+        for rate in rates
+    ]
+
+
+def publish_messages(messages: List[dict]) -> None:
+    """Publish messages on the Redis channel of the pushed rates.
+
+    Args:
+        messages: the messages to publish
+    """
+    try:
+        connection = django_rq.get_connection('default')
+        pipeline = connection.pipeline(transaction=False)
+        for message in messages:
+            pipeline.publish(settings.RATES_PUSH_CHANNEL, json.dumps(message))
+        pipeline.execute()
+    except Exception:
+        logger.warning('Rates could not be published', exc_info=True)
+
+
+@receiver(rates_written)
+def publish_rates(sender: Any, rates: Iterable[CurrencyExchangeRate], bulk: bool = False, **kwargs) -> None:
+    """Publish the written rates once their transaction commits, except the ones of bulk loads.
+
+    Args:
+        sender: the sender of the signal
+        rates: the written rates
+        bulk: whether the rates come from a bulk load, which is not pushed rate by rate
+        kwargs: extra signal arguments
+    """
+    if settings.RATES_PUSH_ENABLED and not bulk:
+        messages = rate_messages(rates)
+        transaction.on_commit(lambda: publish_messages(messages))
+
+
+class RateBroadcaster:
+    """In-process fan out of the pushed rates to the open connections of an event loop."""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self.subscriptions: Dict[asyncio.Queue, Set[str]] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.listener: Optional[threading.Thread] = None
+
+    def subscribe(self, pairs: Optional[Iterable[str]] = None) -> asyncio.Queue:
+        """Open a subscription.
+
+        Args:
+            pairs: the pairs to receive, like EUR-USD, or None for all of them
+
+        Returns:
+            the queue where the messages will be put
+        """
+        self.start()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.subscriptions[queue] = set(pairs or [ALL_PAIRS])
+        for pair in self.subscriptions[queue]:
+            self.subscribers[pair].add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """Close a subscription.
+
+        Args:
+            queue: the queue returned by subscribe
+        """
+        for pair in self.subscriptions.pop(queue, set()):
+            self.subscribers[pair].discard(queue)
+            if not self.subscribers[pair]:
+                del self.subscribers[pair]
+
+    def dispatch(self, message: dict) -> None:
+        """Put a message in the queue of every matching subscription, dropping it for the slow ones.
+
+        Args:
+            message: the pushed rate
+        """
+        pair = f"{message['source_currency']}-{message['exchanged_currency']}"
+        for queue in self.subscribers.get(pair, set()) | self.subscribers.get(ALL_PAIRS, set()):
+            if not queue.full():
+                queue.put_nowait(message)
+
+    def start(self) -> None:
+        """Start listening to the Redis channel, once per process."""
+        if self.listener is not None or not settings.RATES_PUSH_ENABLED:
+            return
+        self.loop = asyncio.get_event_loop()
+        self.listener = threading.Thread(target=self._listen, name='rates-push-listener', daemon=True)
+        self.listener.start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = django_rq.get_connection('default').pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(settings.RATES_PUSH_CHANNEL)
+                for raw_message in pubsub.listen():
+                    self.loop.call_soon_threadsafe(self.dispatch, json.loads(raw_message['data']))  # type: ignore
+            except Exception:
+                logger.warning('Rates channel subscription lost, retrying', exc_info=True)
+                time.sleep(1)
+
+
+broadcaster = RateBroadcaster()
+
+
+def _parse_pairs(scope: dict) -> Optional[List[str]]:
+    query = parse_qs(scope.get('query_string', b'').decode())
+    pairs = [pair.upper() for value in query.get('pairs', []) for pair in value.split(',') if pair]
+    return pairs or None
+
+
+async def _pump(queue: asyncio.Queue, emit: Callable[[Optional[dict]], Awaitable[None]],
+                receive: Callable[[], Awaitable[dict]]) -> None:
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        while not disconnected.done():
+            next_message = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({next_message, disconnected}, timeout=settings.RATES_PUSH_HEARTBEAT,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if next_message in done:
+                await emit(next_message.result())
+            else:
+                next_message.cancel()
+                if not done:
+                    await emit(None)
+    finally:
+        disconnected.cancel()
+
+
+async def _wait_disconnect(receive: Callable[[], Awaitable[dict]]) -> None:
+    while (await receive())['type'] not in ('http.disconnect', 'websocket.disconnect'):
+        pass
+
+
+async def rates_stream(scope: dict, receive: Callable[[], Awaitable[dict]], send: Callable[[dict], Awaitable[None]]) -> None:
+    """ASGI application that pushes the written rates.
+
+    HTTP connections get Server-Sent Events (one rate event per rate, plus keep-alive comments),
+    WebSocket connections get one JSON text frame per rate. The optional pairs query parameter
+    filters the rates, ex: ?pairs=EUR-USD,EUR-GBP
+
+    Args:
+        scope: the ASGI scope
+        receive: the ASGI receive callable
+        send: the ASGI send callable
+    """
+    queue = broadcaster.subscribe(_parse_pairs(scope))
+    try:
+        if scope['type'] == 'websocket':
+            await receive()  # websocket.connect
+            await send({'type': 'websocket.accept'})
+
+            async def emit(message: Optional[dict]) -> None:
+                if message is not None:
+                    await send({'type': 'websocket.send', 'text': json.dumps(message)})
+        else:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no')]})
+
+            async def emit(message: Optional[dict]) -> None:
+                body = f'event: rate\ndata: {json.dumps(message)}\n\n' if message is not None else ': keep-alive\n\n'
+                await send({'type': 'http.response.body', 'body': body.encode(), 'more_body': True})
+        await _pump(queue, emit, receive)
+    finally:
+        broadcaster.unsubscribe(queue)
@@ -0,0 +1,356 @@
+"""Quota module.
+
+Schedules the requests to providers with quotas (FixerIo). Each provider gets a token bucket for its
+requests per second and a monthly quota counted in the database. Requests wait in a priority queue where
+interactive lookups go before background work (backfills, warm ups), and the pending requests for the same
+date are merged into a single multi-symbol call whose answer is memoized for a few seconds. A call reserves
+its place in the monthly quota before it is queued (and gives it back when it fails), so concurrent requests
+and processes do not go over the quota. The calls run concurrently on a pool of FIXERIO_MAX_CONCURRENT_CALLS
+threads, at the rate of the token bucket, and a request waits for its call FIXERIO_WAIT_TIMEOUT seconds at most.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, Type
+
+from django.conf import settings  # type: ignore
+from django.db import models, transaction  # type: ignore
+from django.utils import timezone  # type: ignore
+
+from exchanger.exceptions import ProviderUnavailable
+from exchanger.models import CurrencyProvider, ProviderQuotaUsage
+from exchanger.throttling import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+_priority: ContextVar[int] = ContextVar('provider_request_priority', default=PRIORITY_INTERACTIVE)
+
+Fetch = Callable[[date, List[str]], Dict[str, float]]
+
+
+class QuotaExceeded(ProviderUnavailable):
+    """Class to represent when the monthly quota of a provider is exhausted."""
+    message = 'Provider quota exceeded'
+
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """Set the priority of the provider requests made inside the block (lower goes first).
+
+    Args:
+        priority: PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND or any other integer
+
+    Yields:
+        nothing
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _current_month() -> date:
+    return timezone.now().date().replace(day=1)
+
+
+def get_usage(provider: CurrencyProvider) -> int:
+    """Returns the calls made to a provider this month.
+
+    Args:
+        provider: the provider
+
+    Returns:
+        the number of calls
+    """
+    usage = ProviderQuotaUsage.objects.filter(provider=provider, month=_current_month()).first()
+    return usage.calls if usage else 0
+
+
+def record_usage(provider: CurrencyProvider, calls: int = 1) -> None:
+    """Count calls made to a provider this month.
+
+    Args:
+        provider: the provider
+        calls: the number of calls
+    """
+    month = _current_month()
+    with transaction.atomic():
+        if not ProviderQuotaUsage.objects.filter(provider=provider, month=month).update(calls=models.F('calls') + calls):
+            ProviderQuotaUsage.objects.get_or_create(provider=provider, month=month)
+            ProviderQuotaUsage.objects.filter(provider=provider, month=month).update(calls=models.F('calls') + calls)
+
+
+def reserve_usage(provider: CurrencyProvider) -> None:
+    """Count a call about to be made to a provider this month, if its monthly quota allows it.
+
+    The quota is checked by the update itself, so concurrent reservations never go over it.
+
+    Args:
+        provider: the provider
+
+    Raises:
+        QuotaExceeded: the monthly quota of the provider is exhausted
+    """
+    month = _current_month()
+    usage = ProviderQuotaUsage.objects.filter(provider=provider, month=month)
+    if provider.monthly_quota is not None:
+        usage = usage.filter(calls__lt=provider.monthly_quota)
+    with transaction.atomic():
+        if not usage.update(calls=models.F('calls') + 1):
+            ProviderQuotaUsage.objects.get_or_create(provider=provider, month=month)
+            if not usage.update(calls=models.F('calls') + 1):
+                logger.warning('Monthly quota of provider %s exhausted', provider.name)
+                raise QuotaExceeded()
+
+
+class _PendingCall:
+    """A call waiting for its turn, shared by every request merged into it."""
+
+    def __init__(self, valuation_date: date, priority: int, order: int):
+        self.valuation_date = valuation_date
+        self.priority = priority
+        self.order = order
+        self.symbols: Set[str] = set()
+        self.done = threading.Event()
+        self.ready = True
+        self.fired = False
+        self.rates: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.error_class: Type[ProviderUnavailable] = ProviderUnavailable
+
+    def result(self) -> Dict[str, float]:
+        if self.error is not None:
+            raise self.error_class(self.error)
+        return self.rates
+
+
+class ProviderScheduler:
+    """Queues, merges and prioritizes the calls to a provider, started at its rate limit by a dispatcher thread."""
+
+    def __init__(self, fetch: Fetch, rate_limit: Optional[float] = None):
+        self.fetch = fetch
+        self.rate_limit = rate_limit
+        self.bucket = TokenBucket(rate_limit) if rate_limit else None
+        self.pid: Optional[int] = None
+        self.start_lock = threading.Lock()
+
+    def _start(self) -> None:
+        # The state of a forked process is rebuilt: its dispatcher thread did not survive the fork
+        with self.start_lock:
+            if self.pid == os.getpid():
+                return
+            self.condition = threading.Condition()
+            self.pending: Dict[date, _PendingCall] = {}
+            self.memo: Dict[date, Tuple[float, Dict[str, float]]] = {}
+            self.orders = itertools.count()
+            # A call is only taken from the queue when a thread of the pool is free, so it can still be merged
+            self.pool = ThreadPoolExecutor(settings.FIXERIO_MAX_CONCURRENT_CALLS, thread_name_prefix='provider-call')
+            self.slots = threading.Semaphore(settings.FIXERIO_MAX_CONCURRENT_CALLS)
+            threading.Thread(target=self._dispatch, name='provider-scheduler', daemon=True).start()
+            self.pid = os.getpid()
+
+    def set_rate_limit(self, rate_limit: Optional[float]) -> None:
+        """Change the requests per second allowed.
+
+        Args:
+            rate_limit: requests per second, None for no limit
+        """
+        if rate_limit != self.rate_limit:
+            self.rate_limit = rate_limit
+            self.bucket = TokenBucket(rate_limit) if rate_limit else None
+
+    @property
+    def pending_calls(self) -> int:
+        """Calls waiting in this process.
+
+        Returns:
+            the number of calls
+        """
+        return len(self.pending) if self.pid == os.getpid() else 0
+
+    def cached(self, valuation_date: date, symbols: List[str]) -> Optional[Dict[str, float]]:
+        """Returns the memoized answer of a recent call with all the symbols, if any.
+
+        Args:
+            valuation_date: the date of the rates
+            symbols: the currency codes
+
+        Returns:
+            the rates of the call, by currency code, or None
+        """
+        self._start()
+        with self.condition:
+            memo = self.memo.get(valuation_date)
+            if memo and memo[0] > time.monotonic() and all(symbol in memo[1] for symbol in symbols):
+                return memo[1]
+        return None
+
+    def request(self, valuation_date: date, symbols: List[str], reserve: Optional[Callable[[], None]] = None,
+                release: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+        """Returns the rates of some symbols for a date, waiting for the call that gets them.
+
+        Args:
+            valuation_date: the date of the rates
+            symbols: the currency codes
+            reserve: called once (by the request that queues the call) before the call is made, its errors
+                fail the call
+            release: called by that request when a reserved call fails
+
+        Returns:
+            the rates of the call, by currency code
+
+        Raises:
+            ProviderUnavailable: the call failed or did not answer in time
+        """
+        rates = self.cached(valuation_date, symbols)
+        if rates is not None:
+            return rates
+        with self.condition:
+            call = self.pending.get(valuation_date)
+            owner = call is None
+            if call is None:
+                call = self.pending[valuation_date] = _PendingCall(valuation_date, _priority.get(), next(self.orders))
+                # The dispatcher skips the call until it is reserved, outside the lock
+                call.ready = reserve is None
+            call.symbols.update(symbols)
+            call.priority = min(call.priority, _priority.get())
+            self.condition.notify()
+        if owner and reserve:
+            self._reserve(call, reserve)
+        if not call.done.wait(settings.FIXERIO_WAIT_TIMEOUT):
+            self._drop(call, 'Provider call timed out')
+            if not call.done.is_set():
+                raise ProviderUnavailable('Provider call timed out')
+        if call.error is not None and owner and release:
+            release()
+        return call.result()
+
+    def _reserve(self, call: _PendingCall, reserve: Callable[[], None]) -> None:
+        try:
+            reserve()
+        except ProviderUnavailable as e:
+            self._drop(call, e.message, type(e))
+            raise
+        except Exception as e:
+            self._drop(call, str(e))
+            raise
+        with self.condition:
+            call.ready = True
+            self.condition.notify()
+
+    def _drop(self, call: _PendingCall, error: str, error_class: Type[ProviderUnavailable] = ProviderUnavailable) -> None:
+        # A call still in the queue fails without being made, with the requests merged into it
+        with self.condition:
+            if self.pending.get(call.valuation_date) is call:
+                del self.pending[call.valuation_date]
+                call.error = error
+                call.error_class = error_class
+                call.done.set()
+
+    def _dispatch(self) -> None:
+        while True:
+            with self.condition:
+                while not any(pending.ready for pending in self.pending.values()):
+                    self.condition.wait()
+            # Requests arriving while waiting for the merge window or a token join the pending calls
+            time.sleep(settings.FIXERIO_MERGE_WINDOW)
+            self.slots.acquire()
+            if self.bucket:
+                self.bucket.acquire()
+            with self.condition:
+                ready = [pending for pending in self.pending.values() if pending.ready]
+                if not ready:
+                    self.slots.release()
+                    continue
+                call = min(ready, key=lambda pending: (pending.priority, pending.order))
+                del self.pending[call.valuation_date]
+                call.fired = True
+            self.pool.submit(self._call, call)
+
+    def _call(self, call: _PendingCall) -> None:
+        try:
+            call.rates = self.fetch(call.valuation_date, sorted(call.symbols))
+            if settings.FIXERIO_MEMO_TIMEOUT:
+                now = time.monotonic()
+                with self.condition:
+                    self.memo = {day: memo for day, memo in self.memo.items() if memo[0] > now}
+                    self.memo[call.valuation_date] = (now + settings.FIXERIO_MEMO_TIMEOUT, call.rates)
+        except ProviderUnavailable as e:
+            call.error = e.message
+        except Exception as e:
+            call.error = str(e)
+        finally:
+            self.slots.release()
+            call.done.set()
+
+
+_schedulers: Dict[int, ProviderScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(provider: CurrencyProvider, fetch: Fetch) -> ProviderScheduler:
+    """Returns the scheduler of a provider in this process.
+
+    Args:
+        provider: the provider
+        fetch: function that makes a call to the provider
+
+    Returns:
+        the scheduler
+    """
+    with _schedulers_lock:
+        if provider.id not in _schedulers:
+            _schedulers[provider.id] = ProviderScheduler(fetch, provider.requests_per_second)
+        scheduler = _schedulers[provider.id]
+    scheduler.set_rate_limit(provider.requests_per_second)
+    return scheduler
+
+
+def request_rates(provider: CurrencyProvider, valuation_date: date, symbols: List[str], fetch: Fetch) -> Dict[str, float]:
+    """Returns rates of a provider through its scheduler, within its monthly quota.
+
+    When the quota is exhausted the call is not made and QuotaExceeded is raised.
+
+    Args:
+        provider: the provider
+        valuation_date: the date of the rates
+        symbols: the currency codes
+        fetch: function that makes a call to the provider
+
+    Returns:
+        the rates by currency code (the call may return more symbols)
+    """
+    return get_scheduler(provider, fetch).request(
+        valuation_date, symbols, lambda: reserve_usage(provider), lambda: record_usage(provider, -1))
+
+
+def get_quota_usage() -> List[dict]:
+    """Returns the quota usage of the FixerIo providers.
+
+    Returns:
+        a dict per provider with the calls made this month, its limits and the calls waiting in this process
+    """
+    usage = []
+    for provider in CurrencyProvider.objects.filter(provider_type=CurrencyProvider.FIXERIO).order_by('priority'):
+        calls = get_usage(provider)
+        scheduler = _schedulers.get(provider.id)
+        usage.append({
+            'provider': provider.name,
+            'month': str(_current_month()),
+            'calls': calls,
+            'monthly_quota': provider.monthly_quota,
+            'remaining': max(provider.monthly_quota - calls, 0) if provider.monthly_quota is not None else None,
+            'requests_per_second': provider.requests_per_second,
+            'pending_calls': scheduler.pending_calls if scheduler else 0,
+        })
+    return usage
@@ -0,0 +1,103 @@
+"""Rollups module.
+
+Keeps the weekly and monthly aggregates of every currency pair in sync with the stored rates.
+"""
+from calendar import monthrange
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Iterable, List, Set, Tuple
+
+from django.dispatch import receiver  # type: ignore
+
+from exchanger.models import CurrencyExchangeRate, CurrencyExchangeRateAggregate
+from exchanger.signals import rates_written
+
+RATE_QUANTUM = Decimal('0.000001')
+
+
+def period_start(interval: str, day: date) -> date:
+    """Returns the first day of the period that contains a date.
+
+    Args:
+        interval: CurrencyExchangeRateAggregate.WEEK or CurrencyExchangeRateAggregate.MONTH
+        day: the date
+
+    Returns:
+        the monday of the week or the first day of the month
+    """
+    if interval == CurrencyExchangeRateAggregate.WEEK:
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def period_end(interval: str, start: date) -> date:
+    """Returns the last day of the period that starts on a date.
+
+    Args:
+        interval: CurrencyExchangeRateAggregate.WEEK or CurrencyExchangeRateAggregate.MONTH
+        start: the first day of the period
+
+    Returns:
+        the sunday of the week or the last day of the month
+    """
+    if interval == CurrencyExchangeRateAggregate.WEEK:
+        return start + timedelta(days=6)
+    return start.replace(day=monthrange(start.year, start.month)[1])
+
+
+def summarize(values: List[Decimal]) -> dict:
+    """Returns the open, high, low, close and mean of a chronological list of rates.
+
+    Args:
+        values: the rates of a period ordered by valuation date
+
+    Returns:
+        a dict with the fields of a CurrencyExchangeRateAggregate
+    """
+    return {
+        'open_value': values[0],
+        'high_value': max(values),
+        'low_value': min(values),
+        'close_value': values[-1],
+        'mean_value': (sum(values) / len(values)).quantize(RATE_QUANTUM),
+        'rate_count': len(values),
+    }
+
+
+def refresh_aggregates(rates: Iterable[CurrencyExchangeRate]) -> None:
+    """Recompute the weekly and monthly aggregates touched by some rates.
+
+    Only the periods that contain the given rates are read again, so the cost depends on the
+    number of written rates and not on the size of the history.
+
+    Args:
+        rates: the written (or deleted) rates
+    """
+    buckets: Set[Tuple[int, int, str, date]] = {
+        (rate.source_currency_id, rate.exchanged_currency_id, interval, period_start(interval, rate.valuation_date))
+        for rate in rates for interval in (CurrencyExchangeRateAggregate.WEEK, CurrencyExchangeRateAggregate.MONTH)
+    }
+    for source_currency_id, exchanged_currency_id, interval, start in buckets:
+        pair = {'source_currency_id': source_currency_id, 'exchanged_currency_id': exchanged_currency_id}
+        values = list(CurrencyExchangeRate.objects.filter(
+            valuation_date__gte=start, valuation_date__lte=period_end(interval, start), **pair
+        ).order_by('valuation_date').values_list('rate_value', flat=True))
+        if values:
+            CurrencyExchangeRateAggregate.objects.update_or_create(
+                interval=interval, period_start=start, defaults=summarize(values), **pair)
+        else:
+            CurrencyExchangeRateAggregate.objects.filter(interval=interval, period_start=start, **pair).delete()
+
+
+@receiver(rates_written)
+def update_aggregates(sender: Any, rates: Iterable[CurrencyExchangeRate], bulk: bool = False, **kwargs) -> None:
+    """Keep the aggregates up to date when rates are written.
+
+    Args:
+        sender: the sender of the signal
+        rates: the written rates
+        bulk: whether the rates come from a bulk load, which stores its aggregates itself
+        kwargs: extra signal arguments
+    """
+    if not bulk:
+        refresh_aggregates(rates)
@@ -0,0 +1,129 @@
+"""Database routers module.
+
+Sends the reads to the replicas of DATABASE_REPLICAS and the writes to the primary (default). A caller
+that wrote reads from the primary afterwards: for the rest of its request and, through the cookie set by
+exchanger.middleware.sticky_primary_middleware, for DATABASE_STICKY_SECONDS after it, so it sees its own
+writes despite the replication lag. Outside requests (commands, RQ jobs) reads stick to the primary after
+the first write of the thread.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import random
+from typing import Any, Iterator, Optional
+
+from django.conf import settings  # type: ignore
+
+PRIMARY = 'default'
+
+
+class Routing:
+    """Routing state of a request: whether it reads from the primary and whether it wrote."""
+
+    def __init__(self, pinned: bool = False):
+        self.pinned = pinned
+        self.written = False
+
+
+_routing: ContextVar[Optional[Routing]] = ContextVar('database_routing', default=None)
+
+
+def _current_routing() -> Routing:
+    routing = _routing.get()
+    if routing is None:
+        routing = Routing()
+        _routing.set(routing)
+    return routing
+
+
+@contextmanager
+def routing_scope(pinned: bool = False) -> Iterator[Routing]:
+    """Start a new routing state, for a request.
+
+    Args:
+        pinned: whether the reads go to the primary from the start
+
+    Yields:
+        the routing state
+    """
+    routing = Routing(pinned)
+    token = _routing.set(routing)
+    try:
+        yield routing
+    finally:
+        _routing.reset(token)
+
+
+@contextmanager
+def use_primary() -> Iterator[None]:
+    """Send the reads inside the block to the primary, for reads that must see the data about to be written.
+
+    Yields:
+        nothing
+    """
+    routing = _current_routing()
+    pinned = routing.pinned
+    routing.pinned = True
+    try:
+        yield
+    finally:
+        routing.pinned = pinned or routing.written
+
+
+class PrimaryReplicaRouter:
+    """Router of the reads to the replicas and the writes to the primary."""
+
+    def db_for_read(self, model: Any, **hints) -> str:
+        """Returns the database of a read.
+
+        Args:
+            model: the model read
+            hints: extra information of the query
+
+        Returns:
+            a replica, or the primary when there are none or the caller wrote
+        """
+        routing = _routing.get()
+        if not settings.DATABASE_REPLICAS or routing is not None and routing.pinned:
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model: Any, **hints) -> str:
+        """Returns the database of a write, and sends the next reads of the caller to it.
+
+        Args:
+            model: the model written
+            hints: extra information of the query
+
+        Returns:
+            the primary
+        """
+        routing = _current_routing()
+        routing.pinned = routing.written = True
+        return PRIMARY
+
+    def allow_relation(self, obj1: Any, obj2: Any, **hints) -> bool:
+        """Allow relations between objects of any database, they all hold the same data.
+
+        Args:
+            obj1: an object
+            obj2: another object
+            hints: extra information
+
+        Returns:
+            True
+        """
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, model_name: Optional[str] = None, **hints) -> bool:
+        """Migrate only the primary, the replicas get its changes through the replication.
+
+        Args:
+            db: the database alias
+            app_label: the app of the migration
+            model_name: the model migrated
+            hints: extra information
+
+        Returns:
+            whether the database is migrated
+        """
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,8 @@
+"""Signals module."""
+from django.dispatch import Signal  # type: ignore
+
+# Sent after exchange rates are created, updated or deleted. The ``rates`` argument holds the
+# affected CurrencyExchangeRate instances (deleted ones keep their currency ids and valuation date).
+# Bulk loads (seed_rates) send it once with ``bulk=True`` and one rate per pair and edge of their range: the
+# pair versions are bumped, the aggregates are left to the sender and the rates are not pushed one by one.
+rates_written = Signal()
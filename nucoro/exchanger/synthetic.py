@@ -0,0 +1,114 @@
+"""Synthetic rates module.
+
+Deterministic random walks of every currency against EUR, computed with NumPy. The log rate of
+each currency reverts to its base rate (an AR(1) process with a half life of HALF_LIFE_DAYS), so
+the rates move like real ones but never drift away without bound.
+
+Every walk starts on EPOCH and only depends on the seed and the currency code, so a rate does not
+change with the range or the other currencies it is generated with. Cross rates are the ratio of
+the EUR rates of both currencies.
+"""
+from datetime import date
+from functools import lru_cache
+import math
+from typing import Sequence
+
+import numpy as np  # type: ignore
+
+EPOCH = date(1999, 1, 1)
+EUR_BASE_RATES = {'EUR': 1.0, 'USD': 1.15, 'GBP': 0.80, 'CHF': 1.10}
+DAILY_VOLATILITY = 0.005
+HALF_LIFE_DAYS = 250
+BLOCK_DAYS = 1024
+CACHE_DAYS = 366
+
+
+def _code_key(code: str) -> int:
+    return int.from_bytes(code.encode(), 'big')
+
+
+def _mean_reverting(shocks: np.ndarray, phi: float) -> np.ndarray:
+    """Solve x[t] = phi * x[t - 1] + shocks[t] (with x[-1] = 0) along the first axis.
+
+    Within a block, x[s + j] = phi ** j * (phi * x[s - 1] + sum(shocks[s + i] / phi ** i for i <= j)), a
+    cumulative sum. Blocks keep the powers of phi in range.
+
+    Args:
+        shocks: the daily shocks, one row per day
+        phi: the daily persistence, below 1
+
+    Returns:
+        the deviations, with the shape of the shocks
+    """
+    deviations = np.empty_like(shocks)
+    last = np.zeros(shocks.shape[1:])
+    for start in range(0, len(shocks), BLOCK_DAYS):
+        block = shocks[start:start + BLOCK_DAYS]
+        powers = (phi ** np.arange(len(block))).reshape((-1,) + (1,) * (block.ndim - 1))
+        deviations[start:start + len(block)] = powers * (phi * last + np.cumsum(block / powers, axis=0))
+        last = deviations[start + len(block) - 1]
+    return deviations
+
+
+@lru_cache(maxsize=256)
+def _eur_walk(code: str, seed: int, days: int) -> np.ndarray:
+    if code == 'EUR':
+        return np.ones(days)
+    generator = np.random.default_rng([seed, _code_key(code)])
+    base = EUR_BASE_RATES.get(code) or math.exp(generator.uniform(math.log(0.5), math.log(150)))
+    shocks = generator.standard_normal(days) * DAILY_VOLATILITY
+    return base * np.exp(_mean_reverting(shocks, 0.5 ** (1 / HALF_LIFE_DAYS)))
+
+
+def eur_rates(codes: Sequence[str], date_from: date, date_to: date, seed: int = 0) -> np.ndarray:
+    """Returns the EUR rates of some currencies in a date range.
+
+    Args:
+        codes: the currency codes
+        date_from: first date
+        date_to: last date
+        seed: seed of the walks
+
+    Returns:
+        an array with one row per day and one column per currency
+
+    Raises:
+        ValueError: the range is empty or starts before EPOCH
+    """
+    if date_from < EPOCH or date_to < date_from:
+        raise ValueError(f'Synthetic rates are generated from {EPOCH} on, for non empty ranges')
+    first, last = (date_from - EPOCH).days, (date_to - EPOCH).days
+    days = (last // CACHE_DAYS + 1) * CACHE_DAYS
+    return np.column_stack([_eur_walk(code, seed, days)[first:last + 1] for code in codes])
+
+
+def pair_rates(source_currency: str, codes: Sequence[str], date_from: date, date_to: date, seed: int = 0) -> np.ndarray:
+    """Returns the rates from a source currency to some currencies in a date range, rounded like the stored ones.
+
+    Args:
+        source_currency: the source currency
+        codes: the exchanged currencies
+        date_from: first date
+        date_to: last date
+        seed: seed of the walks
+
+    Returns:
+        an array with one row per day and one column per exchanged currency
+    """
+    rates = eur_rates([source_currency, *codes], date_from, date_to, seed)
+    return np.round(rates[:, 1:] / rates[:, :1], 6)
+
+
+def synthetic_rate(source_currency: str, exchanged_currency: str, valuation_date: date, seed: int = 0) -> float:
+    """Returns the rate of a pair on a date.
+
+    Args:
+        source_currency: the source currency
+        exchanged_currency: the exchanged currency
+        valuation_date: the date
+        seed: seed of the walks
+
+    Returns:
+        the rate
+    """
+    return float(pair_rates(source_currency, [exchanged_currency], valuation_date, valuation_date, seed)[0, 0])
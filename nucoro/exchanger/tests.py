@@ -1,13 +1,65 @@
 """Test module."""
-from datetime import datetime, timedelta
+import asyncio
+import csv
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+import gzip
+import io
+import json
+import math
+import os
+import socket
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
 from typing import Any
+from unittest import skipUnless
 from unittest.mock import patch
 
-from django.test import TestCase  # type: ignore
+from django.conf import settings  # type: ignore
+from django.contrib.auth.models import User  # type: ignore
+from django.core.cache import cache  # type: ignore
+from django.core.exceptions import ImproperlyConfigured  # type: ignore
+from django.core.management import call_command, CommandError  # type: ignore
+from django.db import connection, OperationalError  # type: ignore
+from django.db.utils import load_backend  # type: ignore
+from django.test import (  # type: ignore
+    LiveServerTestCase, override_settings, SimpleTestCase, TestCase, TransactionTestCase
+)
+from django.test.utils import CaptureQueriesContext  # type: ignore
+import numpy as np  # type: ignore
+import requests
 
-from exchanger.interactors import _get_exchange_rate, currency_converter, get_exchange_rates, time_weight_rate
-from exchanger.models import Currency, CurrencyExchangeRate, CurrencyProvider
+from exchanger import interactors
+from exchanger.adapter import Adapter
+from exchanger.analytics import _cache_key, get_rolling_stats, rolling_stats
+from exchanger.charts import build_chart_data, get_chart_data
+from exchanger.currencies import clear_registry, currency_code, currency_codes, currency_id, get_currency
+from exchanger.exceptions import ProviderUnavailable
+from exchanger.export import EXPORT_COLUMNS, iter_export_rows, PARQUET_AVAILABLE
+from exchanger.interactors import (
+    _get_exchange_rate, currency_converter, FILL_FORWARD, FILL_INTERPOLATE, get_exchange_rate_data, get_exchange_rates,
+    get_exchange_rates_by_source, get_rate_changes, iter_exchange_rates, schedule_rates_warmup, time_weight_rate,
+    warm_todays_rates
+)
+from exchanger.management.commands.loadtest import StubFixerIo
+from exchanger.metrics import JOBS_REDIS_KEY, record_job
+from exchanger.models import Currency, CurrencyExchangeRate, CurrencyExchangeRateAggregate, CurrencyProvider
+from exchanger.profiling import list_profiles, profile_token
+from exchanger.push import broadcaster, rates_stream
+from exchanger.quota import (
+    get_usage, PRIORITY_BACKGROUND, ProviderScheduler, QuotaExceeded, request_priority, reserve_usage)
+from exchanger.rollups import refresh_aggregates
+from exchanger.signals import rates_written
+from exchanger.synthetic import pair_rates, synthetic_rate
+from exchanger.versions import get_version
+from exchanger.writebehind import flush, queue_rate
+
+
+# The FixerIo calls are mocked, any key is accepted
+TEST_APIKEY = 'test'
 
 
 class MockFixerIOResponseSuccess:
@@ -58,6 +110,7 @@ class MockFixerIOResponseFail:
         }
 
 
+@override_settings(FIXERIO_APIKEY=TEST_APIKEY)
 class ExchangeTestCase(TestCase):
     """Exchange rate test case."""
     def setUp(self) -> None:
@@ -144,6 +197,23 @@ class ExchangeTestCase(TestCase):
         self.assertEqual(data.valuation_date, ten_days_ago_date)  # type: ignore
         self.assertEqual(float(data.rate_value), 1.17593)  # type: ignore
 
+    @patch("requests.get", return_value=MockFixerIOResponseSuccess())
+    def test_provider_fixerIo_without_apikey(self, mocked: Any) -> None:
+        """Test that a missing FixerIo access key is only reported when FixerIo is called, not for a currency itself.
+
+        Args:
+            mocked: the mock of the call to fixerIo.
+        """
+        with override_settings(FIXERIO_APIKEY=None):
+            with self.assertRaises(ImproperlyConfigured):
+                _get_exchange_rate('EUR', 'USD', self.today - timedelta(days=10))
+            with override_settings(RATES_HEDGE_AFTER=1), self.assertRaises(ImproperlyConfigured):
+                _get_exchange_rate('EUR', 'USD', self.today - timedelta(days=10))
+            fixerio = CurrencyProvider.objects.get(name='FixerIo')
+            self.assertEqual(Adapter(fixerio, 'EUR', 'EUR', self.today).get_fixier_exchange_rate(), 1.0)
+
+        mocked.assert_not_called()
+
     @patch("requests.get", return_value=MockFixerIOResponseFail())
     def test_provider_mock(self, mocked: Any) -> None:
         """Test mock provier, after fixerIo fails.
@@ -158,3 +228,1178 @@ class ExchangeTestCase(TestCase):
         self.assertEqual(data.exchanged_currency, self.usd)  # type: ignore
         self.assertEqual(data.valuation_date, twelve_days_ago_date)  # type: ignore
         self.assertEqual(float(data.rate_value), 1.15)  # type: ignore
+
+
+def create_rates_with_gaps(test_case: TestCase) -> None:
+    """Store EUR-USD rates on the first and fifth of six days, leaving gaps to fill.
+
+    Args:
+        test_case: the test case, its first_day and last_day are set.
+    """
+    test_case.first_day = datetime.today().date() - timedelta(days=10)
+    test_case.last_day = test_case.first_day + timedelta(days=5)
+    eur = Currency.objects.get(code="EUR")
+    usd = Currency.objects.get(code="USD")
+    CurrencyExchangeRate.objects.create(source_currency=eur, exchanged_currency=usd,
+                                        valuation_date=test_case.first_day, rate_value=Decimal('1.10'))
+    CurrencyExchangeRate.objects.create(source_currency=eur, exchanged_currency=usd,
+                                        valuation_date=test_case.first_day + timedelta(days=4), rate_value=Decimal('1.30'))
+
+
+class GapFillTestCase(TestCase):
+    """Gap fill policies test case."""
+    def setUp(self) -> None:
+        """Setup function for GapFillTestCase."""
+        create_rates_with_gaps(self)
+
+    @patch("requests.get")
+    def test_forward_fill(self, mocked: Any) -> None:
+        """Test the forward fill policy.
+
+        Args:
+            mocked: the mock of the call to fixerIo.
+        """
+        data = get_exchange_rates('EUR', self.first_day, self.last_day, fill=FILL_FORWARD)
+
+        self.assertEqual(data[str(self.first_day + timedelta(days=2))]['USD'], Decimal('1.10'))
+        self.assertEqual(data[str(self.last_day)]['USD'], Decimal('1.30'))
+        self.assertEqual(data[str(self.last_day)]['EUR'], Decimal(1))
+        self.assertIsNone(data[str(self.last_day)]['GBP'])
+        self.assertEqual(CurrencyExchangeRate.objects.count(), 2)
+        mocked.assert_not_called()
+
+    @patch("requests.get")
+    def test_interpolate_fill(self, mocked: Any) -> None:
+        """Test the linear interpolation policy.
+
+        Args:
+            mocked: the mock of the call to fixerIo.
+        """
+        data = get_exchange_rates('EUR', self.first_day, self.last_day, fill=FILL_INTERPOLATE)
+
+        self.assertEqual(data[str(self.first_day + timedelta(days=1))]['USD'], Decimal('1.15'))
+        self.assertEqual(data[str(self.first_day + timedelta(days=2))]['USD'], Decimal('1.20'))
+        self.assertEqual(data[str(self.last_day)]['USD'], Decimal('1.30'))
+        self.assertEqual(CurrencyExchangeRate.objects.count(), 2)
+        mocked.assert_not_called()
+
+
+class StreamingTestCase(TestCase):
+    """Streamed exchange_rates test case."""
+    def setUp(self) -> None:
+        """Setup function for StreamingTestCase."""
+        create_rates_with_gaps(self)
+
+    def test_stream_ndjson(self) -> None:
+        """Test the NDJSON stream of exchange_rates with forward fill."""
+        response = self.client.get('/v1/exchange_rates/', {
+            'source_currency': 'EUR', 'date_from': str(self.first_day), 'date_to': str(self.last_day),
+            'stream': 'ndjson', 'fill': 'forward'})
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(lines[3], {'date': str(self.first_day + timedelta(days=3)),
+                                    'rates': {'EUR': 1.0, 'CHF': None, 'USD': 1.1, 'GBP': None}})
+        self.assertEqual(lines[4]['rates']['USD'], 1.3)
+
+    def test_stream_csv(self) -> None:
+        """Test the CSV stream of exchange_rates."""
+        response = self.client.get('/v1/exchange_rates/', {
+            'source_currency': 'EUR', 'date_from': str(self.first_day), 'date_to': str(self.last_day), 'stream': 'csv'})
+        content = b''.join(response.streaming_content).decode()
+
+        self.assertEqual(content.splitlines(), [
+            'date,currency,rate', f'{self.first_day},USD,1.100000', f'{self.first_day + timedelta(days=4)},USD,1.300000'])
+
+
+class ColumnarRendererTestCase(TestCase):
+    """Columnar exchange_rates test case."""
+    def setUp(self) -> None:
+        """Setup function for ColumnarRendererTestCase."""
+        create_rates_with_gaps(self)
+
+    def test_columnar_renderer(self) -> None:
+        """Test the columnar format of exchange_rates, by suffix and by Accept header."""
+        params = {'source_currency': 'EUR', 'date_from': str(self.first_day), 'date_to': str(self.last_day),
+                  'fill': 'forward'}
+        by_suffix = self.client.get('/v1/exchange_rates.columnar', params)
+        by_header = self.client.get('/v1/exchange_rates/', params, HTTP_ACCEPT='application/vnd.nucoro.columnar+json')
+        data = json.loads(by_suffix.content)
+
+        self.assertEqual(by_suffix.content, by_header.content)
+        self.assertEqual(data['dates'], [str(self.first_day + timedelta(days=offset)) for offset in range(6)])
+        self.assertEqual(data['rates']['USD'], [1.1, 1.1, 1.1, 1.1, 1.3, 1.3])
+        self.assertEqual(data['rates']['GBP'], [None] * 6)
+
+
+@override_settings(FIXERIO_APIKEY=TEST_APIKEY)
+class AggregateTestCase(TestCase):
+    """Weekly and monthly aggregates test case."""
+    def setUp(self) -> None:
+        """Setup function for AggregateTestCase."""
+        rows = [('EUR', 'GBP', '2021-03-31', '0.86'), ('EUR', 'GBP', '2021-04-01', '0.85'),
+                ('EUR', 'GBP', '2021-04-02', '0.87'), ('EUR', 'GBP', '2021-04-05', '0.84')]
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write('\n'.join(','.join(row) for row in rows))
+        call_command('batch_store_rates', csv_file.name)
+        os.remove(csv_file.name)
+
+    def test_batch_store_rates_aggregates(self) -> None:
+        """Test the aggregates maintained by batch_store_rates."""
+        april = CurrencyExchangeRateAggregate.objects.get(
+            source_currency__code='EUR', exchanged_currency__code='GBP', interval=CurrencyExchangeRateAggregate.MONTH,
+            period_start=date(2021, 4, 1))
+
+        self.assertEqual(april.open_value, Decimal('0.85'))
+        self.assertEqual(april.high_value, Decimal('0.87'))
+        self.assertEqual(april.low_value, Decimal('0.84'))
+        self.assertEqual(april.close_value, Decimal('0.84'))
+        self.assertEqual(april.mean_value, Decimal('0.853333'))
+        self.assertEqual(april.rate_count, 3)
+
+    @patch("requests.get", return_value=MockFixerIOResponseSuccess())
+    def test_exchange_rates_interval(self, mocked: Any) -> None:
+        """Test get_exchange_rates with a weekly interval after a provider write.
+
+        Args:
+            mocked: the mock of the call to fixerIo.
+        """
+        provider = CurrencyProvider.objects.get(provider_type=CurrencyProvider.FIXERIO)
+        get_exchange_rate_data('EUR', 'GBP', date(2021, 4, 4), provider)
+        data = get_exchange_rates('EUR', date(2021, 4, 1), date(2021, 4, 5), interval=CurrencyExchangeRateAggregate.WEEK)
+
+        self.assertEqual(list(data), ['2021-03-29', '2021-04-05'])
+        self.assertEqual(data['2021-03-29']['GBP']['open'], Decimal('0.86'))
+        self.assertEqual(data['2021-03-29']['GBP']['close'], Decimal('0.850275'))
+        self.assertEqual(data['2021-04-05']['GBP']['mean'], Decimal('0.84'))
+        self.assertTrue(CurrencyExchangeRateAggregate.objects.filter(
+            source_currency__code='GBP', exchanged_currency__code='EUR', period_start='2021-03-29').exists())
+
+
+class HttpCachingTestCase(TestCase):
+    """HTTP conditional caching test case."""
+    def setUp(self) -> None:
+        """Setup function for HttpCachingTestCase."""
+        self.today = datetime.today().date()
+        self.params = {'source_currency': 'EUR', 'date_from': str(self.today - timedelta(days=5)),
+                       'date_to': str(self.today - timedelta(days=1)), 'fill': 'forward'}
+
+    def test_not_modified(self) -> None:
+        """Test that a matching ETag answers 304 without running the interactor."""
+        response = self.client.get('/v1/exchange_rates/', self.params)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age=2592000', response['Cache-Control'])
+        with patch('exchanger.v1.views.get_exchange_rates') as mocked:
+            cached = self.client.get('/v1/exchange_rates/', self.params, HTTP_IF_NONE_MATCH=response['ETag'])
+            mocked.assert_not_called()
+        self.assertEqual(cached.status_code, 304)
+
+        rate = CurrencyExchangeRate.objects.create(
+            source_currency=Currency.objects.get(code='EUR'), exchanged_currency=Currency.objects.get(code='USD'),
+            valuation_date=self.today - timedelta(days=2), rate_value=Decimal('1.2'))
+        rates_written.send(sender=CurrencyExchangeRate, rates=[rate])
+        changed = self.client.get('/v1/exchange_rates/', self.params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertIn('Last-Modified', changed)
+
+    def test_current_range_max_age(self) -> None:
+        """Test that ranges including today get the short max-age."""
+        response = self.client.get('/v1/exchange_rates/', dict(self.params, date_to=str(self.today)))
+
+        self.assertIn('max-age=60', response['Cache-Control'])
+
+    def test_current_range_if_modified_since(self) -> None:
+        """Test that If-Modified-Since of a range including today is not modified only during that day."""
+        # The range still includes the next day, so both answers are current ones
+        params = dict(self.params, date_to=str(self.today + timedelta(days=1)))
+        response = self.client.get('/v1/exchange_rates/', params)
+        last_modified = response['Last-Modified']
+
+        cached = self.client.get('/v1/exchange_rates/', params, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(cached.status_code, 304)
+
+        with patch('exchanger.v1.caching.date') as mocked_date:
+            mocked_date.today.return_value = self.today + timedelta(days=1)
+            next_day = self.client.get('/v1/exchange_rates/', params, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(next_day.status_code, 200)
+        self.assertNotEqual(next_day['Last-Modified'], last_modified)
+
+
+class ChartTestCase(TestCase):
+    """Admin chart data test case."""
+    def setUp(self) -> None:
+        """Setup function for ChartTestCase."""
+        self.first_day = date(2020, 1, 1)
+        eur = Currency.objects.get(code='EUR')
+        usd = Currency.objects.get(code='USD')
+        self.rates = [
+            CurrencyExchangeRate.objects.create(source_currency=eur, exchanged_currency=usd, rate_value=Decimal('1.1'),
+                                                valuation_date=self.first_day + timedelta(days=offset))
+            for offset in range(400)
+        ]
+        rates_written.send(sender=CurrencyExchangeRate, rates=self.rates)
+
+    def test_downsampling(self) -> None:
+        """Test that long ranges are read from the aggregates and limited to the requested points."""
+        weekly = build_chart_data('EUR', self.first_day, self.first_day + timedelta(days=399), points=100)
+        monthly = build_chart_data('EUR', self.first_day, self.first_day + timedelta(days=399), points=20)
+        thinned = build_chart_data('EUR', self.first_day, self.first_day + timedelta(days=399), points=5)
+        daily = build_chart_data('EUR', self.first_day, self.first_day + timedelta(days=9), points=100)
+
+        self.assertEqual(len(weekly['labels']), 57)
+        self.assertEqual(len(monthly['labels']), 14)
+        self.assertEqual(monthly['labels'][:2], ['2020-01-01', '2020-02-01'])
+        self.assertEqual(thinned['labels'], ['2020-01-01', '2020-04-01', '2020-07-01', '2020-10-01', '2021-01-01'])
+        self.assertEqual(len(daily['labels']), 10)
+        self.assertEqual(daily['datasets']['USD'][0], Decimal('1.1'))
+        self.assertEqual(daily['datasets']['GBP'][0], None)
+
+    def test_cache_invalidation(self) -> None:
+        """Test that the cached chart data is dropped when rates are written."""
+        date_to = self.first_day + timedelta(days=9)
+        get_chart_data('EUR', self.first_day, date_to)
+        with self.assertNumQueries(1):
+            get_chart_data('EUR', self.first_day, date_to)
+
+        self.rates[0].rate_value = Decimal('1.2')
+        self.rates[0].save()
+        rates_written.send(sender=CurrencyExchangeRate, rates=[self.rates[0]])
+
+        self.assertEqual(get_chart_data('EUR', self.first_day, date_to)['datasets']['USD'][0], Decimal('1.2'))
+
+    def test_admin_chart_data(self) -> None:
+        """Test the chart data endpoint of the admin."""
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        changelist = self.client.get('/admin/exchanger/currencyexchangerate/')
+        response = self.client.get('/admin/exchanger/currencyexchangerate/chart-data/', {
+            'source_currency': 'EUR', 'date_from': '2020-01-01', 'date_to': '2020-01-03'})
+
+        self.assertContains(changelist, 'chart-data/')
+        self.assertEqual(response.json()['labels'], ['2020-01-01', '2020-01-02', '2020-01-03'])
+        self.assertEqual(response.json()['datasets']['USD'], ['1.100000'] * 3)
+
+
+@override_settings(FIXERIO_APIKEY=TEST_APIKEY)
+class RateChangesTestCase(TestCase):
+    """Rate changes feed test case."""
+    @patch("requests.get", return_value=MockFixerIOResponseSuccess())
+    def test_changes_feed(self, mocked: Any) -> None:
+        """Test that the feed follows the writes through its cursor.
+
+        Args:
+            mocked: the mock of the call to fixerIo.
+        """
+        provider = CurrencyProvider.objects.get(provider_type=CurrencyProvider.FIXERIO)
+        get_exchange_rate_data('EUR', 'USD', date(2021, 4, 1), provider)
+        first_page = self.client.get('/v1/changes/', {'since': 0, 'limit': 1}).json()
+        second_page = self.client.get('/v1/changes/', {'since': first_page['next']}).json()
+
+        self.assertTrue(first_page['has_more'])
+        self.assertEqual(first_page['results'][0]['source_currency'], 'EUR')
+        self.assertEqual(first_page['results'][0]['rate_value'], 1.17593)
+        self.assertFalse(second_page['has_more'])
+        self.assertEqual(second_page['results'][0]['source_currency'], 'USD')
+
+        get_exchange_rate_data('EUR', 'USD', date(2021, 4, 1), provider)
+        updates = self.client.get('/v1/changes/', {'since': second_page['next']}).json()
+
+        self.assertEqual(len(updates['results']), 2)
+        self.assertGreater(updates['next'], second_page['next'])
+        self.assertEqual(self.client.get('/v1/changes/', {'since': updates['next']}).json()['results'], [])
+
+
+class PushTestCase(TestCase):
+    """Rates push test case."""
+    @override_settings(RATES_PUSH_ENABLED=True)
+    @patch("exchanger.push.publish_messages")
+    @patch("exchanger.push.transaction.on_commit", side_effect=lambda func: func())
+    def test_publish_rates(self, on_commit: Any, publish_messages: Any) -> None:
+        """Test that written rates are published.
+
+        Args:
+            on_commit: the mock of transaction.on_commit.
+            publish_messages: the mock of the publication on Redis.
+        """
+        rate = CurrencyExchangeRate.objects.create(
+            source_currency=Currency.objects.get(code='EUR'), exchanged_currency=Currency.objects.get(code='USD'),
+            valuation_date=date(2021, 4, 1), rate_value=Decimal('1.17'), write_sequence=7)
+        rates_written.send(sender=CurrencyExchangeRate, rates=[rate])
+
+        publish_messages.assert_called_once_with([{
+            'source_currency': 'EUR', 'exchanged_currency': 'USD', 'valuation_date': '2021-04-01',
+            'rate_value': '1.17', 'sequence': 7}])
+
+    def test_server_sent_events(self) -> None:
+        """Test that the stream only sends the subscribed pairs."""
+        sent = []
+
+        async def scenario() -> None:
+            disconnect = asyncio.Event()
+
+            async def receive() -> dict:
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message: dict) -> None:
+                sent.append(message)
+                if message.get('body', b'').startswith(b'event'):
+                    disconnect.set()
+
+            stream = asyncio.ensure_future(rates_stream({'type': 'http', 'query_string': b'pairs=eur-usd'}, receive, send))
+            await asyncio.sleep(0)
+            broadcaster.dispatch({'source_currency': 'EUR', 'exchanged_currency': 'GBP', 'rate_value': '0.85'})
+            broadcaster.dispatch({'source_currency': 'EUR', 'exchanged_currency': 'USD', 'rate_value': '1.17'})
+            await asyncio.wait_for(stream, 1)
+
+        asyncio.run(scenario())
+
+        self.assertEqual(sent[0]['headers'][0], (b'content-type', b'text/event-stream'))
+        self.assertEqual(len(sent), 2)
+        self.assertEqual(json.loads(sent[1]['body'].decode().split('data: ')[1]), {
+            'source_currency': 'EUR', 'exchanged_currency': 'USD', 'rate_value': '1.17'})
+        self.assertEqual(broadcaster.subscriptions, {})
+
+
+@override_settings(FIXERIO_APIKEY=TEST_APIKEY)
+class WarmupTestCase(TestCase):
+    """Warm up of today's rates test case."""
+    @patch("requests.get", return_value=MockFixerIOResponseSuccess())
+    def test_warm_todays_rates(self, mocked: Any) -> None:
+        """Test that every pair is stored once.
+
+        Args:
+            mocked: the mock of the call to fixerIo.
+        """
+        report = warm_todays_rates()
+        second_report = warm_todays_rates()
+
+        self.assertEqual(report['pairs'], 10)
+        self.assertEqual(report['warmed'], 10)
+        self.assertEqual(report['coverage'], 1.0)
+        self.assertEqual(mocked.call_count, 6)
+        self.assertEqual(second_report['warmed'], 0)
+        self.assertEqual(second_report['coverage'], 1.0)
+        self.assertEqual(CurrencyExchangeRate.objects.get(
+            source_currency__code='USD', exchanged_currency__code='GBP', valuation_date=date.today()
+        ).rate_value, Decimal('0.723066'))
+
+        CurrencyExchangeRate.objects.filter(
+            source_currency__code='USD', exchanged_currency__code='GBP', valuation_date=date.today()).delete()
+        with patch('exchanger.interactors._get_exchange_rate', return_value=None):
+            partial_report = warm_todays_rates()
+        self.assertEqual(partial_report['failed'], 1)
+        self.assertEqual(partial_report['coverage'], 0.9)
+
+    @override_settings(RATES_WARMUP_SCHEDULE=['00:05', '16:30'])
+    @patch("exchanger.interactors.django_rq.get_queue")
+    def test_schedule_rates_warmup(self, get_queue: Any) -> None:
+        """Test that the next warm up is scheduled on the next time of the day.
+
+        Args:
+            get_queue: the mock of the RQ queue.
+        """
+        with patch('exchanger.interactors.timezone.now', return_value=datetime(2021, 4, 1, 12, 0)):
+            schedule_rates_warmup()
+
+        run_at = get_queue.return_value.enqueue_at.call_args[0][0]
+        self.assertEqual(run_at, datetime(2021, 4, 1, 16, 30))
+        self.assertEqual(get_queue.return_value.enqueue_at.call_args[1]['job_id'], 'exchanger-rates-warmup-202104011630')
+        get_queue.return_value.enqueue.assert_not_called()
+
+    @patch("exchanger.interactors.django_rq.get_queue")
+    def test_schedule_rates_warmup_once(self, get_queue: Any) -> None:
+        """Test that a run already claimed by another process is not enqueued again.
+
+        Args:
+            get_queue: the mock of the RQ queue.
+        """
+        claimed = set()
+        get_queue.return_value.connection.set.side_effect = lambda key, *args, **kwargs: \
+            key not in claimed and not claimed.add(key)
+        schedule_rates_warmup(run_now=True)
+        schedule_rates_warmup(run_now=True)
+
+        self.assertEqual(get_queue.return_value.enqueue.call_count, 1)
+        self.assertEqual(get_queue.return_value.enqueue_at.call_count, 1)
+        self.assertTrue(all(call[1]['nx'] for call in get_queue.return_value.connection.set.call_args_list))
+
+
+@override_settings(FIXERIO_APIKEY=TEST_APIKEY)
+class QuotaTestCase(TestCase):
+    """Provider quota scheduler test case."""
+    def test_merge_and_priority(self) -> None:
+        """Test that pending requests of a date merge, interactive ones go first and calls run concurrently."""
+        calls = []
+        gate = threading.Event()
+
+        def fetch(valuation_date: date, symbols: list) -> dict:
+            calls.append((valuation_date, symbols))
+            gate.wait()
+            return {symbol: 1.0 for symbol in symbols}
+
+        def request(valuation_date: date, symbol: str, priority: int) -> None:
+            with request_priority(priority):
+                scheduler.request(valuation_date, [symbol])
+
+        # The bucket holds the next calls back while the other requests queue
+        scheduler = ProviderScheduler(fetch, rate_limit=5)
+        threads = [
+            threading.Thread(target=request, args=(date(2021, 1, 1), 'USD', PRIORITY_BACKGROUND)),
+            threading.Thread(target=request, args=(date(2021, 1, 2), 'GBP', PRIORITY_BACKGROUND)),
+            threading.Thread(target=request, args=(date(2021, 1, 2), 'CHF', PRIORITY_BACKGROUND)),
+            threading.Thread(target=request, args=(date(2021, 1, 3), 'USD', 0)),
+        ]
+        threads[0].start()
+        while not calls:
+            time.sleep(0.001)
+        for thread in threads[1:]:
+            thread.start()
+        # The first call has not answered yet when the other ones are made
+        while len(calls) < 3:
+            time.sleep(0.001)
+        gate.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, [
+            (date(2021, 1, 1), ['USD']), (date(2021, 1, 3), ['USD']), (date(2021, 1, 2), ['CHF', 'GBP'])])
+
+    @override_settings(FIXERIO_MAX_CONCURRENT_CALLS=1)
+    def test_max_concurrent_calls(self) -> None:
+        """Test that the calls over the limit stay queued, where they still merge and are prioritized."""
+        calls = []
+        gate = threading.Event()
+
+        def fetch(valuation_date: date, symbols: list) -> dict:
+            calls.append((valuation_date, symbols))
+            gate.wait()
+            return {symbol: 1.0 for symbol in symbols}
+
+        def request(valuation_date: date, symbol: str, priority: int) -> None:
+            with request_priority(priority):
+                scheduler.request(valuation_date, [symbol])
+
+        scheduler = ProviderScheduler(fetch)
+        threads = [
+            threading.Thread(target=request, args=(date(2021, 1, 1), 'USD', PRIORITY_BACKGROUND)),
+            threading.Thread(target=request, args=(date(2021, 1, 2), 'GBP', PRIORITY_BACKGROUND)),
+            threading.Thread(target=request, args=(date(2021, 1, 2), 'CHF', PRIORITY_BACKGROUND)),
+            threading.Thread(target=request, args=(date(2021, 1, 3), 'USD', 0)),
+        ]
+        threads[0].start()
+        while not calls:
+            time.sleep(0.001)
+        for thread in threads[1:]:
+            thread.start()
+        while scheduler.pending_calls < 2:
+            time.sleep(0.001)
+        time.sleep(0.05)
+
+        self.assertEqual(len(calls), 1)
+        gate.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(calls, [
+            (date(2021, 1, 1), ['USD']), (date(2021, 1, 3), ['USD']), (date(2021, 1, 2), ['CHF', 'GBP'])])
+
+    @override_settings(FIXERIO_WAIT_TIMEOUT=0.05)
+    def test_wait_timeout(self) -> None:
+        """Test that a request stops waiting for a call that does not answer in time."""
+        gate = threading.Event()
+
+        def fetch(valuation_date: date, symbols: list) -> dict:
+            gate.wait()
+            return {symbol: 1.0 for symbol in symbols}
+
+        scheduler = ProviderScheduler(fetch)
+        try:
+            with self.assertRaises(ProviderUnavailable):
+                scheduler.request(date(2021, 1, 1), ['USD'])
+        finally:
+            gate.set()
+
+    @override_settings(FIXERIO_MEMO_TIMEOUT=30)
+    @patch("requests.get", return_value=MockFixerIOResponseSuccess())
+    def test_quota(self, mocked: Any) -> None:
+        """Test that calls are counted, reused for the same date and stop at the monthly quota.
+
+        Args:
+            mocked: the mock of the call to fixerIo.
+        """
+        CurrencyProvider.objects.filter(name='FixerIo').update(monthly_quota=1)
+        _get_exchange_rate('EUR', 'USD', date(2020, 2, 3))
+        _get_exchange_rate('GBP', 'CHF', date(2020, 2, 3))
+        _get_exchange_rate('EUR', 'USD', date(2020, 2, 4))
+
+        self.assertEqual(mocked.call_count, 1)
+        self.assertEqual(mocked.call_args.kwargs['timeout'], settings.FIXERIO_TIMEOUT)
+        self.assertEqual(CurrencyExchangeRate.objects.get(
+            source_currency__code='GBP', exchanged_currency__code='CHF', valuation_date=date(2020, 2, 3)
+        ).rate_value, Decimal('1.303711'))
+        self.assertEqual(CurrencyExchangeRate.objects.get(
+            source_currency__code='EUR', exchanged_currency__code='USD', valuation_date=date(2020, 2, 4)
+        ).rate_value, Decimal('1.211208'))
+        usage = self.client.get('/v1/providers/quota/').json()
+        self.assertEqual(usage[0]['calls'], 1)
+        self.assertEqual(usage[0]['remaining'], 0)
+
+    @patch("requests.get", return_value=MockFixerIOResponseFail())
+    def test_quota_reservation(self, mocked: Any) -> None:
+        """Test that a call reserves its place in the quota, given back when it fails.
+
+        Args:
+            mocked: the mock of the call to fixerIo.
+        """
+        CurrencyProvider.objects.filter(name='FixerIo').update(monthly_quota=1)
+        provider = CurrencyProvider.objects.get(name='FixerIo')
+        _get_exchange_rate('EUR', 'USD', date(2020, 3, 2))
+        self.assertEqual(mocked.call_count, 1)
+        self.assertEqual(get_usage(provider), 0)
+
+        reserve_usage(provider)
+        with self.assertRaises(QuotaExceeded):
+            reserve_usage(provider)
+        self.assertEqual(get_usage(provider), 1)
+
+
+@override_settings(FIXERIO_APIKEY=TEST_APIKEY)
+class WriteBehindTestCase(TestCase):
+    """Write behind of the fetched rates test case."""
+    @override_settings(RATES_WRITE_BEHIND=True, RATES_WRITE_BEHIND_INTERVAL=3600)
+    @patch("requests.get", return_value=MockFixerIOResponseSuccess())
+    def test_write_behind(self, mocked: Any) -> None:
+        """Test that fetched rates are served from the queue and stored in bulk, deduplicated.
+
+        Args:
+            mocked: the mock of the call to fixerIo.
+        """
+        valuation_date = date(2018, 7, 2)
+        rate = _get_exchange_rate('EUR', 'USD', valuation_date, deferred=True)
+        reverse_rate = _get_exchange_rate('USD', 'EUR', valuation_date, deferred=True)
+        stored_before_flush = CurrencyExchangeRate.objects.filter(valuation_date=valuation_date).count()
+        stored = flush()
+        queue_rate('EUR', 'USD', valuation_date, Decimal('1.2'))
+        queue_rate('USD', 'EUR', valuation_date, Decimal('0.8'))
+        updated = flush()
+
+        self.assertEqual(rate.pk, None)
+        self.assertAlmostEqual(float(rate.rate_value), 1.17593)
+        self.assertAlmostEqual(float(reverse_rate.rate_value), 1 / 1.17593)
+        self.assertEqual(mocked.call_count, 1)
+        self.assertEqual(stored_before_flush, 0)
+        self.assertEqual((stored, updated), (2, 2))
+        rates = CurrencyExchangeRate.objects.filter(valuation_date=valuation_date).order_by('write_sequence')
+        self.assertEqual([(rate.source_currency.code, rate.rate_value) for rate in rates],
+                         [('USD', Decimal('0.8')), ('EUR', Decimal('1.25'))])
+        self.assertTrue(CurrencyExchangeRateAggregate.objects.filter(period_start=date(2018, 7, 1)).exists())
+
+
+@override_settings(FIXERIO_APIKEY=TEST_APIKEY)
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTestCase(TestCase):
+    """Primary and replica database routing test case."""
+    databases = {'default', 'replica'}
+
+    def setUp(self) -> None:
+        """Setup function for ReplicaRoutingTestCase: different rates on the primary and the replica."""
+        for database, code, rate_value, write_sequence in (('default', 'USD', 1.1, 900001), ('replica', 'GBP', 0.7, 900002)):
+            CurrencyExchangeRate.objects.using(database).create(
+                source_currency=Currency.objects.using(database).get(code='EUR'),
+                exchanged_currency=Currency.objects.using(database).get(code=code),
+                valuation_date=date(2016, 1, 4), rate_value=rate_value, write_sequence=write_sequence)
+
+    @patch("requests.get", return_value=MockFixerIOResponseSuccess())
+    def test_sticky_after_write(self, mocked: Any) -> None:
+        """Test that reads go to the replica until the caller writes.
+
+        Args:
+            mocked: the mock of the call to fixerIo.
+        """
+        before_write = self.client.get('/v1/changes/?since=900000')
+        write = self.client.get('/v1/exchange_rates/?source_currency=EUR&date_from=2016-01-05&date_to=2016-01-05')
+        after_write = self.client.get('/v1/changes/?since=900000')
+
+        self.assertEqual([change['exchanged_currency'] for change in before_write.json()['results']], ['GBP'])
+        self.assertNotIn('nucoro_primary', before_write.cookies)
+        self.assertEqual(write.status_code, 200)
+        self.assertIn('nucoro_primary', write.cookies)
+        self.assertEqual([change['exchanged_currency'] for change in after_write.json()['results']], ['USD'])
+        self.assertTrue(CurrencyExchangeRate.objects.using('default').filter(valuation_date=date(2016, 1, 5)).exists())
+        self.assertFalse(CurrencyExchangeRate.objects.using('replica').filter(valuation_date=date(2016, 1, 5)).exists())
+
+
+class SQLiteBackendTestCase(SimpleTestCase):
+    """SQLite backend of the production profile test case."""
+    def open(self, **options: Any) -> Any:
+        """Returns a wrapper of the backend on a new database file.
+
+        Args:
+            options: the OPTIONS of the database
+
+        Returns:
+            the database wrapper, closed on clean up
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = {**connection.settings_dict, 'ENGINE': 'exchanger.backends.sqlite3',
+                         'NAME': os.path.join(directory.name, 'db.sqlite3'), 'OPTIONS': options}
+        wrapper = load_backend('exchanger.backends.sqlite3').DatabaseWrapper(settings_dict, 'sqlite-backend-test')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def writer_blocked(self, wrapper: Any) -> bool:
+        """Returns whether another connection cannot begin a write while the wrapper has a transaction open.
+
+        Args:
+            wrapper: the database wrapper
+
+        Returns:
+            whether the other connection got "database is locked"
+        """
+        wrapper.ensure_connection()
+        wrapper._start_transaction_under_autocommit()
+        other = sqlite3.connect(wrapper.settings_dict['NAME'], timeout=0)
+        try:
+            other.execute('BEGIN IMMEDIATE')
+            other.rollback()
+            return False
+        except sqlite3.OperationalError:
+            return True
+        finally:
+            other.close()
+            wrapper.connection.rollback()
+
+    def test_options(self) -> None:
+        """Test that the init command runs on every connection and is not passed to sqlite3.connect."""
+        wrapper = self.open(init_command='PRAGMA journal_mode = WAL; PRAGMA cache_size = -1024', timeout=1)
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+            cursor.execute('PRAGMA cache_size')
+            cache_size = cursor.fetchone()[0]
+
+        self.assertEqual((journal_mode, cache_size), ('wal', -1024))
+        self.assertNotIn('init_command', wrapper.get_connection_params())
+        self.assertNotIn('transaction_mode', wrapper.get_connection_params())
+
+    def test_transaction_mode(self) -> None:
+        """Test that IMMEDIATE transactions take the write lock when they begin, deferred ones on their first write."""
+        self.assertTrue(self.writer_blocked(self.open(transaction_mode='IMMEDIATE')))
+        self.assertFalse(self.writer_blocked(self.open()))
+
+
+@override_settings(FIXERIO_APIKEY=TEST_APIKEY)
+class MetricsTestCase(TestCase):
+    """Metrics endpoint test case."""
+
+    @patch("exchanger.metrics.django_rq.get_connection")
+    @patch("requests.get", return_value=MockFixerIOResponseFail())
+    def test_metrics(self, mocked: Any, mocked_redis: Any) -> None:
+        """Test that the requests, their queries, the provider calls and the RQ jobs are exposed.
+
+        Args:
+            mocked: the mock of the call to fixerIo.
+            mocked_redis: the mock of the Redis connection.
+        """
+        redis = mocked_redis.return_value
+        record_job(redis, 'default', 'exchanger.interactors.run_rates_warmup', 'finished', 0.7)
+        redis.pipeline.return_value.hincrby.assert_any_call(
+            JOBS_REDIS_KEY, 'default\x1fexchanger.interactors.run_rates_warmup\x1ffinished\x1e2', 1)
+        redis.hgetall.return_value = {
+            b'default\x1fexchanger.interactors.run_rates_warmup\x1ffinished\x1e2': b'1',
+            b'default\x1fexchanger.interactors.run_rates_warmup\x1ffinished\x1esum': b'0.7',
+            b'default\x1fexchanger.interactors.run_rates_warmup\x1ffinished\x1ecount': b'1',
+        }
+
+        self.client.get('/v1/exchange_rates/?source_currency=EUR&date_from=2016-01-05&date_to=2016-01-05')
+        response = self.client.get('/metrics')
+        metrics = response.content.decode()
+
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        endpoint = 'endpoint="exchanger.v1.views.get_exchange_rates_view"'
+        self.assertIn(f'exchanger_request_duration_seconds_count{{{endpoint},method="GET",status="200"}}', metrics)
+        self.assertRegex(metrics, rf'exchanger_request_sql_queries_sum{{{endpoint}}} [1-9]')
+        self.assertIn('exchanger_provider_request_duration_seconds_count{provider_type="fixerio",outcome="unavailable"}',
+                      metrics)
+        self.assertIn('exchanger_provider_request_duration_seconds_count{provider_type="mock",outcome="ok"}', metrics)
+        job = 'queue="default",function="exchanger.interactors.run_rates_warmup",outcome="finished"'
+        self.assertIn(f'exchanger_rq_job_duration_seconds_bucket{{{job},le="0.5"}} 0', metrics)
+        self.assertIn(f'exchanger_rq_job_duration_seconds_bucket{{{job},le="1.0"}} 1', metrics)
+        self.assertIn(f'exchanger_rq_job_duration_seconds_sum{{{job}}} 0.7', metrics)
+
+
+class ProfilingTestCase(TestCase):
+    """Request profiling test case."""
+
+    def setUp(self) -> None:
+        """Setup function for ProfilingTestCase: a profiles directory and a rate to convert."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        CurrencyExchangeRate.objects.create(
+            source_currency=Currency.objects.get(code='EUR'), exchanged_currency=Currency.objects.get(code='USD'),
+            valuation_date=date.today(), rate_value=Decimal('1.15'))
+        self.params = {'source_currency': 'EUR', 'exchanged_currency': 'USD', 'amount': '10'}
+
+    def test_profiles(self) -> None:
+        """Test the triggers of the profiles, their ring buffer and the admin views."""
+        with override_settings(PROFILING_DIR=self.directory.name, PROFILING_MAX_PROFILES=2):
+            self.client.get('/v1/currency_converter/', self.params)
+            self.client.get('/v1/currency_converter/', self.params, HTTP_X_NUCORO_PROFILE='forged')
+            self.client.get('/v1/currency_converter/', dict(self.params, profile='1'))
+            self.assertEqual(list_profiles(), [])
+
+            for _ in range(3):
+                self.client.get('/v1/currency_converter/', self.params, HTTP_X_NUCORO_PROFILE=profile_token())
+            profiles = list_profiles()
+            self.assertEqual(len(profiles), 2)
+            self.assertEqual(len(os.listdir(self.directory.name)), 4)
+            self.assertEqual(profiles[0]['trigger'], 'header')
+            self.assertTrue(profiles[0]['path'].startswith('/v1/currency_converter/?'))
+
+            User.objects.create_superuser('admin', 'admin@example.com', 'password')
+            self.client.login(username='admin', password='password')
+            self.client.get('/v1/currency_converter/', dict(self.params, profile='1'))
+            staff_profile = list_profiles()[0]
+            self.assertEqual((staff_profile['trigger'], staff_profile['user']), ('staff', 'admin'))
+
+            listing = self.client.get('/admin/profiles/')
+            report = self.client.get(f'/admin/profiles/{staff_profile["name"]}/')
+            download = self.client.get(f'/admin/profiles/{staff_profile["name"]}/', {'download': '1'})
+            missing = self.client.get('/admin/profiles/00000000000000000000-00000000/')
+
+        self.assertContains(listing, staff_profile['name'])
+        self.assertContains(report, 'currency_converter')
+        self.assertEqual(download['Content-Disposition'], f'attachment; filename="{staff_profile["name"]}.prof"')
+        self.assertEqual(missing.status_code, 404)
+
+
+class CurrencyRegistryTestCase(TestCase):
+    """Currency registry test case."""
+
+    def setUp(self) -> None:
+        """Setup function for CurrencyRegistryTestCase."""
+        clear_registry()
+        self.addCleanup(clear_registry)
+
+    def test_registry(self) -> None:
+        """Test that the currencies are loaded once and reloaded when they change."""
+        eur = Currency.objects.get(code='EUR')
+        with self.assertNumQueries(1):
+            self.assertEqual(currency_id('EUR'), eur.id)
+            self.assertEqual(currency_code(eur.id), 'EUR')
+            self.assertEqual(currency_codes(), ['CHF', 'EUR', 'GBP', 'USD'])
+            self.assertEqual(get_currency('EUR').name, eur.name)
+        with self.assertNumQueries(1):
+            self.assertIsNone(currency_id('XAU'))
+        xau = Currency.objects.create(code='XAU', name='Gold', symbol='XAU')
+        self.assertEqual(currency_id('XAU'), xau.id)
+        xau.delete()
+        self.assertNotIn('XAU', currency_codes())
+        with self.assertRaises(Currency.DoesNotExist):
+            get_currency('XAU')
+
+    def test_rate_queries(self) -> None:
+        """Test that the interactors filter the rates without reading the currencies."""
+        CurrencyExchangeRate.objects.create(source_currency=get_currency('EUR'), exchanged_currency=get_currency('USD'),
+                                            valuation_date=date(2021, 3, 1), rate_value=Decimal('1.2'), write_sequence=7)
+        currency_codes()
+
+        with self.assertNumQueries(1):
+            rates = dict(iter_exchange_rates('EUR', date(2021, 3, 1), date(2021, 3, 2)))
+        with self.assertNumQueries(1):
+            changes = get_rate_changes(6)
+        with self.assertNumQueries(1):
+            chart_data = build_chart_data('EUR', date(2021, 3, 1), date(2021, 3, 1))
+
+        self.assertEqual(rates, {'2021-03-01': {'USD': Decimal('1.2')}})
+        self.assertEqual(changes['results'][0]['exchanged_currency'], 'USD')
+        self.assertEqual(chart_data['datasets']['USD'], [Decimal('1.2')])
+
+
+class ExportTestCase(TestCase):
+    """Bulk export test case."""
+
+    def setUp(self) -> None:
+        """Setup function for ExportTestCase: rates of two pairs and two dates."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        for write_sequence, (code, day, rate_value) in enumerate(
+                [('USD', 1, '1.15'), ('GBP', 1, '0.8'), ('USD', 2, '1.16'), ('GBP', 2, '0.81')], start=1):
+            CurrencyExchangeRate.objects.create(
+                source_currency=get_currency('EUR'), exchanged_currency=get_currency(code),
+                valuation_date=date(2021, 3, day), rate_value=Decimal(rate_value), write_sequence=write_sequence)
+
+    def read_csv(self, path: str) -> list:
+        """Read an exported CSV file.
+
+        Args:
+            path: path of the file
+
+        Returns:
+            the rows, header included
+        """
+        with gzip.open(path, 'rt') as csv_file:
+            return list(csv.reader(csv_file))
+
+    def test_export_rates(self) -> None:
+        """Test the filters and the incremental exports of export_rates."""
+        path = os.path.join(self.directory.name, 'rates.csv.gz')
+        watermark_path = os.path.join(self.directory.name, 'watermark')
+        call_command('export_rates', path, '--currencies=USD', '--date-from=2021-03-02', stdout=io.StringIO())
+        filtered = self.read_csv(path)
+        call_command('export_rates', path, f'--watermark-file={watermark_path}', stdout=io.StringIO())
+        full = self.read_csv(path)
+        CurrencyExchangeRate.objects.filter(exchanged_currency__code='GBP', valuation_date=date(2021, 3, 1)).update(
+            rate_value=Decimal('0.79'), write_sequence=5)
+        call_command('export_rates', path, f'--watermark-file={watermark_path}', stdout=io.StringIO())
+        incremental = self.read_csv(path)
+
+        self.assertEqual(filtered, [EXPORT_COLUMNS, ['EUR', 'USD', '2021-03-02', '1.160000', '3']])
+        self.assertEqual(len(full), 5)
+        self.assertEqual(incremental[1:], [['EUR', 'GBP', '2021-03-01', '0.790000', '5']])
+        with open(watermark_path) as watermark_file:
+            self.assertEqual(watermark_file.read(), '5\n')
+
+    @skipUnless(PARQUET_AVAILABLE, 'pyarrow is not installed')
+    def test_export_parquet(self) -> None:
+        """Test a Parquet export, written in several row groups."""
+        import pyarrow.parquet  # type: ignore
+
+        path = os.path.join(self.directory.name, 'rates.parquet')
+        with patch('exchanger.management.commands.export_rates.iter_export_rows',
+                   side_effect=lambda export_filter: iter_export_rows(export_filter, chunk_size=3)):
+            call_command('export_rates', path, '--format=parquet', stdout=io.StringIO())
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+
+        self.assertEqual(parquet_file.metadata.num_row_groups, 2)
+        self.assertEqual(parquet_file.read().column('rate_value').to_pylist(),
+                         [Decimal('1.15'), Decimal('0.8'), Decimal('1.16'), Decimal('0.81')])
+
+    def test_export_view(self) -> None:
+        """Test that the export endpoint is for staff only and streams the rates written after a watermark."""
+        anonymous = self.client.get('/v1/export/')
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        response = self.client.get('/v1/export/', {'since': 2, 'sources': 'EUR'})
+        wrong_output = self.client.get('/v1/export/', {'output': 'xlsx'})
+
+        self.assertEqual(anonymous.status_code, 403)
+        self.assertEqual(response['X-Nucoro-Watermark'], '4')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = list(csv.reader(gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()))
+        self.assertEqual([row[-1] for row in rows[1:]], ['3', '4'])
+        self.assertEqual(wrong_output.status_code, 400)
+
+
+@override_settings(FIXERIO_APIKEY=TEST_APIKEY)
+class MultiSourceTestCase(TestCase):
+    """Exchange rates of several source currencies test case."""
+
+    def setUp(self) -> None:
+        """Setup function for MultiSourceTestCase: rates from EUR and USD on two dates."""
+        for source, code, day, rate_value in [('EUR', 'USD', 1, '1.15'), ('EUR', 'GBP', 2, '0.8'),
+                                              ('USD', 'EUR', 1, '0.869565'), ('GBP', 'CHF', 1, '1.3')]:
+            CurrencyExchangeRate.objects.create(
+                source_currency=get_currency(source), exchanged_currency=get_currency(code),
+                valuation_date=date(2021, 3, day), rate_value=Decimal(rate_value))
+
+    def test_get_exchange_rates_by_source(self) -> None:
+        """Test that the rates of several source currencies are read with a single range query."""
+        get_exchange_rates('EUR', date(2021, 3, 1), date(2021, 3, 2), FILL_FORWARD)
+        with CaptureQueriesContext(connection) as queries:
+            tables = get_exchange_rates_by_source(['EUR', 'USD'], date(2021, 3, 1), date(2021, 3, 2), FILL_FORWARD)
+        range_queries = [query for query in queries if '<= \'2021-03-02\'' in query['sql']]
+        every_source = get_exchange_rates_by_source(None, date(2021, 3, 1), date(2021, 3, 2), FILL_FORWARD)
+
+        self.assertEqual(len(range_queries), 1)
+        self.assertEqual(list(tables), ['EUR', 'USD'])
+        self.assertEqual(tables['EUR'], get_exchange_rates('EUR', date(2021, 3, 1), date(2021, 3, 2), FILL_FORWARD))
+        self.assertEqual(tables['USD']['2021-03-02']['EUR'], Decimal('0.869565'))
+        self.assertEqual(every_source['GBP']['2021-03-01']['CHF'], Decimal('1.3'))
+        self.assertEqual(set(every_source), set(currency_codes()))
+
+    def test_provider_fill_reverse(self) -> None:
+        """Test that a rate fetched for a source currency also fills the reverse rate of another source."""
+        with patch('exchanger.interactors._get_exchange_rate', wraps=_get_exchange_rate) as get_rate:
+            tables = get_exchange_rates_by_source(['EUR', 'GBP'], date(2021, 3, 3), date(2021, 3, 3))
+        requested = [call.args[:2] for call in get_rate.call_args_list]
+
+        self.assertIn(('EUR', 'GBP'), requested)
+        self.assertNotIn(('GBP', 'EUR'), requested)
+        self.assertEqual(tables['GBP']['2021-03-03']['EUR'],
+                         (1 / Decimal(tables['EUR']['2021-03-03']['GBP'])).quantize(Decimal('0.000001')))
+
+    def test_exchange_rates_view(self) -> None:
+        """Test the exchange_rates endpoint with several source currencies, in JSON and columnar."""
+        params = {'source_currency': 'EUR,USD', 'date_from': '2021-03-01', 'date_to': '2021-03-02', 'fill': 'forward'}
+        response = self.client.get('/v1/exchange_rates/', params)
+        columnar = self.client.get('/v1/exchange_rates/', {**params, 'format': 'columnar'})
+        streamed = self.client.get('/v1/exchange_rates/', {**params, 'stream': 'ndjson'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['USD']['2021-03-01']['EUR'], 0.869565)
+        self.assertEqual(columnar.json()['EUR']['dates'], ['2021-03-01', '2021-03-02'])
+        self.assertEqual(columnar.json()['EUR']['rates']['USD'], [1.15, 1.15])
+        self.assertEqual(streamed.status_code, 400)
+
+
+class AnalyticsTestCase(TestCase):
+    """Rolling statistics test case."""
+
+    def setUp(self) -> None:
+        """Setup function for AnalyticsTestCase: EUR/USD synthetic rates on the weekdays of March 2021."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        days = [date(2021, 3, 1) + timedelta(days=offset) for offset in range(31)]
+        self.days = [day for day in days if day.weekday() < 5]
+        for write_sequence, day in enumerate(self.days, start=1):
+            CurrencyExchangeRate.objects.create(
+                source_currency=get_currency('EUR'), exchanged_currency=get_currency('USD'), valuation_date=day,
+                rate_value=Decimal(f'{synthetic_rate("EUR", "USD", day):.6f}'), write_sequence=write_sequence)
+
+    def test_rolling_stats(self) -> None:
+        """Test the vectorized statistics against a plain computation of every window."""
+        ordinals = [day.toordinal() for day in self.days]
+        values = [synthetic_rate('EUR', 'USD', day) for day in self.days]
+        stats = rolling_stats(np.array(ordinals), np.array(values), 7)
+
+        for index, ordinal in enumerate(ordinals):
+            window = [value for day, value in zip(ordinals, values) if ordinal - 7 < day <= ordinal]
+            returns = [math.log(current / previous) for previous, current in zip(window, window[1:])]
+            self.assertAlmostEqual(stats.mean[index], sum(window) / len(window))
+            self.assertEqual((stats.min[index], stats.max[index]), (min(window), max(window)))
+            if len(returns) < 2:
+                self.assertTrue(math.isnan(stats.volatility[index]))
+            else:
+                self.assertAlmostEqual(stats.volatility[index], statistics.stdev(returns))
+
+    def test_incremental_stats(self) -> None:
+        """Test that the cached statistics are reused, and extended from the first rate written since."""
+        get_rolling_stats('EUR', ['USD'], date(2021, 3, 1), date(2021, 3, 31), 7)
+        with self.assertNumQueries(2):
+            cached = get_rolling_stats('EUR', ['USD'], date(2021, 3, 1), date(2021, 3, 31), 7)
+        CurrencyExchangeRate.objects.create(
+            source_currency=get_currency('GBP'), exchanged_currency=get_currency('CHF'),
+            valuation_date=date(2021, 3, 1), rate_value=Decimal('1.1'), write_sequence=99)
+        get_rolling_stats('EUR', ['USD'], date(2021, 3, 1), date(2021, 3, 31), 7)
+        self.assertEqual(cache.get(_cache_key(currency_id('EUR'), currency_id('USD'), 7)).watermark, 99)
+        CurrencyExchangeRate.objects.create(
+            source_currency=get_currency('EUR'), exchanged_currency=get_currency('USD'),
+            valuation_date=date(2021, 4, 1), rate_value=Decimal('1.5'), write_sequence=100)
+        CurrencyExchangeRate.objects.filter(valuation_date=date(2021, 3, 30)).update(
+            rate_value=Decimal('1.0'), write_sequence=101)
+        with patch('exchanger.analytics.rolling_stats', wraps=rolling_stats) as computed:
+            extended = get_rolling_stats('EUR', ['USD'], date(2021, 3, 1), date(2021, 4, 1), 7)
+        cache.clear()
+        recomputed = get_rolling_stats('EUR', ['USD'], date(2021, 3, 1), date(2021, 4, 1), 7)
+
+        self.assertEqual(list(cached), [str(day) for day in self.days])
+        self.assertEqual(len(computed.call_args.args[0]), 7)
+        self.assertEqual(extended, recomputed)
+        self.assertEqual(extended['2021-03-26'], cached['2021-03-26'])
+        self.assertEqual(extended['2021-04-01']['USD']['max'], 1.5)
+        self.assertEqual(extended['2021-03-31']['USD']['min'], 1.0)
+
+    def test_rolling_stats_view(self) -> None:
+        """Test the rolling_stats endpoint."""
+        params = {'source_currency': 'EUR', 'exchanged_currency': 'USD', 'date_from': '2021-03-08',
+                  'date_to': '2021-03-12', 'window': 7}
+        response = self.client.get('/v1/rolling_stats/', params)
+        wrong_window = self.client.get('/v1/rolling_stats/', {**params, 'window': 1})
+        unknown = self.client.get('/v1/rolling_stats/', {**params, 'exchanged_currency': 'XYZ'})
+        with patch('exchanger.analytics.get_rolling_stats', side_effect=RuntimeError):
+            failed = self.client.get('/v1/rolling_stats/', {**params, 'date_to': '2021-03-13'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()), ['2021-03-08', '2021-03-09', '2021-03-10', '2021-03-11', '2021-03-12'])
+        self.assertEqual(set(response.json()['2021-03-08']['USD']), {'mean', 'volatility', 'min', 'max'})
+        self.assertIn('ETag', response)
+        self.assertEqual(wrong_window.status_code, 400)
+        self.assertEqual(unknown.status_code, 400)
+        self.assertEqual(failed.status_code, 500)
+
+
+class SyntheticTestCase(TestCase):
+    """Synthetic rates test case."""
+
+    def test_synthetic_rates(self) -> None:
+        """Test that the synthetic rates only depend on the seed, the pair and the date."""
+        year = pair_rates('EUR', ['USD', 'JPY'], date(2020, 1, 1), date(2020, 12, 31), seed=7)
+        march = pair_rates('EUR', ['JPY'], date(2020, 3, 1), date(2020, 3, 31), seed=7)
+
+        self.assertEqual(year.shape, (366, 2))
+        self.assertEqual(march.tolist(), year[60:91, 1:].tolist())
+        self.assertEqual(synthetic_rate('EUR', 'USD', date(2020, 7, 1), seed=7), year[182, 0])
+        self.assertNotEqual(synthetic_rate('EUR', 'USD', date(2020, 7, 1), seed=8), year[182, 0])
+        self.assertAlmostEqual(synthetic_rate('USD', 'EUR', date(2020, 7, 1), seed=7), 1 / year[182, 0], places=5)
+        self.assertTrue(0.9 < year[:, 0].min() < year[:, 0].max() < 1.45)
+        with self.assertRaises(ValueError):
+            pair_rates('EUR', ['USD'], date(1998, 12, 31), date(1999, 1, 31))
+
+    def test_mock_synthetic_mode(self) -> None:
+        """Test the rates of the Mock provider in synthetic mode."""
+        provider = CurrencyProvider.objects.get(provider_type=CurrencyProvider.MOCK)
+        with override_settings(MOCK_PROVIDER_MODE='synthetic', MOCK_PROVIDER_SEED=3):
+            rate = Adapter(provider, 'EUR', 'GBP', date(2021, 3, 1)).get_mock_exchange_rate()
+            old_rate = Adapter(provider, 'EUR', 'GBP', date(1990, 3, 1)).get_mock_exchange_rate()
+
+        self.assertEqual(rate, synthetic_rate('EUR', 'GBP', date(2021, 3, 1), seed=3))
+        self.assertEqual(old_rate, 0.8)
+
+    def test_seed_rates(self) -> None:
+        """Test that seed_rates stores the synthetic rates and the same aggregates as the rollups."""
+        self.addCleanup(clear_registry)
+        arguments = ['seed_rates', '2021-03-01', '2021-04-30', '--sources=EUR', '--currencies=USD,XAU', '--seed=2']
+        call_command(*arguments, '--aggregates', stdout=io.StringIO())
+        rates = CurrencyExchangeRate.objects.filter(valuation_date__range=(date(2021, 3, 1), date(2021, 4, 30)))
+        aggregates = CurrencyExchangeRateAggregate.objects.filter(source_currency__code='EUR').order_by('pk')
+        seeded = list(aggregates.values_list('exchanged_currency__code', 'interval', 'period_start', 'open_value',
+                                             'high_value', 'low_value', 'close_value', 'mean_value', 'rate_count'))
+        refresh_aggregates(rates)
+        refreshed = list(aggregates.values_list('exchanged_currency__code', 'interval', 'period_start', 'open_value',
+                                                'high_value', 'low_value', 'close_value', 'mean_value', 'rate_count'))
+
+        self.assertEqual(rates.count(), 122)
+        self.assertEqual(rates.get(exchanged_currency__code='XAU', valuation_date=date(2021, 4, 2)).rate_value,
+                         Decimal(f'{synthetic_rate("EUR", "XAU", date(2021, 4, 2), seed=2):.6f}'))
+        self.assertTrue(Currency.objects.filter(code='XAU').exists())
+        self.assertEqual(len(seeded), 2 * (9 + 2))
+        self.assertEqual(sorted(seeded), sorted(refreshed))
+        with self.assertRaises(CommandError):
+            call_command(*arguments, stdout=io.StringIO())
+        call_command(*arguments, '--replace', '--seed=3', stdout=io.StringIO())
+        self.assertEqual(rates.count(), 122)
+        self.assertEqual(aggregates.count(), 2 * 4)
+
+    @override_settings(RATES_PUSH_ENABLED=True)
+    @patch("exchanger.push.publish_messages")
+    @patch("exchanger.push.transaction.on_commit", side_effect=lambda func: func())
+    def test_seed_rates_written(self, on_commit: Any, publish_messages: Any) -> None:
+        """Test that seed_rates bumps the version of every pair once and does not push the seeded rates one by one.
+
+        Args:
+            on_commit: the mock of transaction.on_commit.
+            publish_messages: the mock of the publication on Redis.
+        """
+        call_command('seed_rates', '2021-03-01', '2021-03-10', '--sources=EUR', '--currencies=USD,GBP',
+                     '--batch-size=10', stdout=io.StringIO())
+
+        publish_messages.assert_not_called()
+        self.assertEqual(get_version('EUR', 'GBP')[0], 1)
+        self.assertEqual(get_version('EUR', 'USD')[0], 1)
+
+
+class BackfillTestCase(TransactionTestCase):
+    """Backfill command test case."""
+    serialized_rollback = True
+
+    def test_backfill_rates(self) -> None:
+        """Test that the backfill stores every pair and resumes from its checkpoint."""
+        date_from, date_to = date(2021, 3, 1), date(2021, 3, 10)
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, 'backfill.checkpoint')
+            call_command('backfill_rates', str(date_from), str(date_to), '--sources=EUR', '--currencies=USD,GBP',
+                         '--provider=Mock', '--unit-days=4', '--workers=1', '--rate-limit=0',
+                         f'--checkpoint={checkpoint}')
+            with open(checkpoint) as checkpoint_file:
+                completed = checkpoint_file.read().split()
+            with patch('exchanger.management.commands.backfill_rates.run_unit') as run_unit:
+                call_command('backfill_rates', str(date_from), str(date_to), '--sources=EUR',
+                             '--currencies=USD,GBP', '--unit-days=4', f'--checkpoint={checkpoint}')
+
+        self.assertEqual(len(completed), 6)
+        self.assertIn('EUR-USD-2021-03-09-2021-03-10', completed)
+        self.assertEqual(CurrencyExchangeRate.objects.filter(
+            source_currency__code='EUR', valuation_date__range=(date_from, date_to)).count(), 20)
+        self.assertEqual(CurrencyExchangeRate.objects.filter(
+            exchanged_currency__code='EUR', valuation_date__range=(date_from, date_to)).count(), 20)
+        run_unit.assert_not_called()
+
+
+def _slow_fixerio(url: str, timeout: float) -> MockFixerIOResponseSuccess:
+    time.sleep(0.3)
+    return MockFixerIOResponseSuccess()
+
+
+@override_settings(FIXERIO_APIKEY=TEST_APIKEY)
+class HedgingTestCase(TransactionTestCase):
+    """Hedged provider requests test case."""
+    serialized_rollback = True
+
+    @override_settings(RATES_HEDGE_AFTER=0.05, RATES_HEDGE_GRACE=5)
+    @patch("requests.get", side_effect=_slow_fixerio)
+    def test_hedged_rate(self, mocked: Any) -> None:
+        """Test that a slow provider is hedged and its value overwrites the one of the next provider.
+
+        Args:
+            mocked: the mock of the call to fixerIo.
+        """
+        started = time.monotonic()
+        rate = _get_exchange_rate('EUR', 'USD', date(2019, 5, 6))
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.25)
+        self.assertAlmostEqual(float(rate.rate_value), 1.15)
+        while time.monotonic() - started < 2:
+            try:
+                if CurrencyExchangeRate.objects.get(pk=rate.pk).rate_value != Decimal('1.15'):
+                    break
+            except OperationalError:  # the table is locked while the late store writes
+                pass
+            time.sleep(0.01)
+        interactors._hedge_pool.shutdown(wait=True)  # let the late store finish before the database is flushed
+        interactors._hedge_pool = None
+        self.assertEqual(CurrencyExchangeRate.objects.get(pk=rate.pk).rate_value, Decimal('1.17593'))
+        self.assertEqual(CurrencyExchangeRate.objects.get(
+            source_currency__code='USD', exchanged_currency__code='EUR', valuation_date=date(2019, 5, 6)
+        ).rate_value, Decimal('0.850391'))
+
+
+@override_settings(FIXERIO_APIKEY=TEST_APIKEY)
+class LoadTestTestCase(LiveServerTestCase):
+    """Load test command test case."""
+    serialized_rollback = True
+
+    def test_stub_fixerio(self) -> None:
+        """Test that the stub answers deterministic rates and no data for the configured days."""
+        stub = StubFixerIo(0, no_data_days={date(2020, 1, 1)})
+        stub.start()
+        self.addCleanup(stub.server_close)
+        self.addCleanup(stub.shutdown)
+
+        first = requests.get(f'{stub.url}/2020-01-02?access_key=x&symbols=USD,EUR&format=1').json()
+        second = requests.get(f'{stub.url}/2020-01-02?access_key=x&symbols=USD,EUR&format=1').json()
+        no_data = requests.get(f'{stub.url}/2020-01-01?access_key=x&symbols=USD,EUR&format=1').json()
+
+        self.assertTrue(first['success'])
+        self.assertEqual(first, second)
+        self.assertEqual(first['rates']['EUR'], 1.0)
+        self.assertFalse(no_data['success'])
+        self.assertEqual(stub.calls, {'ok': 2, 'no_data': 1})
+
+    @patch("exchanger.metrics.django_rq.get_connection", side_effect=ConnectionError)
+    def test_loadtest(self, mocked_redis: Any) -> None:
+        """Test that the command drives calls through the app to the stub and reports them.
+
+        Args:
+            mocked_redis: the mock of the Redis connection of /metrics.
+        """
+        with socket.socket() as free_socket:
+            free_socket.bind(('127.0.0.1', 0))
+            port = free_socket.getsockname()[1]
+        output = io.StringIO()
+        with override_settings(FIXERIO_URL=f'http://127.0.0.1:{port}/api'):
+            call_command('loadtest', url=self.live_server_url, stub_port=port, seconds=0.5, concurrency=2,
+                         latency=0, mix='exchange_rates=1,currency_converter=1', range_days=1, history_days=30,
+                         stdout=output)
+        report = output.getvalue()
+
+        self.assertRegex(report, r'exchange_rates +\d+')
+        self.assertRegex(report, r'Stub FixerIo calls: .*ok [1-9]')
+        self.assertRegex(report, r'Provider calls of the app: fixerio ok [1-9]')
@@ -0,0 +1,137 @@
+"""HTTP caching module.
+
+Rates of past dates effectively never change, so the v1 views answer with validators derived from
+the pair versions and can reply 304 Not Modified without computing anything.
+"""
+from datetime import date, datetime, time
+from functools import wraps
+import hashlib
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+
+from django.conf import settings  # type: ignore
+from django.utils import timezone  # type: ignore
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers  # type: ignore
+from django.utils.http import http_date, quote_etag  # type: ignore
+
+from exchanger.interactors import split_currencies
+from exchanger.versions import get_sources_version, get_version
+
+
+class Validator(NamedTuple):
+    """HTTP validators of a response."""
+    etag: str
+    last_modified: Optional[datetime]
+    max_age: int
+
+
+def _validator(request: Any, version_state: Tuple[int, Optional[datetime]], historical: bool) -> Validator:
+    version, updated_at = version_state
+    key = [request.path, sorted(request.query_params.items()), request.accepted_media_type, version, updated_at]
+    last_modified = updated_at
+    if not historical:
+        # The answer also depends on the day (today's rate), so it is modified at least when the day starts
+        today = date.today()
+        key.append(today)
+        start_of_today = timezone.make_aware(datetime.combine(today, time.min))
+        last_modified = max(updated_at, start_of_today) if updated_at else start_of_today
+    etag = quote_etag(hashlib.sha256(repr(key).encode()).hexdigest())
+    max_age = settings.RATES_HISTORICAL_MAX_AGE if historical else settings.RATES_CURRENT_MAX_AGE
+    return Validator(etag, last_modified, max_age)
+
+
+def exchange_rates_validator(request: Any) -> Optional[Validator]:
+    """Validators of the exchange_rates view, long lived when the whole range is in the past.
+
+    Args:
+        request: the request object.
+
+    Returns:
+        the validators, or None when the request is invalid
+    """
+    source_currency = request.query_params.get('source_currency')
+    try:
+        date_to = datetime.strptime(request.query_params.get('date_to', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+    if not source_currency:
+        return None
+    return _validator(request, get_sources_version(split_currencies(source_currency)), date_to < date.today())
+
+
+def rolling_stats_validator(request: Any) -> Optional[Validator]:
+    """Validators of the rolling_stats view, from the versions of the requested pairs.
+
+    Args:
+        request: the request object.
+
+    Returns:
+        the validators, or None when the request is invalid
+    """
+    source_currency = request.query_params.get('source_currency')
+    exchanged_currency = request.query_params.get('exchanged_currency')
+    try:
+        date_to = datetime.strptime(request.query_params.get('date_to', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+    if not source_currency:
+        return None
+    # Several exchanged currencies are covered by the version of the whole source currency.
+    if exchanged_currency and ',' in exchanged_currency:
+        exchanged_currency = None
+    return _validator(request, get_version(source_currency, exchanged_currency), date_to < date.today())
+
+
+def pair_validator(request: Any) -> Optional[Validator]:
+    """Validators of the views that depend on a single pair and on today's rate.
+
+    Args:
+        request: the request object.
+
+    Returns:
+        the validators, or None when the request is invalid
+    """
+    source_currency = request.query_params.get('source_currency')
+    exchanged_currency = request.query_params.get('exchanged_currency')
+    if not source_currency or not exchanged_currency:
+        return None
+    return _validator(request, get_version(source_currency, exchanged_currency), False)
+
+
+def _patch_headers(response: Any, validator: Validator) -> None:
+    response['ETag'] = validator.etag
+    if validator.last_modified:
+        response['Last-Modified'] = http_date(validator.last_modified.timestamp())
+    patch_cache_control(response, public=True, max_age=validator.max_age)
+    patch_vary_headers(response, ('Accept',))
+
+
+def conditional(get_validator: Callable[[Any], Optional[Validator]]) -> Callable:
+    """Decorator that adds ETag, Last-Modified and Cache-Control headers to a view.
+
+    When the validators sent by the client still match, the view is not run and
+    304 Not Modified is returned. Must be applied below api_view.
+
+    Args:
+        get_validator: function that returns the validators of a request
+
+    Returns:
+        the decorator
+    """
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(request: Any, *args, **kwargs) -> Any:
+            validator = get_validator(request)
+            if validator is None:
+                return view(request, *args, **kwargs)
+            last_modified = validator.last_modified and int(validator.last_modified.timestamp())
+            not_modified = get_conditional_response(request, etag=validator.etag, last_modified=last_modified)
+            if not_modified is not None:
+                _patch_headers(not_modified, validator)
+                return not_modified
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                # The view may have stored new rates, so the validators are computed again.
+                _patch_headers(response, get_validator(request) or validator)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,127 @@
+"""Renderers module."""
+from datetime import date
+from decimal import Decimal
+import json
+from typing import Any, Iterable, List, Optional
+
+from rest_framework.renderers import BaseRenderer  # type: ignore
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _column(values: Iterable[Any]) -> List[Optional[float]]:
+    return [None if value is None else float(value) for value in values]
+
+
+def to_columns(data: dict) -> dict:
+    """Turn a date -> currency -> rate table into one dates array plus one values array per currency.
+
+    When the rates are themselves dicts (the open, high, low, close and mean of the aggregates)
+    each currency gets one array per field instead.
+
+    Args:
+        data: dict that contains for each date the rate of each currency
+
+    Returns:
+        a dict with the sorted dates and the columns of each currency
+    """
+    dates = sorted(data)
+    rows = [data[day] for day in dates]
+    codes = sorted({code for row in rows for code in row})
+    columns = {}
+    for code in codes:
+        cells = [row.get(code) for row in rows]
+        fields = next((list(cell) for cell in cells if isinstance(cell, dict)), None)
+        if fields is None:
+            columns[code] = _column(cells)
+        else:
+            columns[code] = {field: _column(cell and cell.get(field) for cell in cells) for field in fields}
+    return {'dates': dates, 'rates': columns}
+
+
+def is_table(data: Any) -> bool:
+    """Whether some data is a date -> currency -> rate table.
+
+    Args:
+        data: the data to render
+
+    Returns:
+        True if every value of data is a dict
+    """
+    return isinstance(data, dict) and bool(data) and all(isinstance(row, dict) for row in data.values())
+
+
+def _is_date(key: Any) -> bool:
+    try:
+        date.fromisoformat(key)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def is_source_tables(data: Any) -> bool:
+    """Whether some data is a source currency -> table dict, as answered for several source currencies.
+
+    Args:
+        data: the data to render
+
+    Returns:
+        True if every key of data is a currency code and every value a table (or empty)
+    """
+    return isinstance(data, dict) and bool(data) and all(
+        not _is_date(key) and isinstance(table, dict) and (not table or is_table(table)) for key, table in data.items())
+
+
+def _default(value: Any) -> float:
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(data: Any) -> bytes:
+    """Serialize data to compact JSON, using orjson when it is installed.
+
+    Args:
+        data: the data to serialize
+
+    Returns:
+        the JSON bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, separators=(',', ':'), default=_default).encode()
+
+
+class ColumnarJSONRenderer(BaseRenderer):
+    """Compact columnar JSON renderer for rate tables.
+
+    Tables are rendered as {"dates": [...], "rates": {"USD": [...], ...}}, any other payload is
+    rendered as plain compact JSON with its Decimal values as numbers.
+    """
+
+    media_type = 'application/vnd.nucoro.columnar+json'
+    format = 'columnar'
+    charset = None
+
+    def render(self, data: Any, accepted_media_type: Optional[str] = None,
+               renderer_context: Optional[dict] = None) -> bytes:
+        """Render data into columnar JSON.
+
+        Args:
+            data: the data to render
+            accepted_media_type: the accepted media type
+            renderer_context: the renderer context
+
+        Returns:
+            the JSON bytes
+        """
+        if data is None:
+            return b''
+        if is_source_tables(data):
+            data = {source_currency: to_columns(table) for source_currency, table in data.items()}
+        elif is_table(data):
+            data = to_columns(data)
+        return dumps(data)
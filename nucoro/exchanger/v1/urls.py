@@ -23,5 +23,9 @@ urlpatterns = [
     path('exchange_rates/', views.get_exchange_rates_view),
     path('currency_converter/', views.currency_converter_view),
     path('time-weightedror/', views.time_weight_rate_view),
+    path('rolling_stats/', views.rolling_stats_view),
     path('generate_async_data', views.generate_async_data),
+    path('changes/', views.rate_changes_view),
+    path('providers/quota/', views.provider_quota_view),
+    path('export/', views.export_rates_view),
 ]
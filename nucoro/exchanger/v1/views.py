@@ -1,21 +1,90 @@
 """Views module."""
-from datetime import datetime
+import csv
+from datetime import date, datetime
 import decimal
-from typing import Any
+from typing import Any, Iterator, Optional
 
+from django.http import StreamingHttpResponse  # type: ignore
 from rest_framework import status  # type: ignore
-from rest_framework.decorators import api_view  # type: ignore
+from rest_framework.decorators import api_view, permission_classes  # type: ignore
+from rest_framework.permissions import IsAdminUser  # type: ignore
 from rest_framework.response import Response  # type: ignore
+from rest_framework.utils.encoders import JSONEncoder  # type: ignore
 
-from exchanger.interactors import currency_converter, get_async_data, get_exchange_rates, time_weight_rate
+from exchanger.export import (
+    EXPORT_CONTENT_TYPES, EXPORT_CSV, EXPORT_EXTENSIONS, export_rates, export_watermark, ExportFilter, iter_export_rows
+)
+from exchanger.interactors import (
+    CHANGES_LIMIT, currency_converter, FILL_FORWARD, FILL_POLICIES, FILL_PROVIDER, get_async_data, get_exchange_rates,
+    get_exchange_rates_by_source, get_rate_changes, INTERVAL_DAY, INTERVALS, iter_exchange_rates, split_currencies,
+    time_weight_rate
+)
+from exchanger.quota import get_quota_usage
+from exchanger.v1.caching import conditional, exchange_rates_validator, pair_validator, rolling_stats_validator
+
+STREAM_NDJSON = 'ndjson'
+STREAM_CSV = 'csv'
+STREAM_FORMATS = (STREAM_NDJSON, STREAM_CSV)
+
+
+class _CSVBuffer:
+    """File-like object that hands back what the csv writer writes."""
+
+    def write(self, value: str) -> str:
+        """Return the written value instead of storing it.
+
+        Args:
+            value: the line written by the csv writer
+
+        Returns:
+            the same value
+        """
+        return value
+
+
+def _ndjson_lines(rates: Iterator) -> Iterator[str]:
+    encoder = JSONEncoder(separators=(',', ':'))
+    for valuation_date, currencies in rates:
+        yield encoder.encode({'date': valuation_date, 'rates': currencies}) + '\n'
+
+
+def _csv_lines(rates: Iterator) -> Iterator[str]:
+    writer = csv.writer(_CSVBuffer())
+    yield writer.writerow(['date', 'currency', 'rate'])
+    for valuation_date, currencies in rates:
+        yield ''.join(writer.writerow([valuation_date, code, rate_value]) for code, rate_value in currencies.items())
+
+
+def stream_exchange_rates(source_currency: str, date_from: date, date_to: date, stream: str,
+                          fill: Optional[str]) -> StreamingHttpResponse:
+    """Stream the exchange rates of a period as NDJSON (one line per date) or CSV (one line per rate).
+
+    Args:
+        source_currency: The source currency to get rates
+        date_from: from which date retrieve the rates
+        date_to: until which date retrieve the dates
+        stream: STREAM_NDJSON or STREAM_CSV
+        fill: None or FILL_FORWARD
+
+    Returns:
+        A streaming response
+    """
+    rates = iter_exchange_rates(source_currency, date_from, date_to, fill)
+    if stream == STREAM_NDJSON:
+        return StreamingHttpResponse(_ndjson_lines(rates), content_type='application/x-ndjson')
+    response = StreamingHttpResponse(_csv_lines(rates), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="rates_{source_currency}_{date_from}_{date_to}.csv"'
+    return response
 
 
 @api_view(['GET'])
-def get_exchange_rates_view(request: Any) -> Response:
+@conditional(exchange_rates_validator)
+def get_exchange_rates_view(request: Any, format: Optional[str] = None) -> Response:
     """Retrieve a list of currency rates for a specific time period.
 
     Args:
         request: the request object.
+        format: the format suffix of the url, if any.
 
     Description:
         parameters:
@@ -30,7 +99,21 @@ def get_exchange_rates_view(request: Any) -> Response:
             name: source_currency
             in: query
             type: string
-            description: String code of the source currency. Ex: EUR
+            description: String code of the source currency. Ex: EUR. Several codes separated by commas (Ex:
+                EUR,USD) or all answer with the rates of each source currency, from a single range query
+            name: fill
+            in: query
+            type: string
+            description: How missing rates are filled: provider (default), forward or interpolate
+            name: interval
+            in: query
+            type: string
+            description: day (default), or week/month for open, high, low, close and mean per period
+            name: stream
+            in: query
+            type: string
+            description: ndjson or csv to stream the stored rates instead (fill can only be forward, single
+                source currency only)
 
     Returns:
         A rest framework Response
@@ -38,11 +121,26 @@ def get_exchange_rates_view(request: Any) -> Response:
     source_currency = request.query_params.get('source_currency')
     date_from_str = request.query_params.get('date_from')
     date_to_str = request.query_params.get('date_to')
+    fill = request.query_params.get('fill', FILL_PROVIDER)
+    interval = request.query_params.get('interval', INTERVAL_DAY)
+    stream = request.query_params.get('stream')
+    source_currencies = split_currencies(source_currency) if source_currency else None
     try:
-        if source_currency and date_from_str and date_to_str:
+        if stream:
+            if source_currencies == [source_currency] and date_from_str and date_to_str and stream in STREAM_FORMATS and \
+                    request.query_params.get('fill', FILL_FORWARD) == FILL_FORWARD:
+                date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date()
+                date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date()
+                return stream_exchange_rates(source_currency, date_from, date_to, stream,
+                                             request.query_params.get('fill'))
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if source_currency and date_from_str and date_to_str and fill in FILL_POLICIES and interval in INTERVALS:
             date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date()
             date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date()
-            results = get_exchange_rates(source_currency, date_from, date_to)
+            if source_currencies == [source_currency]:
+                results = get_exchange_rates(source_currency, date_from, date_to, fill, interval)
+            else:
+                results = get_exchange_rates_by_source(source_currencies, date_from, date_to, fill, interval)
             return Response(results)
         return Response(status=status.HTTP_400_BAD_REQUEST)
     except Exception:
@@ -50,11 +148,13 @@ def get_exchange_rates_view(request: Any) -> Response:
 
 
 @api_view(['GET'])
-def currency_converter_view(request: Any) -> Response:
+@conditional(pair_validator)
+def currency_converter_view(request: Any, format: Optional[str] = None) -> Response:
     """Retrieve an amount converted to a specified currency.
 
     Args:
         request: the request object.
+        format: the format suffix of the url, if any.
 
     Description:
         parameters:
@@ -87,11 +187,13 @@ def currency_converter_view(request: Any) -> Response:
 
 
 @api_view(['GET'])
-def time_weight_rate_view(request: Any) -> Response:
+@conditional(pair_validator)
+def time_weight_rate_view(request: Any, format: Optional[str] = None) -> Response:
     """Retrieve the TWR for a certain amount in a period from a start_date until now.
 
     Args:
         request: the request object.
+        format: the format suffix of the url, if any.
 
     Description:
         parameters:
@@ -132,11 +234,68 @@ def time_weight_rate_view(request: Any) -> Response:
 
 
 @api_view(['GET'])
-def generate_async_data(request: Any) -> Response:
+@conditional(rolling_stats_validator)
+def rolling_stats_view(request: Any, format: Optional[str] = None) -> Response:
+    """Retrieve the rolling mean, volatility, min and max of the rates of some pairs, computed on the server.
+
+    Args:
+        request: the request object.
+        format: the format suffix of the url, if any.
+
+    Description:
+        parameters:
+            name: date_from
+            in: query
+            type: string
+            description: First date of the statistics with the format Y-m-d
+            name: date_to
+            in: query
+            type: string
+            description: Last date of the statistics with the format Y-m-d
+            name: source_currency
+            in: query
+            type: string
+            description: String code of the source currency. Ex: EUR
+            name: exchanged_currency
+            in: query
+            type: string
+            description: Codes of the exchanged currencies separated by commas, all by default. Ex: USD,GBP
+            name: window
+            in: query
+            type: integer
+            description: Length of the window in days, 30 by default
+
+    Returns:
+        A rest framework Response
+    """
+    # Imported here so the processes that only load the URLs (commands, workers) do not import NumPy.
+    from exchanger.analytics import DEFAULT_WINDOW, get_rolling_stats
+
+    source_currency = request.query_params.get('source_currency')
+    exchanged_currency = request.query_params.get('exchanged_currency')
+    date_from_str = request.query_params.get('date_from')
+    date_to_str = request.query_params.get('date_to')
+    try:
+        if source_currency and date_from_str and date_to_str:
+            date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date()
+            date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date()
+            window = int(request.query_params.get('window', DEFAULT_WINDOW))
+            exchanged_currencies = exchanged_currency.split(',') if exchanged_currency else None
+            return Response(get_rolling_stats(source_currency, exchanged_currencies, date_from, date_to, window))
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+    except Exception:
+        return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+def generate_async_data(request: Any, format: Optional[str] = None) -> Response:
     """Retrieve a list of currency rates for a specific time period.
 
     Args:
         request: the request object.
+        format: the format suffix of the url, if any.
 
     Description:
         parameters:
@@ -175,3 +334,109 @@ def generate_async_data(request: Any) -> Response:
         return Response(status=status.HTTP_400_BAD_REQUEST)
     except Exception:
         return Response(status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(['GET'])
+def rate_changes_view(request: Any, format: Optional[str] = None) -> Response:
+    """Retrieve the rates inserted or updated since a cursor, to sync incrementally.
+
+    Args:
+        request: the request object.
+        format: the format suffix of the url, if any.
+
+    Description:
+        parameters:
+            name: since
+            in: query
+            type: integer
+            description: The cursor returned as next by the previous call, 0 (default) to start from scratch
+            name: limit
+            in: query
+            type: integer
+            description: Maximum number of changes returned (default and maximum 1000)
+
+    Returns:
+        A rest framework Response
+    """
+    try:
+        since = int(request.query_params.get('since', 0))
+        limit = min(int(request.query_params.get('limit', CHANGES_LIMIT)), CHANGES_LIMIT)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+    if since < 0 or limit < 1:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+    return Response(get_rate_changes(since, limit))
+
+
+@api_view(['GET'])
+def provider_quota_view(request: Any, format: Optional[str] = None) -> Response:
+    """Retrieve the quota usage of the FixerIo providers this month.
+
+    Args:
+        request: the request object.
+        format: the format suffix of the url, if any.
+
+    Returns:
+        A rest framework Response
+    """
+    return Response(get_quota_usage())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_rates_view(request: Any, format: Optional[str] = None) -> Any:
+    """Stream the stored rates, or the ones written after a watermark, as a gzip compressed CSV or Parquet file (staff only).
+
+    The X-Nucoro-Watermark header has the watermark to pass as since to the next incremental export.
+
+    Args:
+        request: the request object.
+        format: the format suffix of the url, if any.
+
+    Description:
+        parameters:
+            name: output
+            in: query
+            type: string
+            description: csv (gzip compressed, default) or parquet
+            name: sources
+            in: query
+            type: string
+            description: Source currencies (comma separated), all by default. Ex: EUR,USD
+            name: currencies
+            in: query
+            type: string
+            description: Exchanged currencies (comma separated), all by default. Ex: GBP,CHF
+            name: date_from
+            in: query
+            type: string
+            description: First valuation date with the format Y-m-d
+            name: date_to
+            in: query
+            type: string
+            description: Last valuation date with the format Y-m-d
+            name: since
+            in: query
+            type: integer
+            description: Watermark of the previous export, 0 (default) for every rate
+
+    Returns:
+        A streaming response, or a rest framework Response with the error
+    """
+    params = request.query_params
+    output = params.get('output', EXPORT_CSV)
+    try:
+        export_filter = ExportFilter(
+            sources=params['sources'].split(',') if params.get('sources') else None,
+            currencies=params['currencies'].split(',') if params.get('currencies') else None,
+            date_from=datetime.strptime(params['date_from'], '%Y-%m-%d').date() if params.get('date_from') else None,
+            date_to=datetime.strptime(params['date_to'], '%Y-%m-%d').date() if params.get('date_to') else None,
+            since=int(params.get('since', 0)), until=export_watermark())
+        parts = export_rates(output, iter_export_rows(export_filter))
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(parts, content_type=EXPORT_CONTENT_TYPES[output])
+    response['Content-Disposition'] = (f'attachment; filename="rates_{export_filter.since}_{export_filter.until}.'
+                                       f'{EXPORT_EXTENSIONS[output]}"')
+    response['X-Nucoro-Watermark'] = str(export_filter.until)
+    return response
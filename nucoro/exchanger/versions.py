@@ -0,0 +1,73 @@
+"""Versions module.
+
+Keeps a write version per currency pair, so HTTP validators can be derived without reading the rates.
+"""
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Tuple
+
+from django.db.models import F, Max, Sum  # type: ignore
+from django.dispatch import receiver  # type: ignore
+from django.utils import timezone  # type: ignore
+
+from exchanger.currencies import currency_id, currency_ids
+from exchanger.models import CurrencyExchangeRate, CurrencyPairVersion
+from exchanger.signals import rates_written
+
+
+def bump_versions(rates: Iterable[CurrencyExchangeRate]) -> None:
+    """Increase the version of every pair that has written rates.
+
+    Args:
+        rates: the written rates
+    """
+    now = timezone.now()
+    for source_currency_id, exchanged_currency_id in {(rate.source_currency_id, rate.exchanged_currency_id)
+                                                      for rate in rates}:
+        pair = {'source_currency_id': source_currency_id, 'exchanged_currency_id': exchanged_currency_id}
+        if not CurrencyPairVersion.objects.filter(**pair).update(version=F('version') + 1, updated_at=now):
+            CurrencyPairVersion.objects.get_or_create(defaults={'version': 1, 'updated_at': now}, **pair)
+
+
+def get_version(source_currency: str, exchanged_currency: Optional[str] = None) -> Tuple[int, Optional[datetime]]:
+    """Returns the version of a pair, or of all the pairs of a source currency.
+
+    Args:
+        source_currency: code of the source currency
+        exchanged_currency: code of the exchanged currency, None for every currency
+
+    Returns:
+        the sum of the versions and the last time one of them changed
+    """
+    versions = CurrencyPairVersion.objects.filter(source_currency_id=currency_id(source_currency))
+    if exchanged_currency:
+        versions = versions.filter(exchanged_currency_id=currency_id(exchanged_currency))
+    state = versions.aggregate(version=Sum('version'), updated_at=Max('updated_at'))
+    return state['version'] or 0, state['updated_at']
+
+
+def get_sources_version(source_currencies: Optional[List[str]]) -> Tuple[int, Optional[datetime]]:
+    """Returns the version of all the pairs of several source currencies.
+
+    Args:
+        source_currencies: codes of the source currencies, None for every currency
+
+    Returns:
+        the sum of the versions and the last time one of them changed
+    """
+    versions = CurrencyPairVersion.objects.all()
+    if source_currencies is not None:
+        versions = versions.filter(source_currency_id__in=currency_ids(source_currencies).values())
+    state = versions.aggregate(version=Sum('version'), updated_at=Max('updated_at'))
+    return state['version'] or 0, state['updated_at']
+
+
+@receiver(rates_written)
+def update_versions(sender: Any, rates: Iterable[CurrencyExchangeRate], **kwargs) -> None:
+    """Bump the pair versions when rates are written.
+
+    Args:
+        sender: the sender of the signal
+        rates: the written rates
+        kwargs: extra signal arguments
+    """
+    bump_versions(rates)
@@ -0,0 +1,36 @@
+"""RQ workers module."""
+import logging
+import time
+
+from rq import Queue, Worker  # type: ignore
+from rq.job import Job  # type: ignore
+
+from exchanger.metrics import record_job
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsWorker(Worker):
+    """RQ worker that records the duration of every job in the Redis histogram of /metrics."""
+
+    def perform_job(self, job: Job, queue: Queue) -> bool:
+        """Run a job and record its duration.
+
+        Args:
+            job: the job
+            queue: the queue of the job
+
+        Returns:
+            whether the job finished
+        """
+        started = time.perf_counter()
+        finished = False
+        try:
+            finished = super().perform_job(job, queue)
+        finally:
+            try:
+                record_job(self.connection, queue.name, job.func_name, 'finished' if finished else 'failed',
+                           time.perf_counter() - started)
+            except Exception:
+                logger.warning('The duration of job %s could not be recorded', job.id, exc_info=True)
+        return finished
@@ -0,0 +1,148 @@
+"""Write behind module.
+
+Rates fetched on the request path can be returned right away and stored later: they are queued in
+memory, deduplicated by pair and date, and a background thread of the process stores them in bulk
+every RATES_WRITE_BEHIND_INTERVAL seconds (and when the process exits). A crash loses at most the
+rates of the last interval; a failed flush keeps its rates queued for the next one.
+"""
+import atexit
+from datetime import date
+from decimal import Decimal
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings  # type: ignore
+from django.db import connection, transaction  # type: ignore
+
+from exchanger.currencies import currency_ids, get_currency
+from exchanger.models import CurrencyExchangeRate, reserve_write_sequence
+from exchanger.routers import use_primary
+from exchanger.signals import rates_written
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 500
+
+RateKey = Tuple[str, str, date]
+
+_queue: Dict[RateKey, Decimal] = {}
+_lock = threading.Lock()
+_flusher_pid: Optional[int] = None
+
+
+def queue_rate(source_currency: str, exchanged_currency: str, valuation_date: date,
+               rate_value: Decimal) -> CurrencyExchangeRate:
+    """Queue a rate (and its reverse) to be stored by the next flush.
+
+    Args:
+        source_currency: The source currency of the rate
+        exchanged_currency: The currency of the rate
+        valuation_date: The date of the rate
+        rate_value: The value of the rate
+
+    Returns:
+        an unsaved CurrencyExchangeRate with the rate
+    """
+    _start_flusher()
+    with _lock:
+        _queue[(source_currency, exchanged_currency, valuation_date)] = rate_value
+        _queue.pop((exchanged_currency, source_currency, valuation_date), None)
+    return _unsaved_rate(source_currency, exchanged_currency, valuation_date, rate_value)
+
+
+def pending_rate(source_currency: str, exchanged_currency: str, valuation_date: date) -> Optional[CurrencyExchangeRate]:
+    """Returns a queued rate that is not stored yet, if any.
+
+    Args:
+        source_currency: The source currency of the rate
+        exchanged_currency: The currency of the rate
+        valuation_date: The date of the rate
+
+    Returns:
+        an unsaved CurrencyExchangeRate with the rate, or None
+    """
+    with _lock:
+        rate_value = _queue.get((source_currency, exchanged_currency, valuation_date))
+        reverse_value = _queue.get((exchanged_currency, source_currency, valuation_date))
+    if rate_value is None and reverse_value is None:
+        return None
+    return _unsaved_rate(source_currency, exchanged_currency, valuation_date,
+                         rate_value if rate_value is not None else 1 / reverse_value)
+
+
+def _unsaved_rate(source_currency: str, exchanged_currency: str, valuation_date: date,
+                  rate_value: Decimal) -> CurrencyExchangeRate:
+    return CurrencyExchangeRate(source_currency=get_currency(source_currency),
+                                exchanged_currency=get_currency(exchanged_currency),
+                                valuation_date=valuation_date, rate_value=rate_value)
+
+
+def flush() -> int:
+    """Store the queued rates and their reverses in bulk.
+
+    Returns:
+        the number of rates stored
+    """
+    global _queue
+    with _lock:
+        batch, _queue = _queue, {}
+    if not batch:
+        return 0
+    try:
+        currencies = currency_ids({code for key in batch for code in key[:2]})
+        values = {}
+        for (source_currency, exchanged_currency, valuation_date), rate_value in batch.items():
+            values[(currencies[source_currency], currencies[exchanged_currency], valuation_date)] = Decimal(rate_value)
+            values[(currencies[exchanged_currency], currencies[source_currency], valuation_date)] = 1 / Decimal(rate_value)
+        with transaction.atomic(), use_primary():
+            existing = {
+                (rate.source_currency_id, rate.exchanged_currency_id, rate.valuation_date): rate
+                for rate in CurrencyExchangeRate.objects.filter(
+                    valuation_date__in={key[2] for key in values}, source_currency_id__in={key[0] for key in values},
+                    exchanged_currency_id__in={key[1] for key in values})
+            }
+            write_sequence = reserve_write_sequence(len(values))
+            created, updated = [], []
+            for (source_id, exchanged_id, valuation_date), rate_value in values.items():
+                rate = existing.get((source_id, exchanged_id, valuation_date))
+                if rate is None:
+                    rate = CurrencyExchangeRate(source_currency_id=source_id, exchanged_currency_id=exchanged_id,
+                                                valuation_date=valuation_date)
+                    created.append(rate)
+                else:
+                    updated.append(rate)
+                rate.rate_value = rate_value
+                rate.write_sequence = write_sequence
+                write_sequence += 1
+            CurrencyExchangeRate.objects.bulk_update(updated, ['rate_value', 'write_sequence'], batch_size=BULK_BATCH_SIZE)
+            CurrencyExchangeRate.objects.bulk_create(created, batch_size=BULK_BATCH_SIZE)
+            rates_written.send(sender=CurrencyExchangeRate, rates=created + updated)
+    except Exception:
+        logger.warning('Queued rates could not be stored, retrying on the next flush', exc_info=True)
+        with _lock:
+            for key, rate_value in batch.items():
+                _queue.setdefault(key, rate_value)
+        return 0
+    return len(values)
+
+
+def _flush_periodically() -> None:
+    while True:
+        time.sleep(settings.RATES_WRITE_BEHIND_INTERVAL)
+        try:
+            flush()
+        finally:
+            connection.close()
+
+
+def _start_flusher() -> None:
+    global _flusher_pid
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_periodically, name='rates-write-behind', daemon=True).start()
+    atexit.register(flush)
@@ -2,14 +2,37 @@
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests to RATES_PUSH_PATH are served by the rates push stream (Server-Sent Events or
+WebSocket), everything else by Django.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 """
 
 import os
+from typing import Any, Callable
 
+from django.conf import settings  # type: ignore
 from django.core.asgi import get_asgi_application  # type: ignore
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nucoro.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from exchanger.push import rates_stream  # noqa: E402,I100
+
+
+async def application(scope: dict, receive: Callable, send: Callable) -> Any:
+    """Route the push stream to rates_stream and the rest to Django.
+
+    Args:
+        scope: the ASGI scope
+        receive: the ASGI receive callable
+        send: the ASGI send callable
+
+    Returns:
+        the result of the selected application
+    """
+    if scope['type'] in ('http', 'websocket') and scope['path'].rstrip('/') == settings.RATES_PUSH_PATH:
+        return await rates_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -11,9 +11,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 import os
 from pathlib import Path
 import sys
-from typing import Any
 
-from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -41,11 +39,13 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
-    'exchanger',
+    'exchanger.apps.ExchangerConfig',
     'django_rq',
 ]
 
 MIDDLEWARE = [
+    'exchanger.metrics.metrics_middleware',
+    'exchanger.middleware.sticky_primary_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'exchanger.profiling.profiling_middleware',
 ]
 
 ROOT_URLCONF = 'nucoro.urls'
@@ -86,9 +87,41 @@ DATABASES = {
     }
 }
 
+# Read replicas of the default (primary) database: comma separated paths in the DATABASE_REPLICAS env var.
+# Reads go to them and writes to the primary, see exchanger/routers.py
+DATABASE_REPLICAS = []
+for index, replica_name in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(','))):
+    DATABASES[f'replica{index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': replica_name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{index}')
+DATABASE_ROUTERS = ['exchanger.routers.PrimaryReplicaRouter']
+# Seconds a caller keeps reading from the primary after a write (the replication lag)
+DATABASE_STICKY_SECONDS = 5
+
 if 'test' in sys.argv or 'test_coverage' in sys.argv:  # Covers regular testing and django-coverage
     DATABASES['default']['ENGINE'] = 'django.db.backends.sqlite3'
     DATABASES['default']['NAME'] = BASE_DIR / 'exchanger/db.sqlite3'
+    DATABASES['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'exchanger/replica.sqlite3'}
+
+# SQLite profile. "default" is the stock Django one. "production" is tuned for concurrent readers and writers:
+# write transactions take the lock when they begin (see exchanger/backends/sqlite3), connections wait for it,
+# stay open between requests and use WAL. Set SQLITE_PROFILE=production to enable it.
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'default')
+SQLITE_INIT_COMMAND = ';'.join([
+    'PRAGMA journal_mode = WAL',  # readers and the writer do not block each other
+    'PRAGMA synchronous = NORMAL',  # with WAL only checkpoints wait for fsync, commits survive app crashes
+    'PRAGMA cache_size = -65536',  # KiB of page cache per connection
+    'PRAGMA mmap_size = 268435456',  # bytes of the database read through mmap
+    'PRAGMA temp_store = MEMORY',
+])
+if SQLITE_PROFILE == 'production':
+    for database in DATABASES.values():
+        database['ENGINE'] = 'exchanger.backends.sqlite3'
+        database['CONN_MAX_AGE'] = 600
+        database['OPTIONS'] = {'transaction_mode': 'IMMEDIATE', 'timeout': 20, 'init_command': SQLITE_INIT_COMMAND}
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
@@ -133,31 +166,59 @@ STATIC_URL = '/static/'
 REST_FRAMEWORK = {
     'DEFAULT_VERSIONING_CLASS': 'rest_framework.versioning.NamespaceVersioning',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+    'PAGE_SIZE': 10,
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'exchanger.v1.renderers.ColumnarJSONRenderer',
+    ],
 }
 
-
-def get_env_value(env_variable: str) -> Any:
-    """Retrieve an env var.
-
-    Args:
-        env_variable: the name of the env var requested.
-
-    Returns:
-        the value of the env var requested.
-
-    Raises:
-        ImproperlyConfigured: the variable is not set.
-    """
-    try:
-        return os.environ[env_variable]
-    except KeyError:
-        error_msg = 'Set the {} environment variable'.format(env_variable)
-        raise ImproperlyConfigured(error_msg)
-
-
-FIXERIO_APIKEY = get_env_value('FIXERIO_APIKEY')
-FIXERIO_URL = 'http://data.fixer.io/api'
+# HTTP caching of the v1 rates (seconds). Ranges fully in the past get the long max-age.
+RATES_HISTORICAL_MAX_AGE = 60 * 60 * 24 * 30
+RATES_CURRENT_MAX_AGE = 60
+
+# Seconds the chart data of the admin is cached. It is also dropped when rates are written.
+CHART_CACHE_TIMEOUT = 60 * 60
+
+# Seconds the rolling statistics of a pair are cached (see exchanger/analytics.py). New rates extend them before.
+ANALYTICS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Seconds the currencies are kept in memory by each process (see exchanger/currencies.py). The changes made
+# by the process itself are seen right away.
+CURRENCY_REGISTRY_TIMEOUT = 5 * 60
+
+
+# Access key of FixerIo. It is only checked when FixerIo is called (see exchanger.adapter.fixerio_apikey), so the
+# commands and workers that never call it start without it.
+FIXERIO_APIKEY = os.environ.get('FIXERIO_APIKEY')
+# Rates of the Mock provider: 'last' (the last stored rate of the pair plus 3%) or 'synthetic' (deterministic
+# random walks of exchanger/synthetic.py, with MOCK_PROVIDER_SEED)
+MOCK_PROVIDER_MODE = os.environ.get('MOCK_PROVIDER_MODE', 'last')
+MOCK_PROVIDER_SEED = 0
+
+# Overridable to point to a stub server, see the loadtest command
+FIXERIO_URL = os.environ.get('FIXERIO_URL', 'http://data.fixer.io/api')
+# Scheduler of the FixerIo calls (limits are set per provider in the admin), see exchanger/quota.py: seconds a
+# call waits for other requests of the same date to merge with, and seconds its answer is reused
+FIXERIO_MERGE_WINDOW = 0.01
+FIXERIO_MEMO_TIMEOUT = 0 if 'test' in sys.argv or 'test_coverage' in sys.argv else 30
+# Seconds a FixerIo call may take, and seconds a request waits for its call, time in the queue included
+FIXERIO_TIMEOUT = 10
+FIXERIO_WAIT_TIMEOUT = 30
+# Calls to a provider running at the same time in each process, the next ones wait in its queue
+FIXERIO_MAX_CONCURRENT_CALLS = 4
+
+# Hedged provider requests, see exchanger.interactors._get_hedged_exchange_rate: seconds a provider has to answer
+# before the next one is also requested (None to request them one after the other), and seconds the answer of a
+# higher priority provider is still stored after a lower priority one answered first
+RATES_HEDGE_AFTER = None
+RATES_HEDGE_GRACE = 5
+
+# Write behind of the rates fetched on the request path, see exchanger/writebehind.py: when enabled they are
+# returned right away and stored in bulk every RATES_WRITE_BEHIND_INTERVAL seconds
+RATES_WRITE_BEHIND = False
+RATES_WRITE_BEHIND_INTERVAL = 1.0
 
 # Django rq
 RQ_QUEUES = {
@@ -169,3 +230,25 @@ RQ_QUEUES = {
         'DEFAULT_TIMEOUT': 360,
     },
 }
+
+# Opt-in profiling of requests, see exchanger/profiling.py: the last PROFILING_MAX_PROFILES profiles are
+# kept in PROFILING_DIR and PROFILING_SAMPLE_RATE of the requests are profiled (0 disables sampling)
+PROFILING_DIR = os.environ.get('PROFILING_DIR', str(BASE_DIR / 'profiles'))
+PROFILING_MAX_PROFILES = 100
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_TOKEN_MAX_AGE = 3600
+
+# RQ workers record the duration of their jobs for /metrics, see exchanger/metrics.py
+RQ = {
+    'WORKER_CLASS': 'exchanger.workers.MetricsWorker',
+}
+
+# Warm up of today's rates for every pair: UTC times of the day it runs on RQ, scheduled by
+# manage.py warm_rates --schedule. See exchanger.interactors.schedule_rates_warmup
+RATES_WARMUP_SCHEDULE = ['00:05', '16:30']
+
+# Push of the written rates over Server-Sent Events / WebSocket (ASGI only), see exchanger/push.py
+RATES_PUSH_ENABLED = not ('test' in sys.argv or 'test_coverage' in sys.argv)
+RATES_PUSH_CHANNEL = 'exchanger:rates'
+RATES_PUSH_PATH = '/v1/stream/rates'
+RATES_PUSH_HEARTBEAT = 15
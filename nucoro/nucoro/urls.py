@@ -19,12 +19,16 @@ from django.contrib import admin
 from django.urls import path
 from rest_framework.urlpatterns import format_suffix_patterns
 
-from exchanger.admin import currency_converter_admin
+from exchanger.admin import currency_converter_admin, profile_admin, profiles_admin
+from exchanger.metrics import metrics_view
 
 urlpatterns = [
     path('admin/currency_converter', currency_converter_admin),
+    path('admin/profiles/', profiles_admin),
+    path('admin/profiles/<str:name>/', profile_admin),
     path('admin/', admin.site.urls),
     path('django-rq/', include('django_rq.urls')),
+    path('metrics', metrics_view),
     url(r'^v1/', include('exchanger.v1.urls')),
 ]
 